@@ -0,0 +1,157 @@
+"""
+Live Run Events
+===============
+
+This module fans the results ingested by the service out to the browsers watching a run live, as server-sent events
+(SSE), so the live view of a run never queries the database.
+
+The ingest endpoints publish every batch once it is committed. A batch is serialized into an SSE message once and
+the same bytes are queued for every subscriber of the run. Each subscriber has a bounded queue: a browser that does
+not keep up is sent a "reset" event instead of the messages it missed, and reloads the run.
+
+The broadcaster lives in the process, on the event loop of the app: a service run with several worker processes
+only pushes the results ingested by the process the browser is connected to.
+
+Classes:
+- Broadcaster: Publish/subscribe fan-out of SSE messages, one channel per test run.
+
+Functions:
+- sse_message: Serializes an event in the SSE format.
+- live_tests: Builds the live messages of a batch of test rows.
+"""
+import json
+import asyncio
+import contextlib
+from datetime import datetime
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+# Messages queued per subscriber before it is considered lagging
+QUEUE_SIZE = 256
+
+# Columns of the tests sent to the live view, without the b_ prefix of the finish rows
+LIVE_COLUMNS = ("test_id", "test_name", "test_parameters", "timestamp", "test_status", "duration",
+                "error_exception", "setup_ns", "call_ns", "teardown_ns")
+
+
+def _json_default(value: Any) -> str:
+    """
+    Serializes the values json does not know, the timestamps of the rows.
+    """
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def sse_message(event: str, data: Any) -> bytes:
+    """
+    Serializes an event in the SSE format.
+
+    Parameters:
+    - event (str): Name of the event, the type of the listener of the EventSource.
+    - data (Any): The payload, sent as JSON on a single data line.
+
+    Returns:
+    - bytes: The message, terminated by a blank line.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=_json_default)}\n\n".encode("utf-8")
+
+
+# Sent instead of the messages a lagging subscriber missed
+RESET = sse_message("reset", {})
+
+
+def live_tests(started: Dict[str, Dict[str, Any]], finished: List[Dict[str, Any]],
+               definitions: Optional[Dict[int, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Builds the live messages of a batch of test rows, as built for TestManager.ingest_rows.
+
+    Every message holds the columns known from the batch, keyed by test ID: the live view adds the tests it does not
+    show yet and updates the others. Parameters of known definitions are not in the batch, they are left out.
+
+    Parameters:
+    - started (Dict[str, Dict[str, Any]]): Rows of the tests started in the batch, by test ID.
+    - finished (List[Dict[str, Any]]): Update parameters of the tests started in earlier batches.
+    - definitions (Dict[int, Dict[str, Any]], optional): Definitions reported in the batch, by ID.
+
+    Returns:
+    - List[Dict[str, Any]]: One message per test.
+    """
+    definitions = definitions or {}
+    tests = []
+    for row in started.values():
+        test = {column: row.get(column) for column in LIVE_COLUMNS}
+        definition = definitions.get(row.get("definition_id"))
+        if not test["test_parameters"] and definition is not None:
+            test["test_parameters"] = definition.get("test_parameters")
+        tests.append(test)
+    for row in finished:
+        tests.append({column: row[f"b_{column}"] for column in LIVE_COLUMNS if f"b_{column}" in row})
+    return tests
+
+
+class Broadcaster:
+    """
+    Publish/subscribe fan-out of SSE messages, one channel per test run.
+
+    Only to be used from the event loop of the app: publishing never blocks or awaits.
+    """
+
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        """
+        Initialize the broadcaster without subscribers.
+
+        Parameters:
+        - queue_size (int, optional): Messages queued per subscriber before it is sent a reset. Defaults to QUEUE_SIZE.
+        """
+        self.queue_size = queue_size
+        self._channels: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribed(self, channel: str) -> bool:
+        """
+        Returns True when a channel has subscribers, so publishers skip building messages nobody reads.
+        """
+        return bool(self._channels.get(channel))
+
+    def publish(self, channel: str, event: str, data: Any) -> None:
+        """
+        Queues an event for every subscriber of a channel.
+
+        Parameters:
+        - channel (str): The channel, a test run ID.
+        - event (str): Name of the event.
+        - data (Any): The payload, serialized once for all subscribers.
+        """
+        queues = self._channels.get(channel)
+        if not queues:
+            return
+
+        message = sse_message(event, data)
+        for queue in queues:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # The missed messages cannot be replayed, the subscriber starts over from a reset
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESET)
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[asyncio.Queue]:
+        """
+        Subscribes to a channel for the duration of the context.
+
+        Parameters:
+        - channel (str): The channel, a test run ID.
+
+        Yields:
+        - asyncio.Queue: The queue receiving the SSE messages of the channel.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._channels[channel].add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._channels.get(channel)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._channels[channel]
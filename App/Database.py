@@ -5,14 +5,23 @@ Database Test Manager
 This module provides a TestManager class for managing test runs and tests in a database. It also includes functionality to reset the database and perform example test operations.
 
 Classes:
-- TestManager: Manages interactions with the database, including creating test runs, tests, finishing tests and test runs, printing tables, and more.
+- TestManager: Manages interactions with the database, including creating test runs, tests, finishing tests and test runs, bulk ingestion of test events, printing tables, and more.
+- AsyncTestManager: Awaitable variant of TestManager bound to an SQLAlchemy AsyncSession.
+- MissingDefinitionsError: A batch references test definitions unknown to the database.
 
 Functions:
+- duration_bucket: Maps a test duration to its bucket of the run summary histogram.
+- histogram_percentile: Estimates a duration percentile from a run summary histogram.
+- nearest_rank: Returns a percentile of sorted durations.
+- fit: Cuts a test name or error message down to the length of its column.
+- start_row, definition_row, merge_finish, event_rows: Build the rows of a batch of test events for TestManager.ingest_rows.
+- get_async_database_url: Derives the URL of the async driver from a sync database URL.
 - reset_and_test_with_example: Resets the database, performs example test operations, and prints tables.
 
 Usage:
 - Import this module and create an instance of the TestManager class to interact with the database.
 - Use methods of the TestManager class to perform various database operations, such as creating test runs, tests, finishing tests, printing tables, and more.
+- In async code (e.g. the FastAPI endpoints), wrap an AsyncSession in an AsyncTestManager and await its methods.
 - Call the reset_and_test_with_example function to reset the database, perform example test operations, and print tables.
 
 Dependencies:
@@ -27,15 +36,20 @@ Note:
 - This module assumes the existence of a SetupDatabase module containing the database models and initialization logic.
 """
 import os
+import math
 import uuid
 import logging
 import subprocess
-from typing import Dict, Any
-from datetime import datetime
-from sqlalchemy import create_engine
-from SetupDatabase import TestRun, Test
+from typing import Dict, Any, List, Callable, Optional, Tuple, AsyncIterator
+from datetime import date, datetime, timedelta
+from collections import defaultdict
+from sqlalchemy import create_engine, insert, update, delete, bindparam, func, select, tuple_
+from sqlalchemy.dialects import mysql, sqlite
+from SetupDatabase import TestRun, Test, TestDefinition, RunSummary, FixtureStat, TestProfile, TestFlakiness, TestDailyRollup, definition_id_of
+from Flakiness import failed_outcome, fold_outcome, window_failures, window_flips
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 # Initialize logger
@@ -48,6 +62,241 @@ formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(messag
 file_handler.setFormatter(formatter)
 logger.addHandler(file_handler)
 
+# RunSummary column counting each test status
+SUMMARY_STATUS_COLUMNS = {"PASSED": "passed", "FAILED": "failed", "SKIPPED": "skipped", "ERROR": "error", "UNKNOWN": "unknown"}
+
+# Durations are bucketed on a logarithmic scale starting at one microsecond, each bucket 10% wider than the previous
+HISTOGRAM_BASE = 1e-6
+HISTOGRAM_GROWTH = 1.1
+
+def duration_bucket(duration: float) -> int:
+    """
+    Maps a test duration to its bucket of the run summary histogram.
+
+    Parameters:
+    - duration (float): Duration of the test in seconds.
+
+    Returns:
+    - int: Index of the bucket. Bucket i holds durations up to HISTOGRAM_BASE * HISTOGRAM_GROWTH ** i.
+    """
+    if duration <= HISTOGRAM_BASE:
+        return 0
+    return math.ceil(math.log(duration / HISTOGRAM_BASE, HISTOGRAM_GROWTH))
+
+def histogram_percentile(histogram: Dict[str, int], quantile: float) -> Optional[float]:
+    """
+    Estimates a duration percentile from a run summary histogram.
+
+    The estimate is the upper bound of the bucket holding the percentile, so it is at most 10% above the exact value.
+
+    Parameters:
+    - histogram (Dict[str, int]): Test counts keyed by bucket index.
+    - quantile (float): The quantile to estimate, between 0 and 1.
+
+    Returns:
+    - float: The estimated duration in seconds, or None if the histogram is empty.
+    """
+    total = sum(histogram.values())
+    if not total:
+        return None
+
+    rank = quantile * total
+    seen = 0
+    for bucket in sorted(histogram, key=int):
+        seen += histogram[bucket]
+        if seen >= rank:
+            return HISTOGRAM_BASE * HISTOGRAM_GROWTH ** int(bucket)
+    return None
+
+def nearest_rank(durations: List[float], quantile: float) -> float:
+    """
+    Returns a percentile of sorted durations, by the nearest-rank method.
+
+    Parameters:
+    - durations (List[float]): The durations, sorted in ascending order. Must not be empty.
+    - quantile (float): The quantile, between 0 and 1.
+
+    Returns:
+    - float: The smallest duration such that at least the given share of the durations are lower or equal.
+    """
+    return durations[max(0, math.ceil(quantile * len(durations)) - 1)]
+
+# Longest test name and error message the tests table holds; strict SQL modes refuse longer values instead of cutting them
+TEST_NAME_LENGTH = Test.__table__.c.test_name.type.length
+ERROR_LENGTH = Test.__table__.c.error_exception.type.length
+
+def fit(value: Optional[str], length: int) -> Optional[str]:
+    """
+    Cuts a string down to the length of its column, marking the cut with "...".
+
+    Parameters:
+    - value (str, optional): The string to store.
+    - length (int): Length of the column.
+
+    Returns:
+    - str: The string, cut when it is longer than the column, or None.
+    """
+    if value is None or len(value) <= length:
+        return value
+    return value[:length - 3] + "..."
+
+
+def start_row(test_run_id, test_id: str, test_name: Optional[str], test_parameters: Any, timestamp: Optional[datetime],
+              definition_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Builds the insert parameters of a started test, as bound by TestManager.ingest_rows.
+
+    Parameters:
+    - test_run_id (uuid.UUID): ID of the test run the test belongs to.
+    - test_id (str): ID of the test.
+    - test_name (str, optional): Name of the test. None for a known definition, ingest_rows fills it in.
+    - test_parameters (Any): Parameters of the test. None when they are kept on the definition.
+    - timestamp (datetime, optional): Timestamp of the test start.
+    - definition_id (int, optional): ID of the TestDefinition of the test.
+
+    Returns:
+    - dict: The row of the tests table, without a status yet.
+    """
+    return {
+        "test_id": test_id,
+        "test_name": fit(test_name, TEST_NAME_LENGTH),
+        "test_parameters": test_parameters,
+        "timestamp": timestamp,
+        "test_run_id": test_run_id,
+        "definition_id": definition_id,
+        "test_status": None,
+        "duration": None,
+        "error_exception": None,
+        "setup_ns": None,
+        "call_ns": None,
+        "teardown_ns": None,
+    }
+
+
+def definition_row(definition_id: int, nodeid: str, test_name: Optional[str], test_parameters: Any,
+                   first_seen: Optional[datetime]) -> Dict[str, Any]:
+    """
+    Builds the insert parameters of a TestDefinition, as bound by TestManager.ingest_rows.
+
+    Parameters:
+    - definition_id (int): ID of the definition.
+    - nodeid (str): pytest node ID of the test.
+    - test_name (str, optional): Name of the test.
+    - test_parameters (Any): Parameters of the test.
+    - first_seen (datetime, optional): Timestamp of the test start that reported the definition.
+
+    Returns:
+    - dict: The row of the test_definitions table.
+    """
+    return {
+        "definition_id": definition_id,
+        "nodeid": nodeid,
+        "test_name": fit(test_name, TEST_NAME_LENGTH),
+        "test_parameters": test_parameters,
+        "first_seen": first_seen,
+    }
+
+
+def merge_finish(started: Dict[str, Dict[str, Any]], finished: List[Dict[str, Any]], test_id: str,
+                 test_status: Optional[str], error_exception: Optional[str], duration: Optional[float],
+                 setup_ns: Optional[int] = None, call_ns: Optional[int] = None, teardown_ns: Optional[int] = None):
+    """
+    Applies a finish event to the rows of a batch. A test started in the same batch gets its result merged into its
+    insert row, any other test gets an entry of the executemany UPDATE.
+
+    Parameters:
+    - started (Dict[str, Dict[str, Any]]): Rows of the tests started in the batch, by test ID.
+    - finished (List[Dict[str, Any]]): Update parameters of the tests started in earlier batches.
+    - test_id (str): ID of the finished test.
+    - test_status (str, optional): Status of the test.
+    - error_exception (str, optional): Error message of the test.
+    - duration (float, optional): Duration of the call phase of the test in seconds.
+    - setup_ns (int, optional): Duration of the setup phase in nanoseconds.
+    - call_ns (int, optional): Duration of the call phase in nanoseconds.
+    - teardown_ns (int, optional): Duration of the teardown phase in nanoseconds.
+    """
+    error_exception = fit(error_exception, ERROR_LENGTH)
+    row = started.get(test_id)
+    if row is not None:
+        row["test_status"] = test_status
+        row["duration"] = duration
+        row["error_exception"] = error_exception
+        row["setup_ns"] = setup_ns
+        row["call_ns"] = call_ns
+        row["teardown_ns"] = teardown_ns
+    else:
+        finished.append({
+            "b_test_id": test_id,
+            "b_test_status": test_status,
+            "b_duration": duration,
+            "b_error_exception": error_exception,
+            "b_setup_ns": setup_ns,
+            "b_call_ns": call_ns,
+            "b_teardown_ns": teardown_ns,
+        })
+
+
+def event_rows(test_run_id, events: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+    """
+    Builds the rows of TestManager.ingest_rows from a batch of JSON test events.
+
+    A start event may reference a TestDefinition: with its full definition (definition_id or nodeid, plus test_name
+    and test_parameters), or by definition_id alone once the definition is known to the service.
+
+    Parameters:
+    - test_run_id (uuid.UUID): ID of the test run the events belong to.
+    - events (List[Dict[str, Any]]): Events in the order they were produced, see TestManager.ingest_events.
+
+    Raises:
+    - ValueError: If an event has an unknown type.
+
+    Returns:
+    - Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]], Dict[int, Dict[str, Any]]]: The rows of the started tests
+      by test ID, the update parameters of the finished tests, and the definitions reported in the batch by ID.
+    """
+    started = {}
+    finished = []
+    definitions = {}
+
+    for event in events:
+        event_type = event.get("type")
+        if event_type == "start":
+            timestamp = event.get("timestamp")
+            timestamp = datetime.fromisoformat(timestamp) if timestamp else None
+            nodeid = event.get("nodeid")
+            definition_id = event.get("definition_id")
+            if definition_id is None and nodeid is not None:
+                definition_id = definition_id_of(nodeid)
+            if nodeid is not None:
+                definitions[definition_id] = definition_row(
+                    definition_id, nodeid, event.get("test_name"), event.get("test_parameters"), timestamp,
+                )
+            started[event["test_id"]] = start_row(
+                test_run_id, event["test_id"], event.get("test_name"),
+                None if definition_id is not None else event.get("test_parameters"), timestamp, definition_id,
+            )
+        elif event_type == "finish":
+            merge_finish(started, finished, event["test_id"], event.get("test_status"),
+                         event.get("error_exception"), event.get("duration"),
+                         event.get("setup_ns"), event.get("call_ns"), event.get("teardown_ns"))
+        else:
+            raise ValueError(f"Unknown event type: {event_type}")
+
+    return started, finished, definitions
+
+
+class MissingDefinitionsError(ValueError):
+    """
+    Raised when a batch references test definitions by ID that the database does not hold.
+
+    The client is expected to send the batch again with the full definitions (HTTP 409).
+    """
+
+    def __init__(self, definition_ids: List[int]):
+        super().__init__(f"Unknown test definitions: {definition_ids}")
+        self.definition_ids = definition_ids
+
+
 class TestManager:
     """
     Manages interactions with the database for test runs and tests.
@@ -57,10 +306,13 @@ class TestManager:
     - create_test: Creates a new test in the database.
     - finish_test: Marks a test as finished in the database.
     - finish_test_run: Marks a test run as finished in the database.
+    - ingest_events: Persists a batch of test start/finish events in a single transaction.
+    - get_run_summary: Retrieves the aggregates of a test run.
     - print_tables: Prints information from the database tables.
     - empty_table: Empties the specified database table.
     - get_tests_by_run_id: Retrieves tests associated with a specific test run ID.
     - get_all_tests: Retrieves all tests from the database.
+    - get_tests_page: Retrieves one page of tests, newest first, matching the given filters.
     """
     def __init__(self, db):
         self.db = db
@@ -81,6 +333,7 @@ class TestManager:
 
             test_run = TestRun(test_run_id=test_run_id, start_time=start_time)
             self.db.add(test_run)
+            self.db.add(self._empty_run_summary(test_run_id))
             self.db.commit()  # Commit the transaction
             logger.info("Test run creation successful")
             return test_run
@@ -105,8 +358,9 @@ class TestManager:
         - Test: The created Test object.
         """
         try:
-            test = Test(test_id=test_id, test_name=test_name, test_run_id=test_run_id, test_parameters=test_parameters, timestamp=timestamp)
+            test = Test(test_id=test_id, test_name=fit(test_name, TEST_NAME_LENGTH), test_run_id=test_run_id, test_parameters=test_parameters, timestamp=timestamp)
             self.db.add(test)
+            self._update_run_summary(test_run_id, timestamps=[timestamp])
             self.db.commit()
             logger.info("Test creation successful")
             return test
@@ -116,15 +370,19 @@ class TestManager:
             logger.error(f"Error occurred while creating test: {e}")
             raise e
 
-    def finish_test(self, test_id: uuid.UUID, test_status: str, duration: int, error_exception: str = None):
+    def finish_test(self, test_id: uuid.UUID, test_status: str, duration: float, error_exception: str = None,
+                    setup_ns: Optional[int] = None, call_ns: Optional[int] = None, teardown_ns: Optional[int] = None):
         """
         Marks a test as finished in the database.
 
         Parameters:
         - test_id (uuid.UUID): Unique identifier for the test.
         - test_status (str): Status of the test (e.g., "PASSED", "FAILED").
-        - duration (int): Duration of the test execution.
+        - duration (float): Duration of the test execution in seconds.
         - error_exception (str, optional): Exception message if the test encountered an error.
+        - setup_ns (int, optional): Duration of the setup phase in nanoseconds.
+        - call_ns (int, optional): Duration of the call phase in nanoseconds.
+        - teardown_ns (int, optional): Duration of the teardown phase in nanoseconds.
 
         Returns:
         - Test: The updated Test object.
@@ -132,9 +390,16 @@ class TestManager:
         try:
             test = self.db.query(Test).filter(Test.test_id == test_id).first()
             if test:
+                # A test finished twice is only counted once in the run summary
+                if test.test_status is None:
+                    self._update_run_summary(test.test_run_id, results=[(test_status, duration)])
+                    self._update_flakiness([(test.definition_id, test_status)])
                 test.test_status = test_status
                 test.duration = duration
-                test.error_exception = error_exception
+                test.error_exception = fit(error_exception, ERROR_LENGTH)
+                test.setup_ns = setup_ns
+                test.call_ns = call_ns
+                test.teardown_ns = teardown_ns
                 self.db.commit()
                 logger.info("Test finished successfully")
                 return test
@@ -165,6 +430,7 @@ class TestManager:
             test_run = self.db.query(TestRun).filter(TestRun.test_run_id == test_run_id).first()
             if test_run:
                 test_run.end_time = finish_time
+                self._update_run_summary(test_run_id, timestamps=[finish_time])
                 self.db.commit()
                 logger.info("Test run finished successfully")
             else:
@@ -175,6 +441,633 @@ class TestManager:
             logger.error(f"Error occurred while finishing test run: {e}")
             raise e
 
+    def ingest_events(self, test_run_id: uuid.UUID, events: List[Dict[str, Any]]):
+        """
+        Persists a batch of test start/finish events in a single transaction.
+
+        Start events are written with one multi-row upsert, so a batch that is delivered twice does not fail on
+        duplicate test IDs. A finish event whose start is in the same batch is merged into the inserted row; the
+        remaining finish events are applied with one executemany UPDATE.
+
+        Parameters:
+        - test_run_id (uuid.UUID): ID of the test run the events belong to.
+        - events (List[Dict[str, Any]]): Events in the order they were produced. Each event has a "type" of
+          "start" (test_id, test_name, test_parameters, timestamp, and optionally nodeid and definition_id) or
+          "finish" (test_id, test_status, error_exception, duration, and optionally setup_ns, call_ns and
+          teardown_ns).
+
+        Raises:
+        - ValueError: If an event has an unknown type.
+        - MissingDefinitionsError: If a start event references an unknown definition by ID alone.
+
+        Returns:
+        - int: Number of events persisted.
+        """
+        started, finished, definitions = event_rows(test_run_id, events)
+        return self.ingest_rows(test_run_id, started, finished, len(events), definitions)
+
+    def ingest_rows(self, test_run_id: uuid.UUID, started: Dict[str, Dict[str, Any]], finished: List[Dict[str, Any]],
+                    event_count: int, definitions: Optional[Dict[int, Dict[str, Any]]] = None):
+        """
+        Persists the rows of a batch of test events in a single transaction.
+
+        The rows are built with start_row, definition_row and merge_finish, either from JSON events by ingest_events
+        or straight from a binary request body by Wire.decode_events. New definitions are inserted, known ones are
+        left untouched. Tests that reference a known definition by ID alone get their name from it.
+
+        Parameters:
+        - test_run_id (uuid.UUID): ID of the test run the events belong to.
+        - started (Dict[str, Dict[str, Any]]): Rows of the tests started in the batch, by test ID.
+        - finished (List[Dict[str, Any]]): Update parameters of the tests started in earlier batches.
+        - event_count (int): Number of events the rows were built from.
+        - definitions (Dict[int, Dict[str, Any]], optional): Definitions reported in the batch, by ID.
+
+        Raises:
+        - MissingDefinitionsError: If a test references a definition that is neither in the batch nor in the database.
+
+        Returns:
+        - int: Number of events persisted.
+        """
+        definitions = definitions or {}
+        self._resolve_definition_names(started, definitions)
+
+        try:
+            if definitions:
+                self.db.execute(self._insert_definitions_statement(), list(definitions.values()))
+            # Tests that already have a status were counted in the run summary by an earlier delivery
+            finished_ids = [row["test_id"] for row in started.values() if row["test_status"] is not None]
+            finished_ids += [row["b_test_id"] for row in finished]
+            counted = set()
+            # Tests started in earlier batches carry their definition in the database only
+            definition_ids = {}
+            if finished_ids:
+                for test_id, test_status, definition_id in self.db.execute(
+                    select(Test.test_id, Test.test_status, Test.definition_id).where(Test.test_id.in_(finished_ids))
+                ):
+                    definition_ids[test_id] = definition_id
+                    if test_status is not None:
+                        counted.add(test_id)
+            results = [(row["test_status"], row["duration"]) for row in started.values()
+                       if row["test_status"] is not None and row["test_id"] not in counted]
+            results += [(row["b_test_status"], row["b_duration"]) for row in finished if row["b_test_id"] not in counted]
+            outcomes = [(row["definition_id"], row["test_status"]) for row in started.values()
+                        if row["test_status"] is not None and row["test_id"] not in counted]
+            outcomes += [(definition_ids.get(row["b_test_id"]), row["b_test_status"]) for row in finished
+                         if row["b_test_id"] not in counted]
+
+            if started:
+                self.db.execute(self._upsert_tests_statement(), list(started.values()))
+            if finished:
+                finish_statement = (
+                    update(Test.__table__)
+                    .where(Test.__table__.c.test_id == bindparam("b_test_id"))
+                    .values(
+                        test_status=bindparam("b_test_status"),
+                        duration=bindparam("b_duration"),
+                        error_exception=bindparam("b_error_exception"),
+                        setup_ns=bindparam("b_setup_ns"),
+                        call_ns=bindparam("b_call_ns"),
+                        teardown_ns=bindparam("b_teardown_ns"),
+                    )
+                )
+                self.db.execute(finish_statement, finished)
+            self._update_run_summary(test_run_id, results=results, timestamps=[row["timestamp"] for row in started.values()])
+            self._update_flakiness(outcomes)
+            self.db.commit()
+            logger.info(f"Ingested {event_count} events for test run {test_run_id}")
+            return event_count
+
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error occurred while ingesting events: {e}")
+            raise e
+
+    def _resolve_definition_names(self, started: Dict[str, Dict[str, Any]], definitions: Dict[int, Dict[str, Any]]):
+        """
+        Fills in the names of the started tests that reference a definition by ID alone.
+
+        Parameters:
+        - started (Dict[str, Dict[str, Any]]): Rows of the tests started in the batch, by test ID.
+        - definitions (Dict[int, Dict[str, Any]]): Definitions reported in the batch, by ID.
+
+        Raises:
+        - MissingDefinitionsError: If a referenced definition is neither in the batch nor in the database.
+        """
+        unnamed = [row for row in started.values() if row["test_name"] is None and row["definition_id"] is not None]
+        if not unnamed:
+            return
+
+        names = {definition_id: row["test_name"] for definition_id, row in definitions.items()}
+        lookup = {row["definition_id"] for row in unnamed} - names.keys()
+        if lookup:
+            names.update(self.db.execute(
+                select(TestDefinition.definition_id, TestDefinition.test_name)
+                .where(TestDefinition.definition_id.in_(lookup))
+            ).tuples().all())
+            missing = lookup - names.keys()
+            if missing:
+                raise MissingDefinitionsError(sorted(missing))
+
+        for row in unnamed:
+            row["test_name"] = names[row["definition_id"]]
+
+    def _insert_definitions_statement(self):
+        """
+        Builds the multi-row insert of test definitions, skipping the definitions that already exist.
+
+        Returns:
+        - Insert: The insert statement to execute with a list of parameter sets.
+        """
+        table = TestDefinition.__table__
+        dialect = self.db.get_bind().dialect.name
+
+        if dialect == "mysql":
+            return mysql.insert(table).prefix_with("IGNORE")
+        if dialect == "sqlite":
+            return sqlite.insert(table).on_conflict_do_nothing(index_elements=[table.c.definition_id])
+        return insert(table)
+
+    def _empty_run_summary(self, test_run_id: uuid.UUID) -> RunSummary:
+        """
+        Builds the summary of a test run without any finished tests.
+
+        Parameters:
+        - test_run_id (uuid.UUID): ID of the test run.
+
+        Returns:
+        - RunSummary: The new, not yet added, RunSummary object.
+        """
+        return RunSummary(test_run_id=test_run_id, passed=0, failed=0, skipped=0, error=0, unknown=0,
+                          total_duration=0.0, duration_histogram={})
+
+    def _update_run_summary(self, test_run_id: uuid.UUID, results: List[Tuple[str, Optional[float]]] = (),
+                            timestamps: List[Optional[datetime]] = ()):
+        """
+        Folds finished tests and start timestamps into the summary of a test run.
+
+        The summary row is locked for the rest of the transaction, so concurrent batches of the same run do not lose
+        each other's counts. The caller commits.
+
+        Parameters:
+        - test_run_id (uuid.UUID): ID of the test run.
+        - results (List[Tuple[str, float]]): (test_status, duration) of each newly finished test.
+        - timestamps (List[datetime]): Start timestamps of tests, or the finish time of the run.
+        """
+        summary = self.db.scalars(
+            select(RunSummary).where(RunSummary.test_run_id == test_run_id).with_for_update()
+        ).first()
+        if summary is None:
+            summary = self._empty_run_summary(test_run_id)
+            self.db.add(summary)
+
+        if results:
+            histogram = dict(summary.duration_histogram or {})
+            for test_status, duration in results:
+                column = SUMMARY_STATUS_COLUMNS.get(test_status, "unknown")
+                setattr(summary, column, getattr(summary, column) + 1)
+                if duration is not None:
+                    summary.total_duration += duration
+                    bucket = str(duration_bucket(duration))
+                    histogram[bucket] = histogram.get(bucket, 0) + 1
+
+            summary.duration_histogram = histogram
+            summary.p50_duration = histogram_percentile(histogram, 0.50)
+            summary.p95_duration = histogram_percentile(histogram, 0.95)
+
+        timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+        if timestamps:
+            first, last = min(timestamps), max(timestamps)
+            if summary.first_timestamp is None or first < summary.first_timestamp:
+                summary.first_timestamp = first
+            if summary.last_timestamp is None or last > summary.last_timestamp:
+                summary.last_timestamp = last
+
+    def _update_flakiness(self, outcomes: List[Tuple[Optional[int], str]]):
+        """
+        Folds finished tests into the rolling outcome history of their definitions, see Flakiness.
+
+        The history rows are locked for the rest of the transaction, like the run summary. Tests without a definition,
+        skipped and unknown ones are left out. The caller commits.
+
+        Parameters:
+        - outcomes (List[Tuple[int, str]]): (definition_id, test_status) of each newly finished test, in finish order.
+        """
+        outcomes = [(definition_id, test_status) for definition_id, test_status in outcomes
+                    if definition_id is not None and failed_outcome(test_status) is not None]
+        if not outcomes:
+            return
+
+        histories = {
+            history.definition_id: history
+            for history in self.db.scalars(
+                select(TestFlakiness)
+                .where(TestFlakiness.definition_id.in_({definition_id for definition_id, _ in outcomes}))
+                .with_for_update()
+            )
+        }
+        now = datetime.now()
+        for definition_id, test_status in outcomes:
+            history = histories.get(definition_id)
+            if history is None:
+                history = histories[definition_id] = TestFlakiness(
+                    definition_id=definition_id, outcomes=0, recorded=0, failures=0, flips=0)
+                self.db.add(history)
+
+            failed = failed_outcome(test_status)
+            if history.recorded and bool(history.outcomes & 1) != failed:
+                history.flips += 1
+            history.outcomes, history.recorded = fold_outcome(history.outcomes, history.recorded, failed)
+            history.failures += failed
+            history.window_failures = window_failures(history.outcomes, history.recorded)
+            history.window_flips = window_flips(history.outcomes, history.recorded)
+            history.last_status = test_status
+            history.updated_at = now
+
+    def get_flaky_tests(self, min_flips: int = 3, min_runs: int = 5, limit: int = 100):
+        """
+        Retrieves the flakiest tests, ranked by their pass/fail flips within the window of recent outcomes.
+
+        Parameters:
+        - min_flips (int, optional): Fewest flips within the window for a test to be flaky. Defaults to 3.
+        - min_runs (int, optional): Fewest outcomes recorded for a test to be considered. Defaults to 5.
+        - limit (int, optional): Maximum number of tests returned. Defaults to 100.
+
+        Returns:
+        - List[TestFlakiness]: The flakiest tests first, with their definitions.
+        """
+        try:
+            return list(self.db.scalars(
+                select(TestFlakiness)
+                .where(TestFlakiness.window_flips >= min_flips, TestFlakiness.recorded >= min_runs)
+                .order_by(TestFlakiness.window_flips.desc(), TestFlakiness.window_failures.desc(),
+                          TestFlakiness.definition_id)
+                .limit(limit)
+            ))
+        except SQLAlchemyError as e:
+            logger.error(f"An error occurred: {e}")
+            return []
+
+    def get_run_summary(self, test_run_id: uuid.UUID):
+        """
+        Retrieves the aggregates of a test run.
+
+        Parameters:
+        - test_run_id (uuid.UUID): ID of the test run.
+
+        Returns:
+        - RunSummary: The summary of the test run, or None if the run has no summary.
+        """
+        try:
+            return self.db.get(RunSummary, test_run_id)
+        except SQLAlchemyError as e:
+            logger.error(f"An error occurred: {e}")
+            return None
+
+    def record_fixture_stats(self, test_run_id: uuid.UUID, fixtures: List[Dict[str, Any]]):
+        """
+        Stores the fixture profile of a test run, replacing the one stored by an earlier delivery.
+
+        Parameters:
+        - test_run_id (uuid.UUID): ID of the profiled test run.
+        - fixtures (List[Dict[str, Any]]): One entry per fixture with fixture_name, baseid, scope, setups, setup_ns,
+          max_setup_ns, teardown_ns and uses.
+
+        Returns:
+        - int: Number of fixtures stored.
+        """
+        columns = ("fixture_name", "baseid", "scope", "setups", "setup_ns", "max_setup_ns", "teardown_ns", "uses")
+        try:
+            self.db.execute(delete(FixtureStat).where(FixtureStat.test_run_id == test_run_id))
+            if fixtures:
+                self.db.execute(insert(FixtureStat), [
+                    {"test_run_id": test_run_id, **{column: fixture.get(column) for column in columns}}
+                    for fixture in fixtures
+                ])
+            self.db.commit()
+            logger.info(f"Stored {len(fixtures)} fixture stats for test run {test_run_id}")
+            return len(fixtures)
+
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error occurred while storing fixture stats: {e}")
+            raise e
+
+    def get_fixture_stats(self, test_run_id: uuid.UUID, limit: int = 50):
+        """
+        Retrieves the fixtures of a test run, ranked by total setup and teardown time.
+
+        Parameters:
+        - test_run_id (uuid.UUID): ID of the test run.
+        - limit (int, optional): Maximum number of fixtures returned. Defaults to 50.
+
+        Returns:
+        - List[FixtureStat]: The most expensive fixtures first.
+        """
+        try:
+            return list(self.db.scalars(
+                select(FixtureStat)
+                .where(FixtureStat.test_run_id == test_run_id)
+                .order_by((FixtureStat.setup_ns + FixtureStat.teardown_ns).desc(), FixtureStat.fixture_name)
+                .limit(limit)
+            ))
+        except SQLAlchemyError as e:
+            logger.error(f"An error occurred: {e}")
+            return []
+
+    def record_profiles(self, test_run_id: uuid.UUID, profiles: List[Dict[str, Any]]):
+        """
+        Stores the profiles of the slowest test calls of a run, replacing the ones stored by an earlier delivery.
+
+        Parameters:
+        - test_run_id (uuid.UUID): ID of the profiled test run.
+        - profiles (List[Dict[str, Any]]): One entry per test with test_id, call_ns, samples, sample_interval_us and
+          stacks in the collapsed-stack format.
+
+        Returns:
+        - int: Number of profiles stored.
+        """
+        columns = ("test_id", "call_ns", "samples", "sample_interval_us", "stacks")
+        try:
+            self.db.execute(delete(TestProfile).where(TestProfile.test_run_id == test_run_id))
+            if profiles:
+                self.db.execute(insert(TestProfile), [
+                    {"test_run_id": test_run_id, **{column: profile.get(column) for column in columns}}
+                    for profile in profiles
+                ])
+            self.db.commit()
+            logger.info(f"Stored {len(profiles)} profiles for test run {test_run_id}")
+            return len(profiles)
+
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error occurred while storing profiles: {e}")
+            raise e
+
+    def get_profile(self, test_id: str):
+        """
+        Retrieves the profile of a test.
+
+        Parameters:
+        - test_id (str): ID of the test.
+
+        Returns:
+        - TestProfile: The profile, or None if the test was not profiled.
+        """
+        try:
+            return self.db.get(TestProfile, test_id)
+        except SQLAlchemyError as e:
+            logger.error(f"An error occurred: {e}")
+            return None
+
+    def get_profiled_test_ids(self, test_run_id: uuid.UUID):
+        """
+        Retrieves the IDs of the profiled tests of a run.
+
+        Parameters:
+        - test_run_id (uuid.UUID): ID of the test run.
+
+        Returns:
+        - Set[str]: The IDs of the tests that have a profile.
+        """
+        try:
+            return set(self.db.scalars(select(TestProfile.test_id).where(TestProfile.test_run_id == test_run_id)))
+        except SQLAlchemyError as e:
+            logger.error(f"An error occurred: {e}")
+            return set()
+
+    def get_duration_stats(self, since: datetime):
+        """
+        Computes the median and 95th percentile of the wall time of every test definition, over its recent runs.
+
+        The wall time of a test is the sum of its setup, call and teardown when they were recorded, its duration
+        otherwise. Skipped tests and tests without a definition are left out.
+
+        Parameters:
+        - since (datetime): Only the tests started at or after this time are considered.
+
+        Returns:
+        - Dict[int, Tuple[float, float, int]]: p50 and p95 in seconds and the number of runs, by definition ID.
+        """
+        phases = Test.setup_ns + Test.call_ns + Test.teardown_ns
+        wall_time = func.coalesce(phases / 1e9, Test.duration)
+        query = (
+            select(Test.definition_id, wall_time)
+            .where(Test.definition_id.isnot(None), Test.timestamp >= since,
+                   Test.test_status.in_(("PASSED", "FAILED", "ERROR")), wall_time.isnot(None))
+            .execution_options(yield_per=10000)
+        )
+        try:
+            durations = defaultdict(list)
+            for definition_id, duration in self.db.execute(query):
+                durations[definition_id].append(float(duration))
+        except SQLAlchemyError as e:
+            logger.error(f"An error occurred: {e}")
+            return {}
+
+        stats = {}
+        for definition_id, values in durations.items():
+            values.sort()
+            stats[definition_id] = (nearest_rank(values, 0.5), nearest_rank(values, 0.95), len(values))
+        return stats
+
+    def rollup_day(self, day: date):
+        """
+        Rolls up the results of one day into test_daily_rollups, replacing the rollups of an earlier pass.
+
+        A day without raw test rows, already deleted by the retention, keeps its rollups.
+
+        Parameters:
+        - day (date): The day the tests started.
+
+        Returns:
+        - int: Number of test results rolled up.
+        """
+        start = datetime.combine(day, datetime.min.time())
+        query = (
+            select(Test.definition_id, Test.test_name, Test.test_status, Test.duration)
+            .where(Test.timestamp >= start, Test.timestamp < start + timedelta(days=1))
+            .execution_options(yield_per=10000)
+        )
+        try:
+            rollups: Dict[int, Dict[str, Any]] = {}
+            durations = defaultdict(list)
+            count = 0
+            for definition_id, test_name, test_status, duration in self.db.execute(query):
+                if definition_id is None:
+                    definition_id = definition_id_of(test_name or "")
+                rollup = rollups.get(definition_id)
+                if rollup is None:
+                    rollup = rollups[definition_id] = {
+                        "day": day, "definition_id": definition_id, "test_name": test_name, "total_duration": 0.0,
+                        **{column: 0 for column in SUMMARY_STATUS_COLUMNS.values()},
+                    }
+                rollup[SUMMARY_STATUS_COLUMNS.get(test_status, "unknown")] += 1
+                if duration is not None:
+                    rollup["total_duration"] += duration
+                    durations[definition_id].append(duration)
+                count += 1
+            if not count:
+                return 0
+
+            for definition_id, rollup in rollups.items():
+                values = sorted(durations[definition_id])
+                rollup["p50_duration"] = nearest_rank(values, 0.5) if values else None
+                rollup["p95_duration"] = nearest_rank(values, 0.95) if values else None
+                rollup["max_duration"] = values[-1] if values else None
+
+            self.db.execute(delete(TestDailyRollup).where(TestDailyRollup.day == day))
+            self.db.execute(insert(TestDailyRollup), list(rollups.values()))
+            self.db.commit()
+            logger.info(f"Rolled up {count} test results of {day}")
+            return count
+
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error occurred while rolling up {day}: {e}")
+            raise e
+
+    def get_rollup_bounds(self):
+        """
+        Retrieves the range of days to roll up: the first day with raw test rows and the last day rolled up.
+
+        Returns:
+        - Tuple[date, date]: Either can be None, when there are no tests or no rollups.
+        """
+        first_timestamp = self.db.scalar(select(func.min(Test.timestamp)))
+        last_rolled_up = self.db.scalar(select(func.max(TestDailyRollup.day)))
+        return (first_timestamp.date() if first_timestamp is not None else None), last_rolled_up
+
+    def purge_tests(self, before: datetime, batch_size: int = 1000):
+        """
+        Deletes the raw test rows started before a time, with their profiles, in short transactions of batch_size
+        tests, so concurrent ingestion is never blocked for long. The fixture stats of the runs started before the
+        time are deleted too. Runs, their summaries, definitions and rollups are kept.
+
+        Roll the days up before purging them, see Retention.
+
+        Parameters:
+        - before (datetime): Tests started before this time are deleted.
+        - batch_size (int, optional): Number of tests deleted per transaction. Defaults to 1000.
+
+        Returns:
+        - int: Number of tests deleted.
+        """
+        deleted = 0
+        try:
+            while True:
+                # Oldest first along ix_tests_timestamp, each batch is a small range scan
+                test_ids = list(self.db.scalars(
+                    select(Test.test_id).where(Test.timestamp < before).order_by(Test.timestamp).limit(batch_size)
+                ))
+                if not test_ids:
+                    break
+                self.db.execute(delete(TestProfile).where(TestProfile.test_id.in_(test_ids)))
+                self.db.execute(delete(Test).where(Test.test_id.in_(test_ids)))
+                self.db.commit()
+                deleted += len(test_ids)
+
+            old_runs = select(TestRun.test_run_id).where(TestRun.start_time < before)
+            self.db.execute(delete(FixtureStat).where(FixtureStat.test_run_id.in_(old_runs)))
+            self.db.commit()
+            logger.info(f"Purged {deleted} tests started before {before}")
+            return deleted
+
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error occurred while purging tests: {e}")
+            raise e
+
+    def get_trends(self, since: date, definition_id: Optional[int] = None, test_name: Optional[str] = None):
+        """
+        Retrieves the daily rollups of a test, or of all tests summed per day.
+
+        Percentiles cannot be summed, the trend of all tests carries the counts and total duration only.
+
+        Parameters:
+        - since (date): First day of the trend.
+        - definition_id (int, optional): Restricts the trend to one test definition.
+        - test_name (str, optional): Restricts the trend to the tests of this name.
+
+        Returns:
+        - List[Dict[str, Any]]: One entry per day with results, oldest first, and per definition when several tests
+          share the name.
+        """
+        status_columns = [getattr(TestDailyRollup, column) for column in SUMMARY_STATUS_COLUMNS.values()]
+        if definition_id is not None or test_name is not None:
+            columns = [TestDailyRollup.day, TestDailyRollup.definition_id, *status_columns, TestDailyRollup.total_duration,
+                       TestDailyRollup.p50_duration, TestDailyRollup.p95_duration, TestDailyRollup.max_duration]
+            query = select(*columns)
+            if definition_id is not None:
+                query = query.where(TestDailyRollup.definition_id == definition_id)
+            if test_name is not None:
+                query = query.where(TestDailyRollup.test_name == test_name)
+            query = query.where(TestDailyRollup.day >= since).order_by(TestDailyRollup.day)
+        else:
+            query = (
+                select(TestDailyRollup.day, *[func.sum(column).label(column.key) for column in status_columns],
+                       func.sum(TestDailyRollup.total_duration).label("total_duration"))
+                .where(TestDailyRollup.day >= since)
+                .group_by(TestDailyRollup.day)
+                .order_by(TestDailyRollup.day)
+            )
+        try:
+            return [dict(row) for row in self.db.execute(query).mappings()]
+        except SQLAlchemyError as e:
+            logger.error(f"An error occurred: {e}")
+            return []
+
+    def _upsert_tests_statement(self):
+        """
+        Builds the multi-row insert used for start events, as an upsert where the dialect supports one.
+
+        On conflict the start columns are overwritten, while the finish columns keep their stored value unless the
+        incoming row carries one.
+
+        Returns:
+        - Insert: The insert statement to execute with a list of parameter sets.
+        """
+        table = Test.__table__
+        dialect = self.db.get_bind().dialect.name
+
+        if dialect == "mysql":
+            statement = mysql.insert(table)
+            incoming = statement.inserted
+            return statement.on_duplicate_key_update(
+                test_name=incoming.test_name,
+                test_parameters=incoming.test_parameters,
+                timestamp=incoming.timestamp,
+                test_run_id=incoming.test_run_id,
+                definition_id=incoming.definition_id,
+                test_status=func.coalesce(incoming.test_status, table.c.test_status),
+                duration=func.coalesce(incoming.duration, table.c.duration),
+                setup_ns=func.coalesce(incoming.setup_ns, table.c.setup_ns),
+                call_ns=func.coalesce(incoming.call_ns, table.c.call_ns),
+                teardown_ns=func.coalesce(incoming.teardown_ns, table.c.teardown_ns),
+                error_exception=func.coalesce(incoming.error_exception, table.c.error_exception),
+            )
+
+        if dialect == "sqlite":
+            statement = sqlite.insert(table)
+            incoming = statement.excluded
+            return statement.on_conflict_do_update(
+                index_elements=[table.c.test_id],
+                set_={
+                    "test_name": incoming.test_name,
+                    "test_parameters": incoming.test_parameters,
+                    "timestamp": incoming.timestamp,
+                    "test_run_id": incoming.test_run_id,
+                    "definition_id": incoming.definition_id,
+                    "test_status": func.coalesce(incoming.test_status, table.c.test_status),
+                    "duration": func.coalesce(incoming.duration, table.c.duration),
+                    "setup_ns": func.coalesce(incoming.setup_ns, table.c.setup_ns),
+                    "call_ns": func.coalesce(incoming.call_ns, table.c.call_ns),
+                    "teardown_ns": func.coalesce(incoming.teardown_ns, table.c.teardown_ns),
+                    "error_exception": func.coalesce(incoming.error_exception, table.c.error_exception),
+                },
+            )
+
+        return insert(table)
+
     def print_tables(self):
         """
         Prints information from the database tables.
@@ -254,6 +1147,240 @@ class TestManager:
             logger.error(f"An unexpected error occurred: {e}")
             return None
 
+    def get_tests_page(self, limit: int, after: Optional[Tuple[datetime, str]] = None, test_status: Optional[str] = None,
+                       test_run_id: Optional[str] = None, test_name: Optional[str] = None,
+                       since: Optional[datetime] = None, until: Optional[datetime] = None):
+        """
+        Retrieves one page of tests, newest first, matching the given filters.
+
+        Pages are selected with a keyset on (timestamp, test_id) rather than an OFFSET, so fetching a page deep in the
+        history costs the same as fetching the first one.
+
+        Parameters:
+        - limit (int): Maximum number of tests in the page.
+        - after (Tuple[datetime, str], optional): (timestamp, test_id) of the last test of the previous page.
+        - test_status (str, optional): Only tests with this status.
+        - test_run_id (str, optional): Only tests of this test run.
+        - test_name (str, optional): Only tests whose name starts with this prefix.
+        - since (datetime, optional): Only tests started at or after this time.
+        - until (datetime, optional): Only tests started before this time.
+
+        Returns:
+        - List[Test]: The tests of the page, or None if an error occurs.
+        """
+        try:
+            statement = select(Test)
+            if test_status:
+                statement = statement.where(Test.test_status == test_status)
+            if test_run_id:
+                statement = statement.where(Test.test_run_id == test_run_id)
+            if test_name:
+                statement = statement.where(Test.test_name.startswith(test_name, autoescape=True))
+            if since:
+                statement = statement.where(Test.timestamp >= since)
+            if until:
+                statement = statement.where(Test.timestamp < until)
+            if after:
+                statement = statement.where(tuple_(Test.timestamp, Test.test_id) < tuple_(*after))
+
+            statement = statement.order_by(Test.timestamp.desc(), Test.test_id.desc()).limit(limit)
+            return list(self.db.scalars(statement))
+        except SQLAlchemyError as e:
+            logger.error(f"An error occurred: {e}")
+            return None
+
+class AsyncTestManager:
+    """
+    Awaitable variant of TestManager for use on an event loop.
+
+    Each method runs the matching TestManager method through AsyncSession.run_sync. The queries are the same, but the
+    I/O goes through the async driver of the session (aiomysql, aiosqlite), so a database round trip suspends the
+    calling coroutine instead of blocking the event loop.
+
+    Methods:
+    - create_test_run: Creates a new test run in the database.
+    - create_test: Creates a new test in the database.
+    - finish_test: Marks a test as finished in the database.
+    - finish_test_run: Marks a test run as finished in the database.
+    - ingest_events: Persists a batch of test start/finish events in a single transaction.
+    - get_run_summary: Retrieves the aggregates of a test run.
+    - get_tests_by_run_id: Retrieves tests associated with a specific test run ID.
+    - get_all_tests: Retrieves all tests from the database.
+    - get_tests_page: Retrieves one page of tests, newest first, matching the given filters.
+    - iter_tests: Yields tests page by page, newest first, matching the given filters.
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _run(self, method: Callable[..., Any], *args, **kwargs):
+        """
+        Runs a TestManager method against the synchronous facade of the async session.
+
+        Parameters:
+        - method: The unbound TestManager method to run.
+        - *args, **kwargs: Arguments passed on to the method.
+
+        Returns:
+        - Any: The return value of the method.
+        """
+        return await self.db.run_sync(lambda session: method(TestManager(session), *args, **kwargs))
+
+    async def create_test_run(self, test_run_id: uuid.UUID, start_time: datetime):
+        """
+        Awaitable TestManager.create_test_run.
+        """
+        return await self._run(TestManager.create_test_run, test_run_id, start_time)
+
+    async def create_test(self, test_id: uuid.UUID, test_name: str, test_parameters: Dict[str, Any], timestamp: datetime, test_run_id: uuid.UUID):
+        """
+        Awaitable TestManager.create_test.
+        """
+        return await self._run(TestManager.create_test, test_id, test_name, test_parameters, timestamp, test_run_id)
+
+    async def finish_test(self, test_id: uuid.UUID, test_status: str, duration: float, error_exception: str = None,
+                          setup_ns: Optional[int] = None, call_ns: Optional[int] = None, teardown_ns: Optional[int] = None):
+        """
+        Awaitable TestManager.finish_test.
+        """
+        return await self._run(TestManager.finish_test, test_id, test_status, duration, error_exception,
+                               setup_ns, call_ns, teardown_ns)
+
+    async def finish_test_run(self, test_run_id: int, finish_time: datetime):
+        """
+        Awaitable TestManager.finish_test_run.
+        """
+        return await self._run(TestManager.finish_test_run, test_run_id, finish_time)
+
+    async def ingest_events(self, test_run_id: uuid.UUID, events: List[Dict[str, Any]]):
+        """
+        Awaitable TestManager.ingest_events.
+        """
+        return await self._run(TestManager.ingest_events, test_run_id, events)
+
+    async def ingest_rows(self, test_run_id: uuid.UUID, started: Dict[str, Dict[str, Any]], finished: List[Dict[str, Any]],
+                          event_count: int, definitions: Optional[Dict[int, Dict[str, Any]]] = None):
+        """
+        Awaitable TestManager.ingest_rows.
+        """
+        return await self._run(TestManager.ingest_rows, test_run_id, started, finished, event_count, definitions)
+
+    async def get_flaky_tests(self, min_flips: int = 3, min_runs: int = 5, limit: int = 100):
+        """
+        Awaitable TestManager.get_flaky_tests.
+        """
+        return await self._run(TestManager.get_flaky_tests, min_flips, min_runs, limit)
+
+    async def get_run_summary(self, test_run_id: uuid.UUID):
+        """
+        Awaitable TestManager.get_run_summary.
+        """
+        return await self._run(TestManager.get_run_summary, test_run_id)
+
+    async def record_fixture_stats(self, test_run_id: uuid.UUID, fixtures: List[Dict[str, Any]]):
+        """
+        Awaitable TestManager.record_fixture_stats.
+        """
+        return await self._run(TestManager.record_fixture_stats, test_run_id, fixtures)
+
+    async def get_fixture_stats(self, test_run_id: uuid.UUID, limit: int = 50):
+        """
+        Awaitable TestManager.get_fixture_stats.
+        """
+        return await self._run(TestManager.get_fixture_stats, test_run_id, limit)
+
+    async def record_profiles(self, test_run_id: uuid.UUID, profiles: List[Dict[str, Any]]):
+        """
+        Awaitable TestManager.record_profiles.
+        """
+        return await self._run(TestManager.record_profiles, test_run_id, profiles)
+
+    async def get_profile(self, test_id: str):
+        """
+        Awaitable TestManager.get_profile.
+        """
+        return await self._run(TestManager.get_profile, test_id)
+
+    async def get_profiled_test_ids(self, test_run_id: uuid.UUID):
+        """
+        Awaitable TestManager.get_profiled_test_ids.
+        """
+        return await self._run(TestManager.get_profiled_test_ids, test_run_id)
+
+    async def get_duration_stats(self, since: datetime):
+        """
+        Awaitable TestManager.get_duration_stats.
+        """
+        return await self._run(TestManager.get_duration_stats, since)
+
+    async def get_trends(self, since: date, definition_id: Optional[int] = None, test_name: Optional[str] = None):
+        """
+        Awaitable TestManager.get_trends.
+        """
+        return await self._run(TestManager.get_trends, since, definition_id, test_name)
+
+    async def get_tests_by_run_id(self, run_id):
+        """
+        Awaitable TestManager.get_tests_by_run_id.
+        """
+        return await self._run(TestManager.get_tests_by_run_id, run_id)
+
+    async def get_all_tests(self):
+        """
+        Awaitable TestManager.get_all_tests.
+        """
+        return await self._run(TestManager.get_all_tests)
+
+    async def get_tests_page(self, limit: int, after: Optional[Tuple[datetime, str]] = None, **filters):
+        """
+        Awaitable TestManager.get_tests_page.
+        """
+        return await self._run(TestManager.get_tests_page, limit, after, **filters)
+
+    async def iter_tests(self, limit: int, batch_size: int = 100, after: Optional[Tuple[datetime, str]] = None, **filters) -> AsyncIterator[Test]:
+        """
+        Yields tests page by page, newest first, matching the given filters.
+
+        Only one batch of rows is held in memory at a time, so a large report can be streamed as the rows arrive.
+
+        Parameters:
+        - limit (int): Maximum number of tests yielded.
+        - batch_size (int): Number of tests fetched per query.
+        - after (Tuple[datetime, str], optional): (timestamp, test_id) of the test to continue after.
+        - **filters: Filters accepted by TestManager.get_tests_page.
+
+        Yields:
+        - Test: The matching tests.
+        """
+        remaining = limit
+        while remaining > 0:
+            size = min(batch_size, remaining)
+            page = await self.get_tests_page(size, after, **filters) or []
+            for test in page:
+                yield test
+            if len(page) < size:
+                return
+            remaining -= size
+            after = (page[-1].timestamp, page[-1].test_id)
+
+def get_async_database_url(database_url: str) -> str:
+    """
+    Derives the URL of the async driver from a sync database URL.
+
+    Parameters:
+    - database_url (str): URL using a sync driver, e.g. mysql+pymysql://... or sqlite:///...
+
+    Returns:
+    - str: The same URL using the matching async driver (aiomysql or aiosqlite).
+    """
+    scheme, separator, rest = database_url.partition("://")
+    dialect = scheme.split("+")[0]
+    async_drivers = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+    if dialect not in async_drivers:
+        raise ValueError(f"No async driver configured for database dialect: {dialect}")
+
+    return f"{async_drivers[dialect]}{separator}{rest}"
+
 def reset_and_test_with_example():
     """
     Resets the database, creates example test runs and tests, and prints table information.
@@ -0,0 +1,368 @@
+"""
+Columnar Export
+===============
+
+This module exports the test runs and tests to Parquet or Arrow IPC files for offline analysis: the files load
+directly into pandas (read_parquet, read_feather), DuckDB (read_parquet, or SELECT from an Arrow table) or Polars.
+
+Rows are read from a server-side cursor (stream_results) one batch at a time, each batch is converted to an Arrow
+record batch and written out as its own Parquet row group or Arrow IPC record batch, so memory stays bounded by the
+batch size whatever the size of the tables. The same code backs the command line and the streaming GET /export
+endpoints of the service.
+
+The tests are exported with the node ID and parameters of their definition and the start and end time of their run,
+so a single file answers most duration and failure questions. The parameters are stored as JSON text, their shape
+differs from test to test.
+
+Exceptions:
+- ExportUnavailable: pyarrow is not installed (HTTP 501).
+
+Classes:
+- ChunkSink: Write-only file object handing the written bytes over chunk by chunk.
+
+Functions:
+- tests_query, runs_query: Build the queries of the exported rows.
+- record_batch: Converts a batch of rows into an Arrow record batch.
+- open_writer: Opens the Parquet or Arrow IPC writer of a file.
+- export: Writes the rows of a query to a file, from a sync session (command line).
+- stream_export: Yields the bytes of an export, from an async session (endpoints).
+- main: Command line entry point.
+
+Usage:
+- `python Export.py tests tests.parquet --since 2024-01-01` from the App directory.
+- `python Export.py runs runs.arrow --format arrow`
+
+Dependencies:
+- pyarrow (optional): Writes the Parquet and Arrow IPC files.
+"""
+import os
+import json
+import asyncio
+import argparse
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Optional, Sequence
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
+from SetupDatabase import TestRun, Test, TestDefinition, RunSummary
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+# Rows converted and written at a time, the size of a Parquet row group
+BATCH_SIZE = 10000
+
+# Media type of each export format
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+# Exported columns, in the order of the queries, with their Arrow type names
+TESTS_COLUMNS = (
+    ("test_id", "string"),
+    ("test_run_id", "string"),
+    ("definition_id", "int64"),
+    ("nodeid", "string"),
+    ("test_name", "string"),
+    ("test_status", "string"),
+    ("timestamp", "timestamp"),
+    ("duration", "float64"),
+    ("setup_ns", "int64"),
+    ("call_ns", "int64"),
+    ("teardown_ns", "int64"),
+    ("error_exception", "string"),
+    ("test_parameters", "json"),
+    ("run_start_time", "timestamp"),
+    ("run_end_time", "timestamp"),
+)
+RUNS_COLUMNS = (
+    ("test_run_id", "string"),
+    ("start_time", "timestamp"),
+    ("end_time", "timestamp"),
+    ("passed", "int64"),
+    ("failed", "int64"),
+    ("skipped", "int64"),
+    ("error", "int64"),
+    ("unknown", "int64"),
+    ("total_duration", "float64"),
+    ("p50_duration", "float64"),
+    ("p95_duration", "float64"),
+)
+
+
+class ExportUnavailable(RuntimeError):
+    """
+    pyarrow, which writes the export files, is not installed.
+    """
+
+
+def _arrow_type(name: str) -> Any:
+    """
+    Returns the Arrow type of a column type name of TESTS_COLUMNS and RUNS_COLUMNS.
+    """
+    if name == "timestamp":
+        return pyarrow.timestamp("us")
+    if name == "json":
+        return pyarrow.string()
+    return getattr(pyarrow, name)()
+
+
+def schema_of(columns: Sequence[Any]) -> Any:
+    """
+    Builds the Arrow schema of exported columns.
+
+    Parameters:
+    - columns (Sequence[Tuple[str, str]]): TESTS_COLUMNS or RUNS_COLUMNS.
+
+    Raises:
+    - ExportUnavailable: If pyarrow is not installed.
+
+    Returns:
+    - pyarrow.Schema: The schema of the export.
+    """
+    if pyarrow is None:
+        raise ExportUnavailable("The export needs pyarrow, install it with `pip install pyarrow`")
+    return pyarrow.schema([(name, _arrow_type(kind)) for name, kind in columns])
+
+
+def tests_query(since: Optional[datetime] = None, until: Optional[datetime] = None, run_id: Optional[str] = None):
+    """
+    Builds the query of the exported tests, in the order of TESTS_COLUMNS plus the parameters of the test row.
+
+    Parameters:
+    - since (datetime, optional): Only tests started at or after this time.
+    - until (datetime, optional): Only tests started before this time.
+    - run_id (str, optional): Only tests of this test run.
+
+    Returns:
+    - Select: The query.
+    """
+    query = (
+        select(Test.test_id, Test.test_run_id, Test.definition_id, TestDefinition.nodeid, Test.test_name,
+               Test.test_status, Test.timestamp, Test.duration, Test.setup_ns, Test.call_ns, Test.teardown_ns,
+               Test.error_exception, TestDefinition.test_parameters, TestRun.start_time, TestRun.end_time,
+               Test.test_parameters)
+        .outerjoin(TestDefinition, TestDefinition.definition_id == Test.definition_id)
+        .outerjoin(TestRun, TestRun.test_run_id == Test.test_run_id)
+    )
+    if since is not None:
+        query = query.where(Test.timestamp >= since)
+    if until is not None:
+        query = query.where(Test.timestamp < until)
+    if run_id is not None:
+        query = query.where(Test.test_run_id == run_id)
+    return query
+
+
+def runs_query(since: Optional[datetime] = None, until: Optional[datetime] = None, run_id: Optional[str] = None):
+    """
+    Builds the query of the exported runs, in the order of RUNS_COLUMNS.
+
+    Parameters:
+    - since (datetime, optional): Only runs started at or after this time.
+    - until (datetime, optional): Only runs started before this time.
+    - run_id (str, optional): Only this test run.
+
+    Returns:
+    - Select: The query.
+    """
+    query = (
+        select(TestRun.test_run_id, TestRun.start_time, TestRun.end_time, RunSummary.passed, RunSummary.failed,
+               RunSummary.skipped, RunSummary.error, RunSummary.unknown, RunSummary.total_duration,
+               RunSummary.p50_duration, RunSummary.p95_duration)
+        .outerjoin(RunSummary, RunSummary.test_run_id == TestRun.test_run_id)
+    )
+    if since is not None:
+        query = query.where(TestRun.start_time >= since)
+    if until is not None:
+        query = query.where(TestRun.start_time < until)
+    if run_id is not None:
+        query = query.where(TestRun.test_run_id == run_id)
+    return query
+
+
+def record_batch(rows: List[Sequence[Any]], schema: Any) -> Any:
+    """
+    Converts a batch of rows into an Arrow record batch, column by column.
+
+    Parameters:
+    - rows (List[Row]): Rows of tests_query or runs_query.
+    - schema (pyarrow.Schema): The schema of the export, see schema_of.
+
+    Returns:
+    - pyarrow.RecordBatch: The batch.
+    """
+    columns = [list(column) for column in zip(*rows)] if rows else [[] for _ in range(len(schema) + 1)]
+    if "test_parameters" in schema.names:
+        # Tests keep their parameters on the definition when they have one, on the test row (the extra last
+        # column of tests_query) otherwise
+        index = schema.get_field_index("test_parameters")
+        columns[index] = [
+            None if parameters is None else json.dumps(parameters)
+            for parameters in (definition if definition is not None else own
+                               for definition, own in zip(columns[index], columns[-1]))
+        ]
+    return pyarrow.RecordBatch.from_arrays(
+        [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema)
+
+
+class ChunkSink:
+    """
+    Write-only file object keeping what the writers wrote until it is taken, to stream a file as it is written.
+    """
+
+    def __init__(self):
+        self.closed = False
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        """
+        Returns the bytes written since the last call.
+        """
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def open_writer(sink: Any, schema: Any, file_format: str) -> Any:
+    """
+    Opens the writer of an export file.
+
+    Parameters:
+    - sink (Any): A path or a writable file object.
+    - schema (pyarrow.Schema): The schema of the export.
+    - file_format (str): "parquet", or "arrow" for the Arrow IPC file format (Feather v2).
+
+    Returns:
+    - Any: A writer with write_batch() and close().
+    """
+    if file_format == "parquet":
+        return pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+    return pyarrow.ipc.new_file(sink, schema)
+
+
+def export(db: Any, query: Any, columns: Sequence[Any], sink: Any, file_format: str = "parquet",
+           batch_size: int = BATCH_SIZE) -> int:
+    """
+    Writes the rows of a query to an export file, one batch at a time from a server-side cursor.
+
+    Parameters:
+    - db (Session): A sync SQLAlchemy session.
+    - query (Select): tests_query() or runs_query().
+    - columns (Sequence[Tuple[str, str]]): TESTS_COLUMNS or RUNS_COLUMNS, matching the query.
+    - sink (Any): A path or a writable file object.
+    - file_format (str, optional): "parquet" or "arrow". Defaults to "parquet".
+    - batch_size (int, optional): Rows per batch. Defaults to BATCH_SIZE.
+
+    Raises:
+    - ExportUnavailable: If pyarrow is not installed.
+
+    Returns:
+    - int: Number of rows exported.
+    """
+    schema = schema_of(columns)
+    writer = open_writer(sink, schema, file_format)
+    count = 0
+    try:
+        result = db.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+        for rows in result.partitions():
+            writer.write_batch(record_batch(rows, schema))
+            count += len(rows)
+    finally:
+        writer.close()
+    return count
+
+
+async def stream_export(db: AsyncSession, query: Any, columns: Sequence[Any], file_format: str = "parquet",
+                        batch_size: int = BATCH_SIZE) -> AsyncIterator[bytes]:
+    """
+    Yields the bytes of an export file as it is written, one batch at a time from a server-side cursor.
+
+    The conversion and compression of every batch run in a thread, off the event loop.
+
+    Parameters:
+    - db (AsyncSession): An async SQLAlchemy session, left open.
+    - query (Select): tests_query() or runs_query().
+    - columns (Sequence[Tuple[str, str]]): TESTS_COLUMNS or RUNS_COLUMNS, matching the query.
+    - file_format (str, optional): "parquet" or "arrow". Defaults to "parquet".
+    - batch_size (int, optional): Rows per batch. Defaults to BATCH_SIZE.
+
+    Raises:
+    - ExportUnavailable: If pyarrow is not installed.
+
+    Yields:
+    - bytes: The next part of the file.
+    """
+    schema = schema_of(columns)
+    sink = ChunkSink()
+    writer = open_writer(sink, schema, file_format)
+    try:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            await asyncio.to_thread(lambda: writer.write_batch(record_batch(rows, schema)))
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def main():
+    """
+    Command line entry point, see the module documentation.
+    """
+    parser = argparse.ArgumentParser(description="Export test runs or tests to a Parquet or Arrow IPC file.")
+    parser.add_argument("table", choices=("tests", "runs"), help="rows to export")
+    parser.add_argument("output", help="path of the file to write")
+    parser.add_argument("--format", choices=tuple(MEDIA_TYPES), default=None,
+                        help="file format (default: from the output extension, else parquet)")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="only rows started at or after this ISO time")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="only rows started before this ISO time")
+    parser.add_argument("--run-id", help="only this test run")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"rows per batch and Parquet row group (default: {BATCH_SIZE})")
+    args = parser.parse_args()
+    file_format = args.format or ("arrow" if args.output.endswith((".arrow", ".feather", ".ipc")) else "parquet")
+
+    load_dotenv()
+    engine = create_engine(os.getenv("SQLALCHEMY_DATABASE_URL"))
+    Session = sessionmaker(bind=engine)
+    build_query, columns = (tests_query, TESTS_COLUMNS) if args.table == "tests" else (runs_query, RUNS_COLUMNS)
+    try:
+        with Session() as db:
+            count = export(db, build_query(args.since, args.until, args.run_id), columns, args.output, file_format,
+                           args.batch_size)
+    except ExportUnavailable as e:
+        parser.exit(1, f"{e}\n")
+    finally:
+        engine.dispose()
+    print(f"Exported {count} {args.table} to {args.output}.")
+
+
+if __name__ == "__main__":
+
+    main()
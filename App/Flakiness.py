@@ -0,0 +1,115 @@
+"""
+Flaky Tests
+===========
+
+This module folds test outcomes into the rolling flakiness state of a test definition (see
+SetupDatabase.TestFlakiness), so flaky tests are found without rescanning the history of the tests table.
+
+The last WINDOW outcomes of a test are kept as a bitset, bit 0 the latest, a set bit for a failure. Every new
+outcome shifts the bitset by one, so the failures and the pass/fail flips within the window are counted from the
+bitset alone:
+- failures: the set bits.
+- flips: the set bits of outcomes ^ (outcomes >> 1), every pair of consecutive outcomes that differ.
+
+A test that broke and stays broken flips once, a test that was fixed again flips twice; a flaky test keeps
+flipping, so it is ranked by its flips within the window.
+
+Functions:
+- failed_outcome: Maps a test status to an outcome, or None for statuses that say nothing about flakiness.
+- fold_outcome: Adds an outcome to a bitset of outcomes.
+- window_failures: Counts the failures within the window.
+- window_flips: Counts the pass/fail flips within the window.
+- outcome_string: Renders the outcomes of the window, the oldest first.
+"""
+from typing import Optional, Tuple
+
+# Number of outcomes kept per test
+WINDOW = 32
+
+# Outcome of each test status, skipped and unknown tests neither pass nor fail
+FAILED_STATUSES = {"PASSED": False, "FAILED": True, "ERROR": True}
+
+
+def _popcount(value: int) -> int:
+    """
+    Counts the set bits of a non-negative integer.
+    """
+    return bin(value).count("1")
+
+
+def _mask(bits: int) -> int:
+    """
+    Returns a mask of the lowest bits, none for bits <= 0.
+    """
+    return (1 << bits) - 1 if bits > 0 else 0
+
+
+def failed_outcome(test_status: Optional[str]) -> Optional[bool]:
+    """
+    Maps a test status to an outcome.
+
+    Parameters:
+    - test_status (str): Status of the test (e.g., "PASSED", "FAILED").
+
+    Returns:
+    - bool: True for a failure, False for a pass, None for statuses that are not an outcome (skipped, unknown).
+    """
+    return FAILED_STATUSES.get(test_status)
+
+
+def fold_outcome(outcomes: int, recorded: int, failed: bool) -> Tuple[int, int]:
+    """
+    Adds an outcome to a bitset of outcomes.
+
+    Parameters:
+    - outcomes (int): The bitset of the last outcomes, bit 0 the latest.
+    - recorded (int): Number of outcomes recorded so far.
+    - failed (bool): Whether the new outcome is a failure.
+
+    Returns:
+    - Tuple[int, int]: The new bitset and number of outcomes recorded.
+    """
+    return ((outcomes << 1) | int(failed)) & _mask(WINDOW), recorded + 1
+
+
+def window_failures(outcomes: int, recorded: int) -> int:
+    """
+    Counts the failures within the window.
+
+    Parameters:
+    - outcomes (int): The bitset of the last outcomes.
+    - recorded (int): Number of outcomes recorded.
+
+    Returns:
+    - int: Number of failures among the last min(recorded, WINDOW) outcomes.
+    """
+    return _popcount(outcomes & _mask(min(recorded, WINDOW)))
+
+
+def window_flips(outcomes: int, recorded: int) -> int:
+    """
+    Counts the pass/fail flips within the window.
+
+    Parameters:
+    - outcomes (int): The bitset of the last outcomes.
+    - recorded (int): Number of outcomes recorded.
+
+    Returns:
+    - int: Number of consecutive outcomes that differ among the last min(recorded, WINDOW) outcomes.
+    """
+    return _popcount((outcomes ^ (outcomes >> 1)) & _mask(min(recorded, WINDOW) - 1))
+
+
+def outcome_string(outcomes: int, recorded: int) -> str:
+    """
+    Renders the outcomes of the window, the oldest first: "P" for a pass, "F" for a failure.
+
+    Parameters:
+    - outcomes (int): The bitset of the last outcomes.
+    - recorded (int): Number of outcomes recorded.
+
+    Returns:
+    - str: One letter per outcome within the window.
+    """
+    count = min(recorded, WINDOW)
+    return "".join("F" if outcomes >> bit & 1 else "P" for bit in reversed(range(count)))
@@ -0,0 +1,93 @@
+"""
+Flame Graphs
+============
+
+This module lays out the profiles of the slowest test calls (see SetupDatabase.TestProfile) as flame graphs.
+
+A profile is stored in the collapsed-stack format: one line per distinct stack, frames from the outermost to the
+innermost separated by ";", followed by a space and its weight (the microseconds attributed to the stack by the
+plugin, a number of samples for other tools). The stacks are merged into a tree and every node becomes a frame of the
+graph, as wide as its share of the total weight. The graph is drawn
+top-down (an icicle graph), the test function first.
+
+Functions:
+- parse_collapsed: Parses a profile in the collapsed-stack format.
+- flame_frames: Lays out the frames of the flame graph of a profile.
+"""
+import zlib
+from typing import Any, Dict, List, Tuple
+
+# Frames narrower than this share of the total weight are not drawn
+MIN_WIDTH = 0.002
+
+
+def parse_collapsed(stacks: str) -> List[Tuple[List[str], int]]:
+    """
+    Parses a profile in the collapsed-stack format. Malformed lines are skipped.
+
+    Parameters:
+    - stacks (str): The profile, one "frame;frame;frame weight" line per stack.
+
+    Returns:
+    - List[Tuple[List[str], int]]: The frames of every stack, outermost first, with its weight.
+    """
+    parsed = []
+    for line in (stacks or "").splitlines():
+        stack, _, count = line.rpartition(" ")
+        if stack and count.isdigit():
+            parsed.append((stack.split(";"), int(count)))
+    return parsed
+
+
+def flame_frames(stacks: str, min_width: float = MIN_WIDTH) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    Lays out the frames of the flame graph of a profile.
+
+    Parameters:
+    - stacks (str): The profile in the collapsed-stack format.
+    - min_width (float, optional): Share of the total weight below which a frame is not drawn. Defaults to MIN_WIDTH.
+
+    Returns:
+    - Tuple[List[Dict[str, Any]], int, int]: The frames, each with its name, weight, depth, and x offset and width
+      in percent of the graph, the total weight, and the depth of the deepest frame drawn.
+    """
+    # Node: [weight, children by name]
+    root: List[Any] = [0, {}]
+    for frames, count in parse_collapsed(stacks):
+        root[0] += count
+        node = root
+        for name in frames:
+            node = node[1].setdefault(name, [0, {}])
+            node[0] += count
+
+    total = root[0]
+    layout: List[Dict[str, Any]] = []
+    max_depth = 0
+    if not total:
+        return layout, 0, 0
+
+    # Depth-first from the root, which is not drawn, widest children first
+    stack = [(-1, 0, None, root)]
+    while stack:
+        depth, x, name, (weight, children) = stack.pop()
+        if name is not None:
+            if weight / total < min_width:
+                continue
+            max_depth = max(max_depth, depth)
+            layout.append({
+                "name": name,
+                "weight": weight,
+                "depth": depth,
+                "x": 100.0 * x / total,
+                "width": 100.0 * weight / total,
+                # Stable warm color per function, as in flamegraph.pl
+                "hue": zlib.crc32(name.encode("utf-8")) % 50,
+            })
+
+        ordered = []
+        for child_name, child in sorted(children.items(), key=lambda item: -item[1][0]):
+            ordered.append((depth + 1, x, child_name, child))
+            x += child[0]
+        stack.extend(reversed(ordered))
+
+    return layout, total, max_depth
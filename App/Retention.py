@@ -0,0 +1,124 @@
+"""
+Retention of Historical Test Rows
+=================================
+
+This module keeps the tests table bounded: the results of every past day are rolled up into test_daily_rollups
+(counts per status and duration percentiles per test and day), which are kept forever, and the raw test rows
+older than the retention period are deleted in short batches. Trend queries (GET /trends) read the rollups only,
+so they stay fast over years of history.
+
+The tests table is not partitioned: MySQL does not partition tables with foreign keys, and the tests are referenced
+by test_profiles and reference test_runs and test_definitions. The oldest rows are instead deleted along the
+ix_tests_timestamp index, batch by batch, which keeps every transaction short.
+
+A day is always rolled up before its rows are deleted, and a day whose rows are gone keeps its rollups, so running
+the commands again, or after an interruption, is safe.
+
+Functions:
+- rollup: Rolls up every completed day that has not been rolled up yet.
+- purge: Rolls up, then deletes the raw test rows older than the retention period.
+- main: Command line entry point.
+
+Usage:
+- `python Retention.py rollup` daily, e.g. from cron, to keep the trends up to date.
+- `python Retention.py purge --keep-days 90` to also delete the raw rows older than 90 days.
+- `python Retention.py rollup --since 2024-01-01` rolls the days since a date up again, e.g. after late results.
+"""
+import os
+import argparse
+from datetime import date, datetime, timedelta
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from Database import TestManager
+
+# Days of raw test rows kept by default
+KEEP_DAYS = 90
+
+# Tests deleted per transaction
+BATCH_SIZE = 1000
+
+
+def rollup(test_manager: TestManager, until: Optional[date] = None, since: Optional[date] = None) -> int:
+    """
+    Rolls up every day from the day after the last one rolled up (or since) to the day before until.
+
+    Parameters:
+    - test_manager (TestManager): The TestManager bound to a database session.
+    - until (date, optional): First day not rolled up. Defaults to today, which is not complete yet.
+    - since (date, optional): First day rolled up, again if it already was. Defaults to the day after the last
+      rolled up day, or to the first day with tests.
+
+    Returns:
+    - int: Number of test results rolled up.
+    """
+    until = until or date.today()
+    first_test_day, last_rolled_up = test_manager.get_rollup_bounds()
+    if since is None:
+        since = last_rolled_up + timedelta(days=1) if last_rolled_up is not None else first_test_day
+    if since is None:
+        return 0
+    # Days without raw rows are skipped cheaply, but never walk back before the first test
+    if first_test_day is not None:
+        since = max(since, first_test_day)
+
+    count = 0
+    day = since
+    while day < until:
+        count += test_manager.rollup_day(day)
+        day += timedelta(days=1)
+    return count
+
+
+def purge(test_manager: TestManager, keep_days: int = KEEP_DAYS, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Rolls up the past days, then deletes the raw test rows of the days older than keep_days.
+
+    Parameters:
+    - test_manager (TestManager): The TestManager bound to a database session.
+    - keep_days (int, optional): Number of days of raw test rows kept, today included. Defaults to KEEP_DAYS.
+    - batch_size (int, optional): Number of tests deleted per transaction. Defaults to BATCH_SIZE.
+
+    Returns:
+    - int: Number of tests deleted.
+    """
+    # Whole days only, so a day is either complete or entirely deleted
+    cutoff = date.today() - timedelta(days=keep_days - 1)
+    rollup(test_manager)
+    return test_manager.purge_tests(datetime.combine(cutoff, datetime.min.time()), batch_size)
+
+
+def main():
+    """
+    Command line entry point, see the module documentation.
+    """
+    parser = argparse.ArgumentParser(description="Roll up and purge historical test results.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rollup_parser = subparsers.add_parser("rollup", help="roll up the completed days that are not rolled up yet")
+    rollup_parser.add_argument("--since", type=date.fromisoformat,
+                               help="roll up the days since this date (YYYY-MM-DD) again")
+    purge_parser = subparsers.add_parser("purge", help="roll up, then delete the raw test rows of the old days")
+    purge_parser.add_argument("--keep-days", type=int, default=KEEP_DAYS,
+                              help=f"days of raw test rows kept, today included (default: {KEEP_DAYS})")
+    purge_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                              help=f"tests deleted per transaction (default: {BATCH_SIZE})")
+    args = parser.parse_args()
+    if args.command == "purge" and args.keep_days < 1:
+        parser.error("--keep-days must be at least 1")
+
+    load_dotenv()
+    engine = create_engine(os.getenv("SQLALCHEMY_DATABASE_URL"))
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        test_manager = TestManager(db)
+        if args.command == "rollup":
+            print(f"Rolled up {rollup(test_manager, since=args.since)} test results.")
+        else:
+            print(f"Deleted {purge(test_manager, args.keep_days, args.batch_size)} test rows.")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+
+    main()
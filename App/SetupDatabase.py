@@ -6,24 +6,37 @@ This module defines SQLAlchemy models for the database tables related to test ru
 
 Classes:
 - TestRun: Represents a test run entity, with attributes such as test_run_id, start_time, end_time, and tests.
+- TestDefinition: Represents a test of the suite shared across runs, with attributes such as definition_id, nodeid, test_name, and test_parameters.
 - Test: Represents a test entity, with attributes such as test_id, test_name, test_status, duration, error_exception, test_parameters, timestamp, and test_run_id.
+- RunSummary: Represents the aggregates of a test run, with attributes such as per-status counts, total_duration, p50_duration, p95_duration, first_timestamp, and last_timestamp.
+- FixtureStat: Represents the profile of a fixture in a test run, with attributes such as fixture_name, scope, setups, setup_ns, teardown_ns, and uses.
+- TestProfile: Represents the sampled stacks of a slow test call, with attributes such as test_id, call_ns, samples, and stacks.
+- TestFlakiness: Represents the rolling outcome history of a test definition, with attributes such as outcomes, recorded, window_failures, and window_flips.
+- TestDailyRollup: Represents the results of a test over one day, with attributes such as day, definition_id, per-status counts, and duration percentiles.
 
 Functions:
+- definition_id_of: Derives the ID of a TestDefinition from a pytest node ID.
 - drop_all_tables: Drops all tables from the database.
+- migrate_database: Adds missing tables, columns and indexes to an existing database without dropping data.
 - main: Main function to initialize the database by dropping existing tables (if any) and creating new ones.
 
 Usage:
 - Import this module and use the TestRun and Test classes to interact with the database.
 - Call the main function to initialize the database.
+- Run `python SetupDatabase.py --migrate` to bring an existing database up to date with the models.
 """
 import os
+import hashlib
+import argparse
 from dotenv import load_dotenv
 from sqlalchemy import MetaData
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy import create_engine
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.exc import ProgrammingError
-from sqlalchemy import create_engine, Column, CHAR, String, ForeignKey, Enum, JSON, DateTime, Float, text
+from sqlalchemy import create_engine, Column, CHAR, String, Text, ForeignKey, Enum, JSON, Date, DateTime, Float, Integer, BigInteger, Index, text
 
 Base =  declarative_base()
 load_dotenv()
@@ -37,6 +50,7 @@ class TestRun(Base):
     - start_time: Start time of the test run.
     - end_time: End time of the test run.
     - tests: Relationship attribute linking TestRun to Test entities.
+    - summary: Relationship attribute linking TestRun to its RunSummary entity.
     """
     __tablename__ = "test_runs"
     
@@ -44,6 +58,31 @@ class TestRun(Base):
     start_time = Column(DateTime, nullable=True)
     end_time = Column(DateTime, nullable=True)
     tests = relationship("Test", back_populates="test_run")
+    summary = relationship("RunSummary", back_populates="test_run", uselist=False)
+    fixtures = relationship("FixtureStat", back_populates="test_run")
+    profiles = relationship("TestProfile", back_populates="test_run")
+
+class TestDefinition(Base):
+    """
+    Represents a test as defined in the test suite, shared by its results across runs.
+
+    The ID is derived from the pytest node ID (the first 63 bits of its SHA-1), so the plugin computes it locally
+    and repeat runs reference a known test by this integer instead of resending its name and parameters.
+
+    Attributes:
+    - definition_id: SHA-1 based identifier of the test, see definition_id_of.
+    - nodeid: pytest node ID of the test.
+    - test_name: Name of the test.
+    - test_parameters: Parameters of the test stored as JSON.
+    - first_seen: Timestamp of the first result reported for the test.
+    """
+    __tablename__ = "test_definitions"
+
+    definition_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    nodeid = Column(Text)
+    test_name = Column(String(length=80))
+    test_parameters = Column(JSON)
+    first_seen = Column(DateTime, nullable=True)
 
 class Test(Base):
     """
@@ -53,15 +92,35 @@ class Test(Base):
     - test_id: Unique identifier for the test.
     - test_name: Name of the test.
     - test_status: Status of the test (e.g., PASSED, FAILED).
-    - duration: Duration of the test.
+    - duration: Duration of the call phase of the test, in seconds.
     - error_exception: Error message or exception encountered during the test.
     - test_parameters: Parameters of the test stored as JSON.
     - timestamp: Timestamp of the test.
     - test_run_id: Foreign key referencing the associated TestRun.
+    - definition_id: Foreign key referencing the TestDefinition, None for tests reported without one.
+    - setup_ns: Duration of the setup phase (fixture setup), in nanoseconds.
+    - call_ns: Duration of the call phase, in nanoseconds.
+    - teardown_ns: Duration of the teardown phase (fixture teardown), in nanoseconds.
     - test_run: Relationship attribute linking Test to TestRun entity.
+    - definition: Relationship attribute linking Test to its TestDefinition, loaded together with the tests.
+
+    Tests reported with a definition keep their parameters on the definition only, test_parameters stays empty.
+    Use the parameters property to read them either way.
+
+    Indexes:
+    - ix_tests_run_status: Tests of a run, optionally filtered by status.
+    - ix_tests_name_timestamp: History of a test by name, optionally within a time range.
+    - ix_tests_timestamp: Keyset pagination of the full report, newest first.
+    - ix_tests_definition_timestamp: History of a test by definition.
     """
     __tablename__ = "tests"
-    
+    __table_args__ = (
+        Index("ix_tests_run_status", "test_run_id", "test_status"),
+        Index("ix_tests_name_timestamp", "test_name", "timestamp"),
+        Index("ix_tests_timestamp", "timestamp", "test_id"),
+        Index("ix_tests_definition_timestamp", "definition_id", "timestamp"),
+    )
+
     test_id = Column(CHAR(36), index=True, primary_key=True)
     test_name = Column(String(length=80))
     test_status = Column(Enum("PASSED", "FAILED", "SKIPPED", "ERROR", "UNKNOWN"), nullable=True)
@@ -70,7 +129,209 @@ class Test(Base):
     test_parameters = Column(JSON)  # Store parameters as JSON
     timestamp = Column(DateTime)
     test_run_id = Column(CHAR(36), ForeignKey("test_runs.test_run_id"))
+    definition_id = Column(BigInteger, ForeignKey("test_definitions.definition_id"), nullable=True)
+    setup_ns = Column(BigInteger, nullable=True)
+    call_ns = Column(BigInteger, nullable=True)
+    teardown_ns = Column(BigInteger, nullable=True)
     test_run = relationship("TestRun", back_populates="tests")
+    definition = relationship("TestDefinition", lazy="selectin")
+
+    @property
+    def parameters(self):
+        """
+        Parameters of the test, from its definition when it has one.
+        """
+        if self.definition is not None:
+            return self.definition.test_parameters
+        return self.test_parameters
+
+class RunSummary(Base):
+    """
+    Represents the aggregates of a test run, maintained incrementally as its tests finish.
+
+    Attributes:
+    - test_run_id: Primary key and foreign key referencing the summarized TestRun.
+    - passed, failed, skipped, error, unknown: Number of finished tests per status.
+    - total_duration: Sum of the durations of the finished tests.
+    - p50_duration: Median test duration, estimated from duration_histogram.
+    - p95_duration: 95th percentile test duration, estimated from duration_histogram.
+    - duration_histogram: Counts of test durations per logarithmic bucket, stored as JSON.
+    - first_timestamp: Timestamp of the first test started in the run.
+    - last_timestamp: Timestamp of the last test started in the run, or of the run's finish.
+    - test_run: Relationship attribute linking RunSummary to TestRun.
+    """
+    __tablename__ = "run_summaries"
+
+    test_run_id = Column(CHAR(36), ForeignKey("test_runs.test_run_id"), primary_key=True)
+    passed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    error = Column(Integer, nullable=False, default=0)
+    unknown = Column(Integer, nullable=False, default=0)
+    total_duration = Column(Float, nullable=False, default=0.0)
+    p50_duration = Column(Float, nullable=True)
+    p95_duration = Column(Float, nullable=True)
+    duration_histogram = Column(JSON)
+    first_timestamp = Column(DateTime, nullable=True)
+    last_timestamp = Column(DateTime, nullable=True)
+    test_run = relationship("TestRun", back_populates="summary")
+
+class FixtureStat(Base):
+    """
+    Represents the profile of a fixture in a test run, as measured by the plugin with --reporting-fixtures.
+
+    Attributes:
+    - fixture_stat_id: Unique identifier for the row.
+    - test_run_id: Foreign key referencing the profiled TestRun.
+    - fixture_name: Name of the fixture.
+    - baseid: Node ID where the fixture is defined, empty for fixtures of plugins.
+    - scope: Scope of the fixture (session, package, module, class or function).
+    - setups: Number of times the fixture was set up.
+    - setup_ns: Total setup time in nanoseconds.
+    - max_setup_ns: Longest setup time in nanoseconds.
+    - teardown_ns: Total teardown time in nanoseconds.
+    - uses: Number of tests that used the fixture.
+    - test_run: Relationship attribute linking FixtureStat to TestRun.
+
+    Indexes:
+    - ix_fixture_stats_run: Fixtures of a run.
+    """
+    __tablename__ = "fixture_stats"
+    __table_args__ = (
+        Index("ix_fixture_stats_run", "test_run_id"),
+    )
+
+    fixture_stat_id = Column(Integer, primary_key=True, autoincrement=True)
+    test_run_id = Column(CHAR(36), ForeignKey("test_runs.test_run_id"), nullable=False)
+    fixture_name = Column(String(length=120))
+    baseid = Column(String(length=255))
+    scope = Column(Enum("session", "package", "module", "class", "function"))
+    setups = Column(Integer, nullable=False, default=0)
+    setup_ns = Column(BigInteger, nullable=False, default=0)
+    max_setup_ns = Column(BigInteger, nullable=False, default=0)
+    teardown_ns = Column(BigInteger, nullable=False, default=0)
+    uses = Column(Integer, nullable=False, default=0)
+    test_run = relationship("TestRun", back_populates="fixtures")
+
+class TestProfile(Base):
+    """
+    Represents the sampled stacks of one of the slowest test calls of a run, as captured by the plugin with
+    --reporting-profile-top.
+
+    Attributes:
+    - test_id: Primary key and foreign key referencing the profiled Test.
+    - test_run_id: Foreign key referencing the TestRun of the test.
+    - call_ns: Duration of the profiled call in nanoseconds.
+    - samples: Number of stack samples taken.
+    - sample_interval_us: Interval between two samples in microseconds.
+    - stacks: The samples in the collapsed-stack format ("frame;frame;frame microseconds" per line).
+    - test: Relationship attribute linking TestProfile to the profiled Test, loaded together with the profile.
+    - test_run: Relationship attribute linking TestProfile to TestRun.
+
+    Indexes:
+    - ix_test_profiles_run: Profiles of a run.
+    """
+    __tablename__ = "test_profiles"
+    __table_args__ = (
+        Index("ix_test_profiles_run", "test_run_id"),
+    )
+
+    test_id = Column(CHAR(36), ForeignKey("tests.test_id"), primary_key=True)
+    test_run_id = Column(CHAR(36), ForeignKey("test_runs.test_run_id"), nullable=False)
+    call_ns = Column(BigInteger)
+    samples = Column(Integer)
+    sample_interval_us = Column(Integer)
+    # MEDIUMTEXT on MySQL, a deep profile does not fit in 64 KiB
+    stacks = Column(Text(length=2 ** 24 - 1))
+    test = relationship("Test", lazy="selectin")
+    test_run = relationship("TestRun", back_populates="profiles")
+
+class TestFlakiness(Base):
+    """
+    Represents the rolling outcome history of a test definition, updated as its results finish (see Flakiness).
+
+    Attributes:
+    - definition_id: Primary key and foreign key referencing the TestDefinition.
+    - outcomes: Bitset of the last Flakiness.WINDOW outcomes, bit 0 the latest, a set bit for a failure.
+    - recorded: Number of outcomes recorded since the test was first seen.
+    - failures: Number of failures recorded since the test was first seen.
+    - flips: Number of pass/fail flips recorded since the test was first seen.
+    - window_failures: Number of failures within the window, kept next to the bitset to filter and sort on.
+    - window_flips: Number of pass/fail flips within the window, kept next to the bitset to filter and sort on.
+    - last_status: Status of the latest outcome.
+    - updated_at: Time of the latest outcome.
+    - definition: Relationship attribute linking TestFlakiness to its TestDefinition, loaded together with it.
+
+    Indexes:
+    - ix_test_flakiness_flips: Flakiest tests first.
+    """
+    __tablename__ = "test_flakiness"
+    __table_args__ = (
+        Index("ix_test_flakiness_flips", "window_flips", "window_failures"),
+    )
+
+    definition_id = Column(BigInteger, ForeignKey("test_definitions.definition_id"), primary_key=True, autoincrement=False)
+    outcomes = Column(BigInteger, nullable=False, default=0)
+    recorded = Column(Integer, nullable=False, default=0)
+    failures = Column(Integer, nullable=False, default=0)
+    flips = Column(Integer, nullable=False, default=0)
+    window_failures = Column(Integer, nullable=False, default=0)
+    window_flips = Column(Integer, nullable=False, default=0)
+    last_status = Column(Enum("PASSED", "FAILED", "SKIPPED", "ERROR", "UNKNOWN"), nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    definition = relationship("TestDefinition", lazy="selectin")
+
+class TestDailyRollup(Base):
+    """
+    Represents the results of a test over one day, kept after the raw test rows of the day are deleted by Retention.
+
+    Tests reported with a definition are rolled up by definition. Tests reported without one (the legacy /tests
+    endpoints) have no node ID, they are rolled up under definition_id_of(test_name) instead, hence no foreign key.
+
+    Attributes:
+    - day: The day the tests started.
+    - definition_id: ID of the TestDefinition of the test, or the hash of its name, see above.
+    - test_name: Name of the test.
+    - passed, failed, skipped, error, unknown: Number of results per status.
+    - total_duration: Sum of the durations of the results.
+    - p50_duration: Median duration of the results.
+    - p95_duration: 95th percentile duration of the results.
+    - max_duration: Longest duration of the results.
+
+    Indexes:
+    - ix_test_daily_rollups_definition_day: History of a test by definition.
+    """
+    __tablename__ = "test_daily_rollups"
+    __table_args__ = (
+        Index("ix_test_daily_rollups_definition_day", "definition_id", "day"),
+    )
+
+    day = Column(Date, primary_key=True)
+    definition_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    test_name = Column(String(length=80))
+    passed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    error = Column(Integer, nullable=False, default=0)
+    unknown = Column(Integer, nullable=False, default=0)
+    total_duration = Column(Float, nullable=False, default=0.0)
+    p50_duration = Column(Float, nullable=True)
+    p95_duration = Column(Float, nullable=True)
+    max_duration = Column(Float, nullable=True)
+
+def definition_id_of(nodeid: str) -> int:
+    """
+    Derives the ID of a TestDefinition from a pytest node ID: the first 63 bits of its SHA-1, a positive BIGINT.
+
+    The plugin computes the same value, see pytest_report_plugin.definitions.
+
+    Parameters:
+    - nodeid (str): pytest node ID of the test.
+
+    Returns:
+    - int: The definition ID.
+    """
+    return int.from_bytes(hashlib.sha1(nodeid.encode("utf-8")).digest()[:8], "big") >> 1
 
 def create_mysql_database(username: str, password: str, database_name: str, host: str="localhost", port: str=3306):
     """
@@ -139,6 +400,42 @@ def drop_all_tables(database_url: str):
     # Drop all tables
     metadata.drop_all(engine)
 
+def migrate_database(database_url: str):
+    """
+    Adds missing tables, columns and indexes to an existing database without dropping data.
+
+    Missing tables are created with their indexes. For existing tables, columns declared on the models but absent
+    from the database are added with ALTER TABLE, and missing indexes are created. Nothing is dropped or altered.
+
+    Parameters:
+    - database_url (str): URL of the database to migrate.
+    """
+    engine = create_engine(database_url)
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            print(f"Creating table {table.name}.")
+            table.create(bind=engine)
+            continue
+
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        with engine.begin() as conn:
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    print(f"Adding column {table.name}.{column.name}.")
+                    column_definition = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_definition}"))
+
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                print(f"Creating index {index.name} on {table.name}.")
+                index.create(bind=engine)
+
+    engine.dispose()
+
 def main():
     """
     Main function to initialize the database.
@@ -165,5 +462,14 @@ def main():
     Base.metadata.create_all(bind=engine)
     print("Creating new tables.")
 if __name__ == "__main__":
-    
-    main()
\ No newline at end of file
+
+    parser = argparse.ArgumentParser(description="Initialize the test report database.")
+    parser.add_argument("--migrate", action="store_true",
+                        help="add missing tables, columns and indexes to the existing database instead of recreating it")
+    args = parser.parse_args()
+
+    if args.migrate:
+        load_dotenv()
+        migrate_database(os.getenv("SQLALCHEMY_DATABASE_URL"))
+    else:
+        main()
\ No newline at end of file
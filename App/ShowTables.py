@@ -26,8 +26,9 @@ def main():
         print("Test Name:", test.test_name)
         print("Status:", test.test_status)
         print("Duration:", test.duration)
+        print("Setup/Call/Teardown (ns):", test.setup_ns, test.call_ns, test.teardown_ns)
         print("Error/Exception:", test.error_exception)
-        print("Test Parameters:", test.test_parameters)
+        print("Test Parameters:", test.parameters)
         print("Timestamp:", test.timestamp)
         print("Test Run ID:", test.test_run_id)
         print("---------------------------")
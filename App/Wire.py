@@ -0,0 +1,182 @@
+"""
+Wire Formats of Event Batches
+=============================
+
+This module decodes the request bodies of the bulk ingestion endpoint (POST /runs/{run_id}/events:batch).
+
+Besides plain JSON ({"events": [...]}), the plugin can send a batch as msgpack or CBOR, optionally compressed with
+gzip or zstd (Content-Type and Content-Encoding headers). The binary formats use a positional layout:
+
+    [WIRE_VERSION, strings, starts, finishes]
+    strings:  every node ID, test name, status and error message of the batch, each stored once
+    starts:   [test_id (16 UUID bytes), definition_id, node ID index, name index, test_parameters,
+               timestamp (epoch microseconds)]
+    finishes: [test_id (16 UUID bytes), status index, error index, duration, setup_ns, call_ns, teardown_ns]
+
+A start that references a definition already known to the service carries its definition_id only, with no node ID,
+name or parameters. Batches of the earlier layout versions are still accepted: version 1 starts are
+[test_id, name index, test_parameters, timestamp], and version 1 and 2 finishes have no phase durations.
+
+The binary layout is decoded straight into the insert and update parameters of TestManager.ingest_rows, without an
+intermediate event dict per test.
+
+Exceptions:
+- UnsupportedWireFormat: The content type or encoding is unknown or its library is not installed (HTTP 415).
+- DECODE_ERRORS: The exceptions raised by a body that cannot be decoded (HTTP 400).
+
+Functions:
+- decompress: Undoes the Content-Encoding of a request body.
+- is_json: Tells whether a Content-Type is JSON.
+- uuid_string: Formats 16 UUID bytes as a UUID string.
+- decode_events: Decodes a binary batch into the rows of TestManager.ingest_rows.
+
+Dependencies:
+- msgpack: Decodes application/msgpack bodies.
+- cbor2 (optional): Decodes application/cbor bodies.
+- zstandard (optional): Decompresses zstd bodies.
+"""
+import gzip
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from Database import start_row, definition_row, merge_finish
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - optional dependency
+    cbor2 = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+WIRE_VERSION = 3
+
+# Layout versions decode_events accepts
+WIRE_VERSIONS = (1, 2, 3)
+
+# Timestamps are naive wall-clock times, counted from the naive epoch
+EPOCH = datetime(1970, 1, 1)
+
+# Raised by a body that cannot be decoded or holds invalid events: msgpack, CBOR and JSON decode errors are
+# ValueErrors, a missing or mistyped field raises KeyError, IndexError or TypeError
+DECODE_ERRORS = (KeyError, IndexError, TypeError, ValueError, EOFError, zlib.error, gzip.BadGzipFile)
+if zstandard is not None:
+    DECODE_ERRORS += (zstandard.ZstdError,)
+
+
+class UnsupportedWireFormat(ValueError):
+    """
+    Raised for a request body whose content type or encoding cannot be decoded.
+    """
+
+
+def decompress(body: bytes, content_encoding: Optional[str]) -> bytes:
+    """
+    Undoes the Content-Encoding of a request body.
+
+    Parameters:
+    - body (bytes): The raw request body.
+    - content_encoding (str, optional): Value of the Content-Encoding header.
+
+    Raises:
+    - UnsupportedWireFormat: If the encoding is unknown or zstandard is not installed.
+
+    Returns:
+    - bytes: The decompressed body.
+    """
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return body
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(body, max_output_size=64 * 1024 * 1024)
+    raise UnsupportedWireFormat(f"Unsupported Content-Encoding: {content_encoding}")
+
+
+def media_type(content_type: Optional[str]) -> str:
+    """
+    Strips the parameters (e.g. charset) from a Content-Type.
+    """
+    return (content_type or "application/json").split(";")[0].strip().lower()
+
+
+def is_json(content_type: Optional[str]) -> bool:
+    """
+    Tells whether a Content-Type is JSON. A missing Content-Type counts as JSON.
+    """
+    return media_type(content_type) == "application/json"
+
+
+def uuid_string(value: bytes) -> str:
+    """
+    Formats 16 UUID bytes as the canonical 36-character string, three times faster than str(uuid.UUID(bytes=...)).
+    """
+    digits = value.hex()
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+
+def decode_events(body: bytes, content_type: Optional[str], content_encoding: Optional[str],
+                  test_run_id) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]], Dict[int, Dict[str, Any]], int]:
+    """
+    Decodes a binary batch of test events into the rows of TestManager.ingest_rows.
+
+    Parameters:
+    - body (bytes): The raw request body.
+    - content_type (str, optional): Value of the Content-Type header.
+    - content_encoding (str, optional): Value of the Content-Encoding header.
+    - test_run_id (uuid.UUID): ID of the test run the events belong to.
+
+    Raises:
+    - UnsupportedWireFormat: If the content type or encoding cannot be decoded.
+    - ValueError: If the body does not hold a batch of a supported layout version.
+
+    Returns:
+    - Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]], Dict[int, Dict[str, Any]], int]: The rows of the started
+      tests by test ID, the update parameters of the finished tests, the definitions reported in the batch by ID, and
+      the number of events.
+    """
+    kind = media_type(content_type)
+    if kind == "application/msgpack" and msgpack is not None:
+        batch = msgpack.unpackb(decompress(body, content_encoding), raw=False)
+    elif kind == "application/cbor" and cbor2 is not None:
+        batch = cbor2.loads(decompress(body, content_encoding))
+    else:
+        raise UnsupportedWireFormat(f"Unsupported Content-Type: {content_type}")
+
+    version, strings, starts, finishes = batch
+    if version not in WIRE_VERSIONS:
+        raise ValueError(f"Unsupported wire format version: {version}")
+    if version == 1:
+        starts = [(test_id, None, None, name, parameters, timestamp) for test_id, name, parameters, timestamp in starts]
+
+    if version < 3:
+        finishes = [(*finish, None, None, None) for finish in finishes]
+
+    started = {}
+    finished = []
+    definitions = {}
+    for test_id, definition_id, nodeid, name, parameters, timestamp in starts:
+        test_id = uuid_string(test_id)
+        name = None if name is None else strings[name]
+        timestamp = None if timestamp is None else EPOCH + timedelta(microseconds=timestamp)
+        if nodeid is not None:
+            definitions[definition_id] = definition_row(definition_id, strings[nodeid], name, parameters, timestamp)
+        started[test_id] = start_row(
+            test_run_id, test_id, name, None if definition_id is not None else parameters, timestamp, definition_id,
+        )
+    for test_id, status, error, duration, setup_ns, call_ns, teardown_ns in finishes:
+        merge_finish(
+            started, finished, uuid_string(test_id),
+            None if status is None else strings[status], None if error is None else strings[error], duration,
+            setup_ns, call_ns, teardown_ns,
+        )
+
+    return started, finished, definitions, len(starts) + len(finishes)
@@ -1,13 +1,23 @@
 import os
 import json
+import asyncio
 import logging
-from datetime import datetime
-from Database import TestManager
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from fastapi import FastAPI, HTTPException
+from datetime import date, datetime, timedelta
+from types import MappingProxyType
+from urllib.parse import urlencode
+from typing import Any, Dict, AsyncIterator, Optional, Sequence, Tuple
+from Database import AsyncTestManager, MissingDefinitionsError, event_rows, get_async_database_url
+from Wire import DECODE_ERRORS, UnsupportedWireFormat, decode_events, decompress, is_json
+from Flamegraph import flame_frames
+from Flakiness import WINDOW, outcome_string
+from Broadcast import Broadcaster, live_tests
+from Export import (BATCH_SIZE as EXPORT_BATCH_SIZE, MEDIA_TYPES as EXPORT_MEDIA_TYPES, RUNS_COLUMNS, TESTS_COLUMNS,
+                    ExportUnavailable, runs_query, schema_of, stream_export, tests_query)
+from sqlalchemy.exc import DataError, DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from jinja2 import Environment, FileSystemLoader
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -38,18 +48,215 @@ generic_logger.addHandler(generic_handler)
 action_logger = logging.getLogger('action_logger')
 action_logger.addHandler(action_handler)
 
-# Create SQLAlchemy session
-SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL")
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-db = SessionLocal()
 
-# Initialize TestManager with the session
-test_manager = TestManager(db)
+def get_engine_options(database_url: str) -> Dict[str, Any]:
+    """
+    Builds the connection pool options of the async SQLAlchemy engine.
+
+    The pool is sized from the DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and DB_POOL_RECYCLE environment
+    variables. Connections are pinged before they are handed out, so connections dropped by the database server
+    are replaced instead of failing a request.
+
+    Parameters:
+    - database_url (str): URL of the database.
+
+    Returns:
+    - dict: Keyword arguments for create_async_engine.
+    """
+    options = {"pool_pre_ping": True}
+
+    # SQLite serializes writers anyway, the dialect picks its own pool class and accepts no pool sizing
+    if database_url.startswith("sqlite"):
+        return options
+
+    options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    )
+    return options
+
+
+# Create async SQLAlchemy engine and session factory
+# SQLALCHEMY_ASYNC_DATABASE_URL overrides the async driver derived from SQLALCHEMY_DATABASE_URL
+SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_ASYNC_DATABASE_URL") or get_async_database_url(os.getenv("SQLALCHEMY_DATABASE_URL"))
+engine = create_async_engine(SQLALCHEMY_DATABASE_URL, **get_engine_options(SQLALCHEMY_DATABASE_URL))
+SessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=engine)
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dependency providing a database session scoped to a single request.
+
+    Yields:
+    - AsyncSession: A session that is closed, and its connection returned to the pool, once the request is done.
+    """
+    async with SessionLocal() as db:
+        yield db
+
+
+def get_test_manager(db: AsyncSession = Depends(get_db)) -> AsyncTestManager:
+    """
+    Dependency providing an AsyncTestManager bound to the session of the current request.
+
+    Parameters:
+    - db (AsyncSession): The request-scoped database session.
+
+    Returns:
+    - AsyncTestManager: The AsyncTestManager for the request.
+    """
+    return AsyncTestManager(db)
+
+
+class CachedOpenAPISpec:
+    """
+    An OpenAPI response body read from disk and serialized once.
+
+    The spec is kept as immutable bytes. When a description path is given, the bytes are split around that
+    description, so a per-request description is spliced in without parsing or copying the spec.
+    """
+    __slots__ = ("_head", "_tail", "_default")
+
+    def __init__(self, file_path: str, description_path: Sequence[str] = ()):
+        """
+        Loads and serializes the spec.
+
+        Parameters:
+        - file_path (str): Path of the OpenAPI JSON file.
+        - description_path (Sequence[str]): Keys leading to the description that is replaced per request.
+        """
+        with open(file_path, "r") as file:
+            openapi_spec = json.load(file)
+
+        if not description_path:
+            self._head, self._tail, self._default = json.dumps(openapi_spec).encode(), b"", b""
+            return
+
+        node = openapi_spec
+        for key in description_path[:-1]:
+            node = node[key]
+        marker = "\x00description\x00"
+        self._default = json.dumps(node[description_path[-1]]).encode()
+        node[description_path[-1]] = marker
+        self._head, self._tail = json.dumps(openapi_spec).encode().split(json.dumps(marker).encode())
+
+    def response(self, description: Optional[str] = None) -> Response:
+        """
+        Builds the JSON response for the cached spec.
+
+        Parameters:
+        - description (str, optional): Description replacing the one at the description path.
+
+        Returns:
+        - Response: Response with the serialized spec.
+        """
+        if not self._tail:
+            return Response(content=self._head, media_type="application/json")
+        value = json.dumps(description).encode() if description is not None else self._default
+        return Response(content=self._head + value + self._tail, media_type="application/json")
+
+
+# OpenAPI response bodies, loaded once at startup
+OPENAPI_SPECS = MappingProxyType({
+    "create_run": CachedOpenAPISpec("openapi/create_run.json", ("paths", "/runs/", "post", "responses", "201", "description")),
+    "finish_run": CachedOpenAPISpec("openapi/finish_run.json"),
+    "create_test": CachedOpenAPISpec("openapi/create_test.json", ("paths", "/tests/", "post", "responses", "201", "description")),
+    "finish_test": CachedOpenAPISpec("openapi/finish_test.json"),
+    "ingest_events": CachedOpenAPISpec("openapi/ingest_events.json"),
+    "record_fixtures": CachedOpenAPISpec("openapi/record_fixtures.json"),
+    "record_profiles": CachedOpenAPISpec("openapi/record_profiles.json"),
+})
+
+# The events endpoint reads its raw body to support several wire formats, so its request body is documented by hand
+with open("openapi/test_report_service.json") as file:
+    INGEST_EVENTS_OPENAPI = {
+        "requestBody": json.load(file)["paths"]["/runs/{run_id}/events:batch"]["post"]["requestBody"],
+    }
+
+
+def ack_only(prefer: Optional[str]) -> bool:
+    """
+    Checks whether the client asked for an ack-only response with the Prefer: return=minimal header (RFC 7240).
+
+    Parameters:
+    - prefer (str, optional): Value of the Prefer request header.
+
+    Returns:
+    - bool: True if the response body should be skipped.
+    """
+    return prefer is not None and "return=minimal" in prefer.replace(" ", "").lower()
+
+
+def openapi_response(name: str, prefer: Optional[str], description: Optional[str] = None) -> Response:
+    """
+    Builds the response of a write endpoint from the cached OpenAPI specs.
+
+    Parameters:
+    - name (str): Name of the cached spec.
+    - prefer (str, optional): Value of the Prefer request header.
+    - description (str, optional): Description replacing the one of the spec.
+
+    Returns:
+    - Response: An empty 204 response in ack-only mode, otherwise the serialized spec.
+    """
+    if ack_only(prefer):
+        return Response(status_code=204, headers={"Preference-Applied": "return=minimal"})
+    return OPENAPI_SPECS[name].response(description)
+
+
+def parse_cursor(after: Optional[str]) -> Optional[Tuple[datetime, str]]:
+    """
+    Parses the keyset cursor of a report page.
+
+    Parameters:
+    - after (str, optional): Cursor in the form "<ISO timestamp>|<test_id>".
+
+    Raises:
+    - ValueError: If the cursor is malformed.
+
+    Returns:
+    - Tuple[datetime, str]: (timestamp, test_id) of the last test of the previous page, or None.
+    """
+    if not after:
+        return None
+    timestamp, separator, test_id = after.partition("|")
+    if not separator or not test_id:
+        raise ValueError(f"Malformed cursor: {after}")
+    return datetime.fromisoformat(timestamp), test_id
+
+
+async def prepend(first: Any, rest: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """
+    Yields an already fetched item followed by the rest of an async iterator.
+    """
+    yield first
+    async for item in rest:
+        yield item
+
+
+# Number of rows fetched per query while a report is streamed
+REPORT_BATCH_SIZE = int(os.getenv("REPORT_BATCH_SIZE", "200"))
 
 # Initialize FastAPI app and Jinja2 environment
 app = FastAPI()
-templates = Environment(loader=FileSystemLoader("templates"))
+templates = Environment(loader=FileSystemLoader("templates"), enable_async=True)
+
+
+def milliseconds(nanoseconds: Optional[int]) -> str:
+    """
+    Template filter formatting a phase duration stored in nanoseconds as milliseconds.
+    """
+    return "" if nanoseconds is None else f"{nanoseconds / 1e6:.3f}"
+
+
+templates.filters["milliseconds"] = milliseconds
+
+# Fan-out of the ingested results to the live views of the runs
+broadcaster = Broadcaster()
+
+# Seconds between two keep-alive comments of an idle live stream, so proxies do not close it
+LIVE_HEARTBEAT = float(os.getenv("LIVE_HEARTBEAT", "15"))
 
 
 @app.exception_handler(HTTPException)
@@ -99,52 +306,51 @@ def index():
 
 
 @app.post("/runs", tags=['TestRuns'], summary="Create a new test run")
-async def create_run(request_body: dict):
+async def create_run(request_body: dict, test_manager: AsyncTestManager = Depends(get_test_manager), prefer: Optional[str] = Header(None)):
     """
     Endpoint to create a new test run.
 
     Parameters:
     - request_body (dict): Request body containing run details.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+    - prefer (str, optional): Prefer header. "return=minimal" skips the response body.
 
     Returns:
-    - dict: OpenAPI specification.
+    - Response: OpenAPI specification, or an empty 204 response in ack-only mode.
     """
     try:
         run_id = request_body.get('run_id')
         start_time = datetime.fromisoformat(request_body.get('start_time'))
-        created_test_run = test_manager.create_test_run(test_run_id=run_id, start_time=start_time)
+        created_test_run = await test_manager.create_test_run(test_run_id=run_id, start_time=start_time)
         action_logger.info(f"Test run created with ID: {run_id}")
     except Exception as e:
         generic_logger.exception("Exception occurred while creating test run")
         raise HTTPException(status_code=400, detail="Missing required fields in request body") from e
 
-    with open("openapi/create_run.json", "r") as file:
-        openapi_spec = json.load(file)
-
     updated_value = f"A new test run is created. Contains a unique `{run_id}`"
-    openapi_spec["paths"]["/runs/"]["post"]["responses"]["201"]["description"] = updated_value
-
-    return openapi_spec
+    return openapi_response("create_run", prefer, updated_value)
 
 
 @app.get("/runs/{run_id}")
-async def get_tests_for_run(run_id: str):
+async def get_tests_for_run(run_id: str, test_manager: AsyncTestManager = Depends(get_test_manager)):
     """
     Endpoint to retrieve tests for a specific run.
 
     Parameters:
     - run_id (str): ID of the test run.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
 
     Returns:
     - HTMLResponse: Rendered HTML content.
     """
     try:
-        tests = test_manager.get_tests_by_run_id(run_id)
+        tests = await test_manager.get_tests_by_run_id(run_id)
         if not tests:
             raise HTTPException(status_code=404, detail="Tests not found for the specified run ID")
+        profiled = await test_manager.get_profiled_test_ids(run_id)
 
         template = templates.get_template("tests.html")
-        html_content = template.render(run_id=run_id, tests=tests)
+        html_content = await template.render_async(run_id=run_id, tests=tests, profiled=profiled)
         return HTMLResponse(content=html_content)
 
     except Exception as e:
@@ -152,64 +358,500 @@ async def get_tests_for_run(run_id: str):
         raise HTTPException(status_code=500, detail="Internal Server Error") from e
 
 
-@app.get("/full-report")
-async def get_full_report():
+@app.get("/runs/{run_id}/live")
+async def get_live_run(run_id: str):
     """
-    Endpoint to retrieve a full test report.
+    Endpoint to watch a test run live. The page subscribes to /runs/{run_id}/events and adds the tests as they are
+    ingested, it does not query the database.
+
+    Parameters:
+    - run_id (str): ID of the test run.
 
     Returns:
     - HTMLResponse: Rendered HTML content.
     """
+    template = templates.get_template("live.html")
+    return HTMLResponse(content=await template.render_async(run_id=run_id))
+
+
+@app.get("/runs/{run_id}/events", tags=["TestRuns"], summary="Stream the results of a test run as server-sent events")
+async def stream_run_events(run_id: str):
+    """
+    Endpoint streaming the results of a test run as they are ingested, as server-sent events (text/event-stream).
+
+    Events:
+    - tests: A list of tests, each with the columns known so far, keyed by test_id.
+    - run: The run finished, with its end_time. The stream ends.
+    - reset: The client fell behind and missed results, it should reload the run.
+
+    Only the results ingested from the time of the subscription, by this service process, are streamed.
+
+    Parameters:
+    - run_id (str): ID of the test run.
+
+    Returns:
+    - StreamingResponse: The event stream.
+    """
+    async def stream() -> AsyncIterator[bytes]:
+        async with broadcaster.subscribe(run_id) as queue:
+            # Sent right away, so the client knows it is subscribed before the first result
+            yield b": subscribed\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), LIVE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield message
+                if message.startswith(b"event: run\n"):
+                    return
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/runs/{run_id}/summary", tags=["TestRuns"], summary="Get the aggregates of a test run")
+async def get_run_summary(run_id: str, test_manager: AsyncTestManager = Depends(get_test_manager)):
+    """
+    Endpoint to retrieve the aggregates of a test run, maintained at ingest time.
+
+    Parameters:
+    - run_id (str): ID of the test run.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+
+    Returns:
+    - dict: Per-status counts, total, p50 and p95 duration, and first and last timestamp of the run.
+    """
+    summary = await test_manager.get_run_summary(run_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Summary not found for the specified run ID")
+
+    return {
+        "run_id": summary.test_run_id,
+        "counts": {
+            "PASSED": summary.passed,
+            "FAILED": summary.failed,
+            "SKIPPED": summary.skipped,
+            "ERROR": summary.error,
+            "UNKNOWN": summary.unknown,
+        },
+        "total": summary.passed + summary.failed + summary.skipped + summary.error + summary.unknown,
+        "total_duration": summary.total_duration,
+        "p50_duration": summary.p50_duration,
+        "p95_duration": summary.p95_duration,
+        "first_timestamp": summary.first_timestamp,
+        "last_timestamp": summary.last_timestamp,
+    }
+
+
+@app.post("/runs/{run_id}/fixtures", tags=["TestRuns"], summary="Store the fixture profile of a test run")
+async def record_fixtures(run_id: str, request_body: dict, test_manager: AsyncTestManager = Depends(get_test_manager),
+                          prefer: Optional[str] = Header(None)):
+    """
+    Endpoint to store the fixture profile of a test run, sent by the plugin with --reporting-fixtures.
+
+    Parameters:
+    - run_id (str): ID of the profiled test run.
+    - request_body (dict): Request body with a "fixtures" list.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+    - prefer (str, optional): Prefer header. "return=minimal" skips the response body.
+
+    Returns:
+    - Response: OpenAPI specification, or an empty 204 response in ack-only mode.
+    """
     try:
-        tests = test_manager.get_all_tests()
-        if not tests:
-            raise HTTPException(status_code=404, detail="Tests not found")
+        fixture_count = await test_manager.record_fixture_stats(run_id, request_body["fixtures"])
+        action_logger.info(f"Stored {fixture_count} fixture stats for test run with ID: {run_id}")
+    except Exception as e:
+        generic_logger.exception("Exception occurred while storing fixture stats")
+        raise HTTPException(status_code=400, detail="Invalid fixtures in request body") from e
 
-        template = templates.get_template("full-report.html")
-        html_content = template.render(tests=tests)
-        return HTMLResponse(content=html_content)
+    return openapi_response("record_fixtures", prefer)
+
+
+@app.get("/runs/{run_id}/fixtures", tags=["TestRuns"], summary="Rank the fixtures of a test run by total time")
+async def get_run_fixtures(run_id: str, limit: int = Query(50, ge=1, le=1000),
+                           test_manager: AsyncTestManager = Depends(get_test_manager)):
+    """
+    Endpoint to rank the fixtures of a test run by total setup and teardown time.
+
+    uses_per_setup tells how often a fixture was reused: an expensive fixture with a value close to 1 is set up for
+    almost every test that uses it, and is the one worth caching or widening the scope of.
 
+    Parameters:
+    - run_id (str): ID of the test run.
+    - limit (int, optional): Maximum number of fixtures returned. Defaults to 50.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+
+    Returns:
+    - dict: The fixtures of the run, the most expensive first, with their times in milliseconds.
+    """
+    fixtures = await test_manager.get_fixture_stats(run_id, limit)
+    if not fixtures:
+        raise HTTPException(status_code=404, detail="Fixture stats not found for the specified run ID")
+
+    return {
+        "run_id": run_id,
+        "fixtures": [
+            {
+                "fixture_name": fixture.fixture_name,
+                "baseid": fixture.baseid,
+                "scope": fixture.scope,
+                "total_ms": (fixture.setup_ns + fixture.teardown_ns) / 1e6,
+                "setup_ms": fixture.setup_ns / 1e6,
+                "max_setup_ms": fixture.max_setup_ns / 1e6,
+                "teardown_ms": fixture.teardown_ns / 1e6,
+                "setups": fixture.setups,
+                "uses": fixture.uses,
+                "uses_per_setup": fixture.uses / fixture.setups if fixture.setups else None,
+            }
+            for fixture in fixtures
+        ],
+    }
+
+
+@app.post("/runs/{run_id}/profiles", tags=["TestRuns"], summary="Store the profiles of the slowest test calls of a run")
+async def record_profiles(run_id: str, request_body: dict, test_manager: AsyncTestManager = Depends(get_test_manager),
+                          prefer: Optional[str] = Header(None)):
+    """
+    Endpoint to store the profiles of the slowest test calls of a run, sent by the plugin with --reporting-profile-top.
+
+    Parameters:
+    - run_id (str): ID of the profiled test run.
+    - request_body (dict): Request body with a "profiles" list.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+    - prefer (str, optional): Prefer header. "return=minimal" skips the response body.
+
+    Returns:
+    - Response: OpenAPI specification, or an empty 204 response in ack-only mode.
+    """
+    try:
+        profile_count = await test_manager.record_profiles(run_id, request_body["profiles"])
+        action_logger.info(f"Stored {profile_count} profiles for test run with ID: {run_id}")
     except Exception as e:
+        generic_logger.exception("Exception occurred while storing profiles")
+        raise HTTPException(status_code=400, detail="Invalid profiles in request body") from e
+
+    return openapi_response("record_profiles", prefer)
+
+
+async def get_run_profile(run_id: str, test_id: str, test_manager: AsyncTestManager):
+    """
+    Retrieves the profile of a test of a run.
+
+    Raises:
+    - HTTPException 404: If the test of the run was not profiled.
+    """
+    profile = await test_manager.get_profile(test_id)
+    if profile is None or profile.test_run_id != run_id:
+        raise HTTPException(status_code=404, detail="Profile not found for the specified test")
+    return profile
+
+
+@app.get("/runs/{run_id}/profiles/{test_id}")
+async def get_profile_flamegraph(run_id: str, test_id: str, test_manager: AsyncTestManager = Depends(get_test_manager)):
+    """
+    Endpoint to view the profile of a slow test call as a flame graph.
+
+    Parameters:
+    - run_id (str): ID of the test run.
+    - test_id (str): ID of the profiled test.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+
+    Returns:
+    - HTMLResponse: Rendered HTML content.
+    """
+    profile = await get_run_profile(run_id, test_id, test_manager)
+
+    frames, total, depth = flame_frames(profile.stacks)
+    template = templates.get_template("flamegraph.html")
+    html_content = await template.render_async(profile=profile, test=profile.test, frames=frames, total=total, depth=depth)
+    return HTMLResponse(content=html_content)
+
+
+@app.get("/runs/{run_id}/profiles/{test_id}/collapsed")
+async def get_profile_collapsed(run_id: str, test_id: str, test_manager: AsyncTestManager = Depends(get_test_manager)):
+    """
+    Endpoint to download the profile of a slow test call in the collapsed-stack format, for flamegraph.pl,
+    speedscope and other flame graph tools.
+
+    Parameters:
+    - run_id (str): ID of the test run.
+    - test_id (str): ID of the profiled test.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+
+    Returns:
+    - Response: The collapsed stacks as plain text.
+    """
+    profile = await get_run_profile(run_id, test_id, test_manager)
+    return Response(content=profile.stacks or "", media_type="text/plain")
+
+
+@app.get("/durations", tags=["Tests"], summary="Get the recent p50 and p95 duration of every test")
+async def get_durations(days: int = Query(14, ge=1, le=365), test_manager: AsyncTestManager = Depends(get_test_manager)):
+    """
+    Endpoint to retrieve the median and 95th percentile wall time of every test definition over its recent runs.
+
+    The plugin fetches them with --reporting-schedule to run the longest tests first.
+
+    Parameters:
+    - days (int, optional): Number of days of history considered. Defaults to 14.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+
+    Returns:
+    - dict: The start of the history and, keyed by definition ID, the p50 and p95 in seconds and the number of runs.
+    """
+    since = datetime.now() - timedelta(days=days)
+    stats = await test_manager.get_duration_stats(since)
+    return {
+        "since": since,
+        # JSON object keys are strings, and 64-bit IDs would lose precision as numbers in JavaScript clients anyway
+        "durations": {str(definition_id): list(values) for definition_id, values in stats.items()},
+    }
+
+
+@app.get("/flaky", tags=["Tests"], summary="Rank the flaky tests")
+async def get_flaky_tests(min_flips: int = Query(3, ge=1, le=WINDOW - 1), min_runs: int = Query(5, ge=2),
+                          limit: int = Query(100, ge=1, le=1000),
+                          test_manager: AsyncTestManager = Depends(get_test_manager)):
+    """
+    Endpoint to rank the tests that keep flipping between pass and fail within their last outcomes.
+
+    The history of every test is updated as its results are ingested, so the ranking does not scan the tests table.
+    The plugin fetches it with --reporting-flaky to quarantine or rerun the flaky tests.
+
+    Parameters:
+    - min_flips (int, optional): Fewest pass/fail flips within the window for a test to be flaky. Defaults to 3.
+    - min_runs (int, optional): Fewest outcomes recorded for a test to be considered. Defaults to 5.
+    - limit (int, optional): Maximum number of tests returned. Defaults to 100.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+
+    Returns:
+    - dict: The size of the window and the flaky tests, the flakiest first, with their recent outcomes.
+    """
+    histories = await test_manager.get_flaky_tests(min_flips, min_runs, limit)
+    tests = []
+    for history in histories:
+        window = min(history.recorded, WINDOW)
+        tests.append({
+            "definition_id": str(history.definition_id),
+            "nodeid": history.definition.nodeid if history.definition else None,
+            "test_name": history.definition.test_name if history.definition else None,
+            "runs": window,
+            "failures": history.window_failures,
+            "flips": history.window_flips,
+            "failure_rate": history.window_failures / window,
+            # Share of consecutive outcomes that differ: 0 for a stable test, 1 for one alternating every run
+            "flip_rate": history.window_flips / (window - 1),
+            "outcomes": outcome_string(history.outcomes, history.recorded),
+            "last_status": history.last_status,
+            "updated_at": history.updated_at,
+        })
+    return {"window": WINDOW, "tests": tests}
+
+
+@app.get("/trends", tags=["Tests"], summary="Get the daily results of a test, or of all tests")
+async def get_trends(days: int = Query(90, ge=1, le=3660), definition_id: Optional[int] = Query(None, ge=0),
+                     test_name: Optional[str] = None, test_manager: AsyncTestManager = Depends(get_test_manager)):
+    """
+    Endpoint to retrieve the daily trend of a test, or of all tests, from the rollups kept by Retention.py.
+
+    The rollups cover the days up to the last run of `python Retention.py rollup`, and outlive the raw test rows.
+
+    Parameters:
+    - days (int, optional): Number of days of history. Defaults to 90.
+    - definition_id (int, optional): Restricts the trend to one test definition.
+    - test_name (str, optional): Restricts the trend to the tests of this name.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+
+    Returns:
+    - dict: The first day of the trend and one entry per day with per-status counts and the total duration, plus the
+      p50, p95 and max duration for a single test.
+    """
+    since = date.today() - timedelta(days=days)
+    trend = await test_manager.get_trends(since, definition_id, test_name)
+    for entry in trend:
+        if "definition_id" in entry:
+            entry["definition_id"] = str(entry["definition_id"])
+    return {"since": since, "days": trend}
+
+
+@app.get("/full-report")
+async def get_full_report(
+    status: Optional[str] = None,
+    run_id: Optional[str] = None,
+    name: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+):
+    """
+    Endpoint to retrieve a full test report, newest tests first.
+
+    The report is paginated with a keyset cursor and streamed: rows are rendered as they are fetched, one batch
+    at a time, instead of loading the whole table before rendering.
+
+    Parameters:
+    - status (str, optional): Only tests with this status.
+    - run_id (str, optional): Only tests of this test run.
+    - name (str, optional): Only tests whose name starts with this prefix.
+    - since (str, optional): Only tests started at or after this ISO time.
+    - until (str, optional): Only tests started before this ISO time.
+    - after (str, optional): Cursor of the page, as linked from the previous page.
+    - limit (int): Number of tests in the page.
+
+    Returns:
+    - StreamingResponse: Rendered HTML content.
+    """
+    try:
+        cursor = parse_cursor(after)
+        # Empty form fields arrive as empty strings
+        since = datetime.fromisoformat(since) if since else None
+        until = datetime.fromisoformat(until) if until else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor or time range") from e
+
+    filters = {"test_status": status, "test_run_id": run_id, "test_name": name, "since": since, "until": until}
+    # The streamed page runs after the request scope has ended, so it owns its session
+    db = SessionLocal()
+    tests = AsyncTestManager(db).iter_tests(limit, REPORT_BATCH_SIZE, cursor, **filters)
+
+    # Fetch the first row before streaming, so an empty report still answers with a 404
+    try:
+        first_test = await tests.__anext__()
+    except StopAsyncIteration:
+        await db.close()
+        raise HTTPException(status_code=404, detail="Tests not found")
+    except Exception as e:
+        await db.close()
         generic_logger.exception("Exception occurred while retrieving full test report")
         raise HTTPException(status_code=500, detail="Internal Server Error") from e
 
+    query = urlencode({key: value for key, value in
+                       {"status": status, "run_id": run_id, "name": name, "since": since, "until": until, "limit": limit}.items()
+                       if value})
+
+    async def render_report() -> AsyncIterator[str]:
+        try:
+            template = templates.get_template("full-report.html")
+            async for chunk in template.generate_async(tests=prepend(first_test, tests), limit=limit, query=query,
+                                                       status=status, run_id=run_id, name=name, since=since, until=until):
+                yield chunk
+        except Exception:
+            generic_logger.exception("Exception occurred while streaming full test report")
+            raise
+        finally:
+            await tests.aclose()
+            await db.close()
+
+    return StreamingResponse(render_report(), media_type="text/html")
+
+
+@app.get("/export/{table}.{file_format}", tags=["Tests"], summary="Export the test runs or tests to Parquet or Arrow")
+async def export_table(
+    table: str,
+    file_format: str,
+    run_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=100, le=100000),
+):
+    """
+    Endpoint to export the test runs (/export/runs.parquet) or tests (/export/tests.parquet) for offline analysis.
+
+    The file is streamed as it is written, one Parquet row group or Arrow record batch per batch of rows read from a
+    server-side cursor, so the memory used does not grow with the size of the tables. See Export.py.
+
+    Parameters:
+    - table (str): "runs" or "tests".
+    - file_format (str): "parquet", or "arrow" for the Arrow IPC file format.
+    - run_id (str, optional): Only this test run.
+    - since (str, optional): Only rows started at or after this ISO time.
+    - until (str, optional): Only rows started before this ISO time.
+    - batch_size (int): Rows per batch. Defaults to EXPORT_BATCH_SIZE.
+
+    Returns:
+    - StreamingResponse: The file, possibly without rows.
+
+    Raises:
+    - HTTPException 404: If the table is not exported.
+    - HTTPException 400: If the file format or the time range is invalid.
+    - HTTPException 501: If pyarrow is not installed.
+    """
+    exports = {"runs": (runs_query, RUNS_COLUMNS), "tests": (tests_query, TESTS_COLUMNS)}
+    if table not in exports:
+        raise HTTPException(status_code=404, detail="Unknown export")
+    if file_format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown export format, expected one of: {', '.join(EXPORT_MEDIA_TYPES)}")
+    try:
+        since = datetime.fromisoformat(since) if since else None
+        until = datetime.fromisoformat(until) if until else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid time range") from e
+    build_query, columns = exports[table]
+    try:
+        schema_of(columns)
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e)) from e
+
+    # The file is streamed after the request scope has ended, so it owns its session
+    db = SessionLocal()
+
+    async def stream() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in stream_export(db, build_query(since, until, run_id), columns, file_format,
+                                                    batch_size):
+                yield chunk
+        except Exception:
+            generic_logger.exception(f"Exception occurred while exporting {table}")
+            raise
+        finally:
+            await db.close()
+
+    return StreamingResponse(stream(), media_type=EXPORT_MEDIA_TYPES[file_format],
+                             headers={"Content-Disposition": f'attachment; filename="{table}.{file_format}"'})
+
 
 @app.post("/runs/{run_id}/finish", tags=['TestRuns'], summary="Finish a test run")
-async def finish_run(request_body: dict):
+async def finish_run(request_body: dict, test_manager: AsyncTestManager = Depends(get_test_manager), prefer: Optional[str] = Header(None)):
     """
     Endpoint to finish a test run.
 
     Parameters:
     - request_body (dict): Request body containing run details.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+    - prefer (str, optional): Prefer header. "return=minimal" skips the response body.
 
     Returns:
-    - dict: OpenAPI specification.
+    - Response: OpenAPI specification, or an empty 204 response in ack-only mode.
     """
     try:
         run_id = request_body.get("run_id")
         finish_time = datetime.fromisoformat(request_body.get("finish_time"))
-        test_manager.finish_test_run(run_id, finish_time)
+        await test_manager.finish_test_run(run_id, finish_time)
         action_logger.info(f"Test run finished with ID: {run_id}")
     except Exception as e:
         generic_logger.exception("Exception occurred while finishing test run")
         raise HTTPException(status_code=400, detail="Missing required fields in request body") from e
 
-    with open("openapi/finish_run.json", "r") as file:
-        openapi_spec = json.load(file)
+    broadcaster.publish(run_id, "run", {"end_time": finish_time})
 
-    return openapi_spec
+    return openapi_response("finish_run", prefer)
 
 
 @app.post("/tests", tags=["Tests"], summary="Start a new test")
-async def create_test(request_body: dict):
+async def create_test(request_body: dict, test_manager: AsyncTestManager = Depends(get_test_manager), prefer: Optional[str] = Header(None)):
     """
     Endpoint to start a new test.
 
     Parameters:
     - request_body (dict): Request body containing test details.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+    - prefer (str, optional): Prefer header. "return=minimal" skips the response body.
 
     Returns:
-    - dict: OpenAPI specification.
+    - Response: OpenAPI specification, or an empty 204 response in ack-only mode.
     """
     try:
         test_id = request_body.get("test_id")
@@ -220,31 +862,32 @@ async def create_test(request_body: dict):
 
         timestamp_formatted = datetime.fromisoformat(timestamp)
         test_run_id = test_run_id
-        test_manager.create_test(test_id, test_name, test_parameters, timestamp_formatted, test_run_id)
+        await test_manager.create_test(test_id, test_name, test_parameters, timestamp_formatted, test_run_id)
         action_logger.info(f"Test created with ID: {test_id}")
     except Exception as e:
         generic_logger.exception("Exception occurred while creating test")
         raise HTTPException(status_code=400, detail="Missing required fields in request body") from e
 
-    with open("openapi/create_test.json", "r") as file:
-        openapi_spec = json.load(file)
+    broadcaster.publish(test_run_id, "tests", [{
+        "test_id": test_id, "test_name": test_name, "test_parameters": test_parameters, "timestamp": timestamp_formatted,
+    }])
 
     updated_value = f"A new test is created. Contains a unique `{test_id}`"
-    openapi_spec["paths"]["/tests/"]["post"]["responses"]["201"]["description"] = updated_value
-
-    return openapi_spec
+    return openapi_response("create_test", prefer, updated_value)
 
 
 @app.post("/tests/{test_id}/finish", tags=["Tests"], summary="Finish a test")
-async def finish_test(request_body: dict):
+async def finish_test(request_body: dict, test_manager: AsyncTestManager = Depends(get_test_manager), prefer: Optional[str] = Header(None)):
     """
     Endpoint to finish a test.
 
     Parameters:
     - request_body (dict): Request body containing test details.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+    - prefer (str, optional): Prefer header. "return=minimal" skips the response body.
 
     Returns:
-    - dict: OpenAPI specification.
+    - Response: OpenAPI specification, or an empty 204 response in ack-only mode.
     """
     try:
         test_id = request_body.get("test_id")
@@ -252,13 +895,82 @@ async def finish_test(request_body: dict):
         error_exception = request_body.get("error_exception")
         duration = request_body.get("duration")
 
-        test_manager.finish_test(test_id, test_status, duration, error_exception)
+        test = await test_manager.finish_test(test_id, test_status, duration, error_exception, request_body.get("setup_ns"),
+                                              request_body.get("call_ns"), request_body.get("teardown_ns"))
         action_logger.info(f"Test finished with ID: {test_id}")
     except Exception as e:
         generic_logger.exception("Exception occurred while finishing test")
         raise HTTPException(status_code=400, detail="Missing required fields in request body") from e
 
-    with open("openapi/finish_test.json", "r") as file:
-        openapi_spec = json.load(file)
+    if test is not None and broadcaster.subscribed(test.test_run_id):
+        broadcaster.publish(test.test_run_id, "tests", [{
+            "test_id": test_id, "test_status": test_status, "duration": duration, "error_exception": error_exception,
+            "setup_ns": test.setup_ns, "call_ns": test.call_ns, "teardown_ns": test.teardown_ns,
+        }])
+
+    return openapi_response("finish_test", prefer)
+
+
+@app.post("/runs/{run_id}/events:batch", tags=["Tests"], summary="Ingest a batch of test events",
+          openapi_extra=INGEST_EVENTS_OPENAPI)
+async def ingest_events(run_id: str, request: Request, test_manager: AsyncTestManager = Depends(get_test_manager),
+                        prefer: Optional[str] = Header(None), content_type: Optional[str] = Header(None),
+                        content_encoding: Optional[str] = Header(None)):
+    """
+    Endpoint to persist a batch of test start/finish events in one transaction.
+
+    The body is JSON ({"events": [...]}) or the compact msgpack/CBOR layout of the Wire module, optionally compressed
+    with gzip or zstd.
+
+    Parameters:
+    - run_id (str): ID of the test run the events belong to.
+    - request (Request): The request, whose raw body holds the events.
+    - test_manager (AsyncTestManager): The AsyncTestManager bound to the request's database session.
+    - prefer (str, optional): Prefer header. "return=minimal" skips the response body.
+    - content_type (str, optional): Content-Type header, selects the wire format.
+    - content_encoding (str, optional): Content-Encoding header, selects the decompression.
+
+    Returns:
+    - Response: OpenAPI specification, or an empty 204 response in ack-only mode.
+
+    Raises:
+    - HTTPException 415: If the wire format or compression is not supported.
+    - HTTPException 409: If events reference test definitions by ID that the service does not know. The batch is
+      to be sent again with the full definitions.
+    - HTTPException 400: If the events are invalid.
+    - HTTPException 503: If the database is unavailable. The batch is to be sent again later.
+    """
+    body = await request.body()
+    try:
+        if is_json(content_type):
+            events = json.loads(decompress(body, content_encoding))["events"]
+            started, finished, definitions = event_rows(run_id, events)
+            event_count = len(events)
+        else:
+            started, finished, definitions, event_count = decode_events(body, content_type, content_encoding, run_id)
+        await test_manager.ingest_rows(run_id, started, finished, event_count, definitions)
+        action_logger.info(f"Ingested {event_count} events for test run with ID: {run_id}")
+    except UnsupportedWireFormat as e:
+        raise HTTPException(status_code=415, detail=str(e)) from e
+    except MissingDefinitionsError as e:
+        generic_logger.warning(f"Test events reference unknown definitions: {e.definition_ids}")
+        raise HTTPException(status_code=409, detail={"missing_definitions": e.definition_ids}) from e
+    except DataError as e:
+        # Values the database refuses are refused again on every retry
+        generic_logger.warning(f"Test events rejected by the database: {e}")
+        raise HTTPException(status_code=400, detail="Invalid events in request body") from e
+    except DBAPIError as e:
+        # An outage, lock timeout or deadlock: the client keeps the batch and sends it again
+        generic_logger.exception("Database error while ingesting test events")
+        raise HTTPException(status_code=503, detail="Database unavailable, retry later") from e
+    except DECODE_ERRORS as e:
+        generic_logger.warning(f"Invalid test events in request body: {e!r}")
+        raise HTTPException(status_code=400, detail="Invalid events in request body") from e
+    except Exception as e:
+        generic_logger.exception("Exception occurred while ingesting test events")
+        raise HTTPException(status_code=500, detail="Internal Server Error") from e
+
+    if broadcaster.subscribed(run_id):
+        broadcaster.publish(run_id, "tests", live_tests(started, finished, definitions))
 
-    return openapi_spec
+    return openapi_response("ingest_events", prefer)
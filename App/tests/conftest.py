@@ -0,0 +1,51 @@
+"""
+Shared setup of the service tests.
+
+The App modules are imported as top-level modules and open their logs/ and openapi/ files relative to the App
+directory, so the tests run from there. The plugin package is made importable for the wire round-trip tests.
+Every test gets its own SQLite database, shared by the TestManager and the API client of the test.
+"""
+import os
+import sys
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN_DIR = os.path.join(os.path.dirname(APP_DIR), "pytest_report_plugin")
+sys.path[:0] = [APP_DIR, PLUGIN_DIR]
+os.chdir(APP_DIR)
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite://")
+
+from SetupDatabase import Base  # noqa: E402
+from Database import TestManager  # noqa: E402
+
+
+@pytest.fixture
+def test_manager(tmp_path):
+    """
+    A TestManager bound to a session of a new SQLite database with every table.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'reports.db'}")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        yield TestManager(db)
+    engine.dispose()
+
+
+@pytest.fixture
+def api(tmp_path, test_manager, monkeypatch):
+    """
+    A TestClient of the service whose requests use the database of the test_manager fixture.
+    """
+    import main
+
+    # Connections are not pooled, every request of the TestClient may run on another event loop
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'reports.db'}", poolclass=NullPool)
+    # Requests and streamed responses (reports, exports) all open their sessions from SessionLocal
+    monkeypatch.setattr(main, "SessionLocal", async_sessionmaker(autoflush=False, expire_on_commit=False, bind=engine))
+    with TestClient(main.app) as client:
+        yield client
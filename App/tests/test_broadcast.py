@@ -0,0 +1,176 @@
+"""
+Tests of the live run events: the fan-out of the Broadcaster, the reset of a subscriber that does not keep up, the
+server-sent event stream of /runs/{run_id}/events, and the ingested batches published once they are committed.
+"""
+import json
+import uuid
+import asyncio
+from datetime import datetime
+import pytest
+from sqlalchemy.exc import OperationalError
+from Broadcast import RESET, Broadcaster, live_tests, sse_message
+from Database import AsyncTestManager
+
+RUN_ID = str(uuid.uuid4())
+OTHER_RUN_ID = str(uuid.uuid4())
+STARTED = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def drain(queue):
+    messages = []
+    while not queue.empty():
+        messages.append(queue.get_nowait())
+    return messages
+
+
+def test_sse_message_holds_the_event_and_its_json():
+    message = sse_message("tests", [{"test_id": "t1", "timestamp": STARTED}])
+
+    assert message == b'event: tests\ndata: [{"test_id": "t1", "timestamp": "2024-05-01T12:00:00"}]\n\n'
+    assert RESET == b"event: reset\ndata: {}\n\n"
+
+
+def test_messages_reach_the_subscribers_of_their_run_only():
+    async def scenario():
+        broadcaster = Broadcaster()
+        async with broadcaster.subscribe(RUN_ID) as first, broadcaster.subscribe(RUN_ID) as second, \
+                broadcaster.subscribe(OTHER_RUN_ID) as other:
+            assert broadcaster.subscribed(RUN_ID) and broadcaster.subscribed(OTHER_RUN_ID)
+            broadcaster.publish(RUN_ID, "tests", [{"test_id": "t1"}])
+
+            received = drain(first)
+            assert received == [sse_message("tests", [{"test_id": "t1"}])]
+            # Serialized once, the same bytes are queued for every subscriber
+            assert drain(second)[0] is received[0]
+            assert other.empty()
+
+            async with broadcaster.subscribe(RUN_ID):
+                pass
+            assert broadcaster.subscribed(RUN_ID)
+
+        # The channels of the runs nobody watches any more are gone
+        assert not broadcaster.subscribed(RUN_ID) and not broadcaster.subscribed(OTHER_RUN_ID)
+        assert broadcaster._channels == {}
+        broadcaster.publish(RUN_ID, "tests", [{"test_id": "t2"}])
+
+    asyncio.run(scenario())
+
+
+def test_lagging_subscriber_is_reset_without_holding_back_the_others():
+    async def scenario():
+        broadcaster = Broadcaster(queue_size=3)
+        async with broadcaster.subscribe(RUN_ID) as slow, broadcaster.subscribe(RUN_ID) as fast:
+            received = []
+            for index in range(5):
+                broadcaster.publish(RUN_ID, "tests", [{"test_id": f"t{index}"}])
+                received += drain(fast)
+
+            assert received == [sse_message("tests", [{"test_id": f"t{index}"}]) for index in range(5)]
+            # The fourth message did not fit: the three missed ones are replaced by a reset, then it goes on
+            assert drain(slow) == [RESET, sse_message("tests", [{"test_id": "t4"}])]
+
+    asyncio.run(scenario())
+
+
+def test_live_tests_of_a_batch():
+    started = {"t1": {"test_id": "t1", "test_name": "test_a", "test_parameters": None, "timestamp": STARTED,
+                      "definition_id": 7, "test_run_id": RUN_ID}}
+    finished = [{"b_test_id": "t0", "b_test_status": "FAILED", "b_duration": 0.5, "b_error_exception": "boom"}]
+
+    tests = live_tests(started, finished, {7: {"test_parameters": {"x": 1}}})
+
+    assert tests[0]["test_parameters"] == {"x": 1} and tests[0]["test_status"] is None
+    assert "test_run_id" not in tests[0] and "definition_id" not in tests[0]
+    assert tests[1] == {"test_id": "t0", "test_status": "FAILED", "duration": 0.5, "error_exception": "boom"}
+
+
+def test_event_stream_ends_with_the_run(monkeypatch):
+    import main
+
+    broadcaster = Broadcaster()
+    monkeypatch.setattr(main, "broadcaster", broadcaster)
+    monkeypatch.setattr(main, "LIVE_HEARTBEAT", 0.01)
+
+    async def scenario():
+        response = await main.stream_run_events(RUN_ID)
+        assert response.media_type == "text/event-stream"
+        body = response.body_iterator
+        assert await body.__anext__() == b": subscribed\n\n"
+        assert broadcaster.subscribed(RUN_ID)
+        # Nothing happens for longer than the heartbeat
+        assert await body.__anext__() == b": keep-alive\n\n"
+
+        broadcaster.publish(RUN_ID, "tests", [{"test_id": "t1"}])
+        broadcaster.publish(RUN_ID, "run", {"end_time": STARTED})
+        rest = [chunk async for chunk in body if not chunk.startswith(b": keep-alive")]
+        assert rest == [sse_message("tests", [{"test_id": "t1"}]), sse_message("run", {"end_time": STARTED})]
+        # The stream ended with the run and unsubscribed
+        assert not broadcaster.subscribed(RUN_ID)
+
+    asyncio.run(scenario())
+
+
+class RecordingBroadcaster(Broadcaster):
+    """
+    A broadcaster with a subscriber on every run, recording what is published.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.published = []
+
+    def subscribed(self, channel):
+        return True
+
+    def publish(self, channel, event, data):
+        self.published.append((channel, event, json.loads(json.dumps(data, default=str))))
+
+
+@pytest.fixture
+def published(api, monkeypatch):
+    import main
+
+    broadcaster = RecordingBroadcaster()
+    monkeypatch.setattr(main, "broadcaster", broadcaster)
+    return broadcaster.published
+
+
+def start(test_id, **fields):
+    return {"type": "start", "test_id": test_id, "nodeid": "tests/test_demo.py::test_a", "test_name": "test_a",
+            "test_parameters": {}, "timestamp": STARTED.isoformat(), **fields}
+
+
+def test_committed_batch_is_published(api, test_manager, published):
+    test_manager.create_test_run(RUN_ID, STARTED)
+    events = [start("t1"), {"type": "finish", "test_id": "t1", "test_status": "PASSED", "duration": 0.5,
+                            "error_exception": None}]
+
+    response = api.post(f"/runs/{RUN_ID}/events:batch", json={"events": events})
+
+    assert response.status_code == 200
+    ((channel, event, tests),) = published
+    assert (channel, event) == (RUN_ID, "tests")
+    assert [(test["test_id"], test["test_status"], test["duration"]) for test in tests] == [("t1", "PASSED", 0.5)]
+
+
+@pytest.mark.parametrize("error", [OperationalError("INSERT INTO tests", {}, Exception("database is locked")),
+                                   RuntimeError("bug")])
+def test_failed_batch_is_not_published(api, test_manager, published, monkeypatch, error):
+    async def ingest_rows(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(AsyncTestManager, "ingest_rows", ingest_rows)
+
+    assert api.post(f"/runs/{RUN_ID}/events:batch", json={"events": [start("t1")]}).status_code >= 500
+    assert published == []
+
+
+def test_refused_batch_is_not_published(api, test_manager, published):
+    test_manager.create_test_run(RUN_ID, STARTED)
+    # References a definition the service does not know
+    unknown = {"type": "start", "test_id": "t1", "definition_id": 12345, "timestamp": STARTED.isoformat()}
+
+    assert api.post(f"/runs/{RUN_ID}/events:batch", json={"events": [unknown]}).status_code == 409
+    assert api.post(f"/runs/{RUN_ID}/events:batch", content=b"not json",
+                    headers={"Content-Type": "application/json"}).status_code == 400
+    assert published == []
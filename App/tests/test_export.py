@@ -0,0 +1,111 @@
+"""
+Tests of the columnar export served by /export/{table}.{file_format}: the Parquet and Arrow files read back with
+pyarrow hold every row and column of the database, and unknown tables and formats are told apart.
+"""
+import io
+import json
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select
+import SetupDatabase as models
+from Export import RUNS_COLUMNS, TESTS_COLUMNS
+
+pyarrow = pytest.importorskip("pyarrow")
+import pyarrow.ipc  # noqa: E402
+import pyarrow.parquet  # noqa: E402
+
+RUN_ID = str(uuid.uuid4())
+OTHER_RUN_ID = str(uuid.uuid4())
+STARTED = datetime(2024, 5, 1, 12, 0, 0)
+
+# More tests than the smallest batch size, so the files hold several row groups or record batches
+TEST_COUNT = 250
+
+
+def ingest_runs(test_manager):
+    for run_id, count in ((RUN_ID, TEST_COUNT), (OTHER_RUN_ID, 3)):
+        test_manager.create_test_run(run_id, STARTED)
+        events = []
+        for index in range(count):
+            test_id = str(uuid.uuid4())
+            events.append({"type": "start", "test_id": test_id, "nodeid": f"tests/test_demo.py::test_value[{index}]",
+                           "test_name": f"test_value[{index}]", "test_parameters": {"value": index},
+                           "timestamp": (STARTED + timedelta(seconds=index)).isoformat()})
+            events.append({"type": "finish", "test_id": test_id, "test_status": "PASSED" if index % 7 else "FAILED",
+                           "duration": index / 100, "error_exception": None if index % 7 else "boom"})
+        test_manager.ingest_events(run_id, events)
+        test_manager.finish_test_run(run_id, STARTED + timedelta(hours=1))
+
+
+def read_export(response, file_format):
+    data = io.BytesIO(response.content)
+    if file_format == "parquet":
+        parquet = pyarrow.parquet.ParquetFile(data)
+        return parquet.read(), parquet.num_row_groups
+    reader = pyarrow.ipc.open_file(data)
+    return reader.read_all(), reader.num_record_batches
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_exported_tests_match_the_database(api, test_manager, file_format):
+    ingest_runs(test_manager)
+
+    response = api.get(f"/export/tests.{file_format}", params={"batch_size": 100})
+
+    assert response.status_code == 200
+    assert f'filename="tests.{file_format}"' in response.headers["content-disposition"]
+    table, batches = read_export(response, file_format)
+    assert table.column_names == [name for name, _ in TESTS_COLUMNS]
+    stored = {test.test_id: test for test in test_manager.db.scalars(select(models.Test))}
+    assert table.num_rows == len(stored) == TEST_COUNT + 3
+    assert batches == 3
+    for row in table.to_pylist():
+        test = stored[row["test_id"]]
+        assert (row["test_name"], row["test_status"], row["duration"], row["timestamp"]) == \
+            (test.test_name, test.test_status, test.duration, test.timestamp)
+        assert row["nodeid"] == f"tests/test_demo.py::{test.test_name}"
+        assert json.loads(row["test_parameters"]) == {"value": int(test.test_name[len("test_value["):-1])}
+        assert row["run_end_time"] == STARTED + timedelta(hours=1)
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_exported_runs_match_the_database(api, test_manager, file_format):
+    ingest_runs(test_manager)
+
+    response = api.get(f"/export/runs.{file_format}")
+
+    assert response.status_code == 200
+    table, _ = read_export(response, file_format)
+    assert table.column_names == [name for name, _ in RUNS_COLUMNS]
+    runs = {row["test_run_id"]: row for row in table.to_pylist()}
+    assert set(runs) == {RUN_ID, OTHER_RUN_ID}
+    summary = test_manager.get_run_summary(RUN_ID)
+    assert (runs[RUN_ID]["passed"], runs[RUN_ID]["failed"]) == (summary.passed, summary.failed)
+    assert runs[RUN_ID]["passed"] + runs[RUN_ID]["failed"] == TEST_COUNT
+
+
+def test_export_is_filtered(api, test_manager):
+    ingest_runs(test_manager)
+
+    response = api.get("/export/tests.arrow", params={"run_id": OTHER_RUN_ID})
+    table, _ = read_export(response, "arrow")
+    assert table.num_rows == 3 and set(table.column("test_run_id").to_pylist()) == {OTHER_RUN_ID}
+
+    response = api.get("/export/tests.parquet", params={"since": (STARTED + timedelta(seconds=100)).isoformat(),
+                                                        "until": (STARTED + timedelta(seconds=110)).isoformat()})
+    assert read_export(response, "parquet")[0].num_rows == 10
+
+    # An export without rows is still a readable file
+    response = api.get("/export/runs.parquet", params={"run_id": str(uuid.uuid4())})
+    table, _ = read_export(response, "parquet")
+    assert table.num_rows == 0 and table.column_names == [name for name, _ in RUNS_COLUMNS]
+
+
+def test_unknown_tables_and_formats_are_told_apart(api):
+    assert api.get("/export/definitions.parquet").status_code == 404
+    assert api.get("/export/definitions.csv").status_code == 404
+    response = api.get("/export/tests.csv")
+    assert response.status_code == 400
+    assert "parquet" in response.json()["error"]
+    assert api.get("/export/tests.parquet", params={"since": "yesterday"}).status_code == 400
@@ -0,0 +1,148 @@
+"""
+Tests of the flakiness tracking: the outcome bitsets of Flakiness, their update as finished tests are ingested,
+and the ranking of the flaky tests served by /flaky.
+"""
+import uuid
+import random
+from datetime import datetime
+import pytest
+import SetupDatabase as models
+from SetupDatabase import definition_id_of
+from Flakiness import WINDOW, failed_outcome, fold_outcome, outcome_string, window_failures, window_flips
+
+RUN_ID = str(uuid.uuid4())
+STARTED = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def fold(statuses):
+    """
+    Folds outcomes given as a string, "P" for a pass and "F" for a failure, the oldest first.
+    """
+    outcomes = recorded = 0
+    for status in statuses:
+        outcomes, recorded = fold_outcome(outcomes, recorded, status == "F")
+    return outcomes, recorded
+
+
+def test_failed_outcome_of_each_status():
+    assert failed_outcome("PASSED") is False
+    assert failed_outcome("FAILED") is True and failed_outcome("ERROR") is True
+    assert failed_outcome("SKIPPED") is None and failed_outcome("UNKNOWN") is None and failed_outcome(None) is None
+
+
+@pytest.mark.parametrize("statuses, failures, flips", [
+    ("", 0, 0),
+    ("F", 1, 0),
+    ("PPPP", 0, 0),
+    ("PPFF", 2, 1),
+    ("PPFFP", 2, 2),
+    ("PFPFPF", 3, 5),
+])
+def test_failures_and_flips_of_a_history(statuses, failures, flips):
+    outcomes, recorded = fold(statuses)
+
+    assert recorded == len(statuses)
+    assert window_failures(outcomes, recorded) == failures
+    assert window_flips(outcomes, recorded) == flips
+    assert outcome_string(outcomes, recorded) == statuses
+
+
+def test_outcomes_older_than_the_window_are_dropped():
+    # A failure long ago, then a stable stretch longer than the window
+    outcomes, recorded = fold("FP" + "P" * WINDOW)
+
+    assert recorded == WINDOW + 2
+    assert outcomes == 0
+    assert window_failures(outcomes, recorded) == 0 and window_flips(outcomes, recorded) == 0
+    assert outcome_string(outcomes, recorded) == "P" * WINDOW
+
+
+def test_bitset_counts_match_the_outcomes_they_fold():
+    rng = random.Random(4)
+    for _ in range(200):
+        statuses = "".join(rng.choice("PF") for _ in range(rng.randrange(1, 3 * WINDOW)))
+        window = statuses[-WINDOW:]
+
+        outcomes, recorded = fold(statuses)
+
+        assert window_failures(outcomes, recorded) == window.count("F")
+        assert window_flips(outcomes, recorded) == sum(a != b for a, b in zip(window, window[1:]))
+        assert outcome_string(outcomes, recorded) == window
+
+
+def ingest_statuses(test_manager, name, statuses):
+    """
+    Ingests one finished test of the definition per status, one batch each.
+    """
+    for status in statuses:
+        test_id = str(uuid.uuid4())
+        test_manager.ingest_events(RUN_ID, [
+            {"type": "start", "test_id": test_id, "nodeid": f"tests/test_demo.py::{name}", "test_name": name,
+             "test_parameters": {}, "timestamp": STARTED.isoformat()},
+            {"type": "finish", "test_id": test_id, "test_status": status, "duration": 0.1,
+             "error_exception": None if status == "PASSED" else "boom"},
+        ])
+
+
+def history(test_manager, name):
+    test_manager.db.expire_all()
+    return test_manager.db.get(models.TestFlakiness, definition_id_of(f"tests/test_demo.py::{name}"))
+
+
+def test_ingested_outcomes_update_the_history(test_manager):
+    test_manager.create_test_run(RUN_ID, STARTED)
+    statuses = ["PASSED", "FAILED", "SKIPPED", "ERROR", "PASSED", "FAILED"]
+
+    ingest_statuses(test_manager, "test_flaky", statuses)
+
+    flaky = history(test_manager, "test_flaky")
+    # The skipped test is no outcome: P F F P F
+    assert (flaky.recorded, flaky.failures, flaky.flips) == (5, 3, 3)
+    assert (flaky.window_failures, flaky.window_flips) == (3, 3)
+    assert outcome_string(flaky.outcomes, flaky.recorded) == "PFFPF"
+    assert flaky.last_status == "FAILED"
+
+
+def test_lifetime_counters_outlive_the_window(test_manager):
+    test_manager.create_test_run(RUN_ID, STARTED)
+
+    ingest_statuses(test_manager, "test_fixed", ["FAILED", "PASSED"] * 3 + ["PASSED"] * WINDOW)
+
+    fixed = history(test_manager, "test_fixed")
+    assert (fixed.recorded, fixed.failures, fixed.flips) == (WINDOW + 6, 3, 5)
+    assert (fixed.window_failures, fixed.window_flips) == (0, 0)
+
+
+def test_flaky_tests_are_ranked_by_their_flips(api, test_manager):
+    test_manager.create_test_run(RUN_ID, STARTED)
+    ingest_statuses(test_manager, "test_alternating", ["PASSED", "FAILED"] * 4)
+    ingest_statuses(test_manager, "test_flaky", ["PASSED", "PASSED", "FAILED", "PASSED", "FAILED", "PASSED"])
+    ingest_statuses(test_manager, "test_broken", ["PASSED"] * 3 + ["FAILED"] * 3)
+    ingest_statuses(test_manager, "test_young", ["PASSED", "FAILED", "PASSED", "FAILED"])
+
+    response = api.get("/flaky")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["window"] == WINDOW
+    # test_broken flips once, test_young has fewer than 5 runs
+    assert [test["test_name"] for test in body["tests"]] == ["test_alternating", "test_flaky"]
+    alternating = body["tests"][0]
+    assert alternating["definition_id"] == str(definition_id_of("tests/test_demo.py::test_alternating"))
+    assert alternating["nodeid"] == "tests/test_demo.py::test_alternating"
+    assert (alternating["runs"], alternating["failures"], alternating["flips"]) == (8, 4, 7)
+    assert alternating["flip_rate"] == 1 and alternating["failure_rate"] == 0.5
+    assert alternating["outcomes"] == "PF" * 4
+
+    def names(**params):
+        return [test["test_name"] for test in api.get("/flaky", params=params).json()["tests"]]
+
+    assert names(min_flips=1) == ["test_alternating", "test_flaky", "test_broken"]
+    assert names(min_flips=1, min_runs=4) == ["test_alternating", "test_flaky", "test_young", "test_broken"]
+    assert names(min_flips=5) == ["test_alternating"]
+    assert names(limit=1) == ["test_alternating"]
+
+
+@pytest.mark.parametrize("params", [{"min_flips": 0}, {"min_flips": WINDOW}, {"min_runs": 1}, {"limit": 0}])
+def test_out_of_range_thresholds_are_refused(api, params):
+    assert api.get("/flaky", params=params).status_code == 422
@@ -0,0 +1,149 @@
+"""
+Tests of the bulk ingestion of test events: a batch delivered twice, as the plugin does after a lost response,
+must leave the tests, the run summary and the flakiness history as they were after the first delivery. Over HTTP,
+only invalid batches are answered with a client error, a failing database is a server error the plugin retries.
+"""
+import uuid
+from datetime import datetime
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import DataError, DBAPIError, OperationalError
+import SetupDatabase as models
+from Database import AsyncTestManager
+
+RUN_ID = str(uuid.uuid4())
+STARTED = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def start(test_id, name):
+    return {"type": "start", "test_id": test_id, "nodeid": f"tests/test_demo.py::{name}", "test_name": name,
+            "test_parameters": {}, "timestamp": STARTED.isoformat()}
+
+
+def finish(test_id, status, duration, error=None):
+    return {"type": "finish", "test_id": test_id, "test_status": status, "duration": duration,
+            "error_exception": error, "setup_ns": 1000, "call_ns": int(duration * 1e9), "teardown_ns": 500}
+
+
+def snapshot(test_manager):
+    """
+    Returns everything ingestion writes, in a comparable form.
+    """
+    # Bound here, pytest would try to collect the Test* models at module level
+    Test, RunSummary, TestFlakiness = models.Test, models.RunSummary, models.TestFlakiness
+    db = test_manager.db
+    db.expire_all()
+    tests = db.execute(select(Test.test_id, Test.definition_id, Test.test_name, Test.test_status, Test.duration,
+                              Test.error_exception, Test.setup_ns, Test.call_ns, Test.teardown_ns)
+                       .order_by(Test.test_id)).all()
+    summary = db.execute(select(RunSummary.passed, RunSummary.failed, RunSummary.skipped, RunSummary.error,
+                                RunSummary.unknown, RunSummary.total_duration, RunSummary.duration_histogram,
+                                RunSummary.p50_duration, RunSummary.p95_duration)
+                         .where(RunSummary.test_run_id == RUN_ID)).one()
+    flakiness = db.execute(select(TestFlakiness.definition_id, TestFlakiness.outcomes, TestFlakiness.recorded,
+                                  TestFlakiness.failures, TestFlakiness.flips, TestFlakiness.window_failures,
+                                  TestFlakiness.window_flips, TestFlakiness.last_status)
+                           .order_by(TestFlakiness.definition_id)).all()
+    return tests, summary, flakiness
+
+
+def ingest_batches(test_manager):
+    """
+    Ingests two batches: the second finishes a test started in the first.
+    """
+    first = [start("t1", "test_a"), finish("t1", "PASSED", 0.5), start("t2", "test_b")]
+    second = [finish("t2", "FAILED", 0.25, "boom"), start("t3", "test_c"), finish("t3", "SKIPPED", 0.0)]
+    test_manager.create_test_run(RUN_ID, STARTED)
+    test_manager.ingest_events(RUN_ID, first)
+    test_manager.ingest_events(RUN_ID, second)
+    return first, second
+
+
+def test_batches_are_counted_once(test_manager):
+    ingest_batches(test_manager)
+    tests, summary, flakiness = snapshot(test_manager)
+
+    assert [(test_id, status) for test_id, _, _, status, *_ in tests] == [
+        ("t1", "PASSED"), ("t2", "FAILED"), ("t3", "SKIPPED")]
+    assert summary[:6] == (1, 1, 1, 0, 0, 0.75)
+    # Skipped tests are no outcome, the two others have one each
+    assert sorted((recorded, failures, last_status) for _, _, recorded, failures, _, _, _, last_status in flakiness) == \
+        [(1, 0, "PASSED"), (1, 1, "FAILED")]
+
+
+def test_redelivered_batches_change_nothing(test_manager):
+    first, second = ingest_batches(test_manager)
+    before = snapshot(test_manager)
+
+    # The finishes of the second batch belong to a test started in the first one, redelivered in either order
+    test_manager.ingest_events(RUN_ID, second)
+    test_manager.ingest_events(RUN_ID, first)
+    test_manager.ingest_events(RUN_ID, second)
+
+    assert snapshot(test_manager) == before
+
+
+def test_redelivered_batch_before_the_next_one(test_manager):
+    first = [start("t1", "test_a"), finish("t1", "PASSED", 0.5), start("t2", "test_b")]
+    test_manager.create_test_run(RUN_ID, STARTED)
+    test_manager.ingest_events(RUN_ID, first)
+    test_manager.ingest_events(RUN_ID, first)
+    test_manager.ingest_events(RUN_ID, [finish("t2", "FAILED", 0.25, "boom")])
+    test_manager.ingest_events(RUN_ID, [finish("t2", "FAILED", 0.25, "boom")])
+
+    tests, summary, flakiness = snapshot(test_manager)
+    assert [status for _, _, _, status, *_ in tests] == ["PASSED", "FAILED"]
+    assert summary[:6] == (1, 1, 0, 0, 0, 0.75)
+    assert sum(histogram_count for histogram_count in summary[6].values()) == 2
+    assert sorted(recorded for _, _, recorded, *_ in flakiness) == [1, 1]
+
+
+def test_batch_is_ingested_over_http(api, test_manager):
+    test_manager.create_test_run(RUN_ID, STARTED)
+
+    response = api.post(f"/runs/{RUN_ID}/events:batch", json={"events": [start("t1", "test_a"), finish("t1", "PASSED", 0.5)]},
+                        headers={"Prefer": "return=minimal"})
+
+    assert response.status_code in (200, 204)
+    tests, summary, _ = snapshot(test_manager)
+    assert [status for _, _, _, status, *_ in tests] == ["PASSED"]
+    assert summary[0] == 1
+
+
+@pytest.mark.parametrize("body", [b'{"events": [{"type": "start"}]}', b'{"runs": []}', b"not json"])
+def test_invalid_batch_is_answered_with_400(api, test_manager, body):
+    test_manager.create_test_run(RUN_ID, STARTED)
+
+    response = api.post(f"/runs/{RUN_ID}/events:batch", content=body, headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("error, status", [
+    (OperationalError("INSERT INTO tests", {}, Exception("database is locked")), 503),
+    (DBAPIError("INSERT INTO tests", {}, Exception("Deadlock found")), 503),
+    (DataError("INSERT INTO tests", {}, Exception("Data too long for column")), 400),
+    (RuntimeError("bug"), 500),
+])
+def test_database_errors_are_not_client_errors(api, monkeypatch, error, status):
+    async def ingest_rows(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(AsyncTestManager, "ingest_rows", ingest_rows)
+
+    response = api.post(f"/runs/{RUN_ID}/events:batch", json={"events": [start("t1", "test_a")]})
+
+    # A 4xx is final for the plugin, only a 5xx makes it keep the batch and open its circuit breaker
+    assert response.status_code == status
+
+
+def test_long_names_and_errors_are_cut_to_their_columns(test_manager):
+    name = "test_" + "x" * 200
+    test_manager.create_test_run(RUN_ID, STARTED)
+    test_manager.ingest_events(RUN_ID, [start("t1", name), finish("t1", "FAILED", 0.5, "E" * 1000)])
+
+    tests, _, _ = snapshot(test_manager)
+    (_, _, test_name, _, _, error, *_), = tests
+    # Strict SQL modes refuse values longer than the column instead of cutting them
+    assert len(test_name) == models.Test.__table__.c.test_name.type.length and test_name.endswith("...")
+    assert len(error) == models.Test.__table__.c.error_exception.type.length and error.startswith("EEE")
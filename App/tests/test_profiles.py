@@ -0,0 +1,75 @@
+"""
+Tests of the profiles of the slowest test calls: stored by /runs/{run_id}/profiles, replaced on redelivery, and
+served as a flame graph and in the collapsed-stack format.
+"""
+import uuid
+from datetime import datetime
+
+RUN_ID = str(uuid.uuid4())
+OTHER_RUN_ID = str(uuid.uuid4())
+STARTED = datetime(2024, 5, 1, 12, 0, 0)
+
+STACKS = "test_slow (test_demo.py:9);spin (test_demo.py:3) 480000\ntest_slow (test_demo.py:9) 20000"
+
+
+def ingest_test(test_manager, run_id, name):
+    test_id = str(uuid.uuid4())
+    test_manager.ingest_events(run_id, [
+        {"type": "start", "test_id": test_id, "nodeid": f"tests/test_demo.py::{name}", "test_name": name,
+         "test_parameters": {}, "timestamp": STARTED.isoformat()},
+        {"type": "finish", "test_id": test_id, "test_status": "PASSED", "duration": 0.5, "error_exception": None},
+    ])
+    return test_id
+
+
+def profile(test_id, stacks=STACKS):
+    return {"test_id": test_id, "test_name": "test_slow", "call_ns": 500_000_000, "samples": 96,
+            "sample_interval_us": 5000, "stacks": stacks}
+
+
+def test_collapsed_profile_is_served_as_stored(api, test_manager):
+    test_manager.create_test_run(RUN_ID, STARTED)
+    test_id = ingest_test(test_manager, RUN_ID, "test_slow")
+
+    response = api.post(f"/runs/{RUN_ID}/profiles", json={"run_id": RUN_ID, "profiles": [profile(test_id)]})
+    assert response.status_code == 200
+
+    response = api.get(f"/runs/{RUN_ID}/profiles/{test_id}/collapsed")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text == STACKS
+
+    response = api.get(f"/runs/{RUN_ID}/profiles/{test_id}")
+    assert response.status_code == 200
+    assert "spin (test_demo.py:3)" in response.text
+
+
+def test_redelivered_profiles_replace_the_stored_ones(api, test_manager):
+    test_manager.create_test_run(RUN_ID, STARTED)
+    test_id = ingest_test(test_manager, RUN_ID, "test_slow")
+    api.post(f"/runs/{RUN_ID}/profiles", json={"run_id": RUN_ID, "profiles": [profile(test_id)]})
+
+    response = api.post(f"/runs/{RUN_ID}/profiles",
+                        json={"run_id": RUN_ID, "profiles": [profile(test_id, "test_slow (test_demo.py:9) 1000")]})
+
+    assert response.status_code == 200
+    assert api.get(f"/runs/{RUN_ID}/profiles/{test_id}/collapsed").text == "test_slow (test_demo.py:9) 1000"
+    assert test_manager.get_profiled_test_ids(RUN_ID) == {test_id}
+
+
+def test_profiles_are_only_served_with_their_run(api, test_manager):
+    test_manager.create_test_run(RUN_ID, STARTED)
+    test_manager.create_test_run(OTHER_RUN_ID, STARTED)
+    profiled = ingest_test(test_manager, RUN_ID, "test_slow")
+    unprofiled = ingest_test(test_manager, RUN_ID, "test_fast")
+    api.post(f"/runs/{RUN_ID}/profiles", json={"run_id": RUN_ID, "profiles": [profile(profiled)]})
+
+    assert api.get(f"/runs/{OTHER_RUN_ID}/profiles/{profiled}/collapsed").status_code == 404
+    assert api.get(f"/runs/{RUN_ID}/profiles/{unprofiled}/collapsed").status_code == 404
+    assert api.get(f"/runs/{RUN_ID}/profiles/{uuid.uuid4()}").status_code == 404
+
+
+def test_invalid_profiles_are_refused(api, test_manager):
+    test_manager.create_test_run(RUN_ID, STARTED)
+
+    assert api.post(f"/runs/{RUN_ID}/profiles", json={"run_id": RUN_ID}).status_code == 400
@@ -0,0 +1,85 @@
+"""
+Tests of the keyset pagination of the full report: pages follow each other without duplicates or gaps, also across
+tests started at the same time, and a malformed cursor is a client error.
+"""
+import re
+import html
+import uuid
+from datetime import datetime, timedelta
+import pytest
+
+RUN_ID = str(uuid.uuid4())
+STARTED = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def ingest_tests(test_manager, timestamps):
+    """
+    Ingests one passed test per timestamp and returns their IDs.
+    """
+    test_ids = [str(uuid.uuid4()) for _ in timestamps]
+    events = []
+    for test_id, timestamp in zip(test_ids, timestamps):
+        events.append({"type": "start", "test_id": test_id, "nodeid": f"tests/test_demo.py::test_{test_id[:8]}",
+                       "test_name": f"test_{test_id[:8]}", "test_parameters": {}, "timestamp": timestamp.isoformat()})
+        events.append({"type": "finish", "test_id": test_id, "test_status": "PASSED", "duration": 0.1,
+                       "error_exception": None})
+    test_manager.create_test_run(RUN_ID, STARTED)
+    test_manager.ingest_events(RUN_ID, events)
+    return test_ids
+
+
+def newest_first(test_ids, timestamps):
+    return [test_id for _, test_id in sorted(zip(timestamps, test_ids), reverse=True)]
+
+
+@pytest.fixture
+def timestamps():
+    # Runs of equal timestamps, as tests started within the resolution of the clock
+    return [STARTED] * 5 + [STARTED + timedelta(seconds=1)] * 4 + [STARTED + timedelta(seconds=2)]
+
+
+def test_pages_cover_equal_timestamps_once(test_manager, timestamps):
+    test_ids = ingest_tests(test_manager, timestamps)
+
+    seen = []
+    after = None
+    while True:
+        page = test_manager.get_tests_page(3, after)
+        seen.extend(test.test_id for test in page)
+        if len(page) < 3:
+            break
+        after = (page[-1].timestamp, page[-1].test_id)
+
+    assert seen == newest_first(test_ids, timestamps)
+
+
+def test_report_links_to_the_next_page(api, test_manager, timestamps):
+    test_ids = ingest_tests(test_manager, timestamps)
+
+    seen = []
+    pages = 0
+    url = "/full-report?limit=4"
+    while url:
+        pages += 1
+        response = api.get(url)
+        assert response.status_code == 200
+        seen.extend(test_id for test_id in re.findall(r"<td>([0-9a-f-]{36})</td>", response.text) if test_id in test_ids)
+        link = re.search(r'href="(/full-report\?[^"]*after=[^"]*)"', response.text)
+        url = html.unescape(link.group(1)) if link else None
+
+    assert pages == 3
+    assert seen == newest_first(test_ids, timestamps)
+
+
+@pytest.mark.parametrize("after", ["garbage", "|" + str(uuid.uuid4()), "2024-05-01T12:00:00|", "2024-13-01|x",
+                                   "2024-05-01T12:00:00"])
+def test_malformed_cursor_is_answered_with_400(api, test_manager, timestamps, after):
+    ingest_tests(test_manager, timestamps)
+
+    response = api.get("/full-report", params={"after": after})
+
+    assert response.status_code == 400
+
+
+def test_invalid_time_range_is_answered_with_400(api):
+    assert api.get("/full-report", params={"since": "yesterday"}).status_code == 400
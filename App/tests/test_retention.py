@@ -0,0 +1,149 @@
+"""
+Tests of the retention of historical test rows: the daily rollups computed from the raw rows, the purge of the rows
+older than the retention period, and the trends served from the rollups once the rows are gone.
+"""
+import uuid
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, select
+import SetupDatabase as models
+from SetupDatabase import definition_id_of
+from Database import nearest_rank
+import Retention
+
+TODAY = date.today()
+OLD_DAY = TODAY - timedelta(days=100)
+RECENT_DAY = TODAY - timedelta(days=1)
+
+# Results of each day per test name: (status, duration)
+RESULTS = {
+    OLD_DAY: {
+        "test_a": [("PASSED", round(0.05 * (index + 1), 2)) for index in range(17)]
+                  + [("FAILED", 2.5), ("ERROR", 0.01), ("SKIPPED", 0.0)],
+        "test_b": [("PASSED", 0.2), ("UNKNOWN", None)],
+    },
+    RECENT_DAY: {
+        "test_a": [("PASSED", 0.1), ("FAILED", 0.3)],
+    },
+}
+
+
+def ingest_day(test_manager, day):
+    """
+    Ingests the results of a day in a run of its own, with a fixture profile and the profile of its first test.
+
+    Returns:
+    - List[str]: The IDs of the tests of the day.
+    """
+    run_id = str(uuid.uuid4())
+    started = datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+    test_manager.create_test_run(run_id, started)
+    events = []
+    for name, results in RESULTS[day].items():
+        for index, (status, duration) in enumerate(results):
+            test_id = str(uuid.uuid4())
+            events.append({"type": "start", "test_id": test_id, "nodeid": f"tests/test_demo.py::{name}",
+                           "test_name": name, "test_parameters": {},
+                           "timestamp": (started + timedelta(seconds=index)).isoformat()})
+            events.append({"type": "finish", "test_id": test_id, "test_status": status, "duration": duration,
+                           "error_exception": None})
+    test_manager.ingest_events(run_id, events)
+    test_ids = [event["test_id"] for event in events if event["type"] == "start"]
+    test_manager.record_fixture_stats(run_id, [{"fixture_name": "db", "baseid": "", "scope": "session", "setups": 1,
+                                                "setup_ns": 10, "max_setup_ns": 10, "teardown_ns": 1, "uses": 3}])
+    test_manager.record_profiles(run_id, [{"test_id": test_ids[0], "call_ns": 1000, "samples": 1,
+                                           "sample_interval_us": 5000, "stacks": "test_a (test_demo.py:1) 1000"}])
+    return test_ids
+
+
+def rollups(test_manager, day):
+    test_manager.db.expire_all()
+    rows = test_manager.db.scalars(select(models.TestDailyRollup).where(models.TestDailyRollup.day == day))
+    return {row.test_name: row for row in rows}
+
+
+def count(test_manager, model):
+    test_manager.db.expire_all()
+    return test_manager.db.scalar(select(func.count()).select_from(model))
+
+
+def test_rollup_matches_the_raw_rows(test_manager):
+    ingest_day(test_manager, OLD_DAY)
+    ingest_day(test_manager, RECENT_DAY)
+
+    assert test_manager.rollup_day(OLD_DAY) == 22
+
+    rolled_up = rollups(test_manager, OLD_DAY)
+    a = rolled_up["test_a"]
+    assert a.definition_id == definition_id_of("tests/test_demo.py::test_a")
+    assert (a.passed, a.failed, a.error, a.skipped, a.unknown) == (17, 1, 1, 1, 0)
+    durations = sorted(duration for _, duration in RESULTS[OLD_DAY]["test_a"])
+    assert abs(a.total_duration - sum(durations)) < 1e-9
+    assert a.p50_duration == nearest_rank(durations, 0.5)
+    assert a.p95_duration == nearest_rank(durations, 0.95) == 0.85
+    assert a.max_duration == 2.5
+    b = rolled_up["test_b"]
+    # A result without a duration is counted, but left out of the percentiles
+    assert (b.passed, b.unknown, b.p50_duration, b.p95_duration) == (1, 1, 0.2, 0.2)
+    # Only the rolled up day has rollups
+    assert rollups(test_manager, RECENT_DAY) == {}
+
+    # Rolling a day up again replaces its rollups
+    assert test_manager.rollup_day(OLD_DAY) == 22
+    assert count(test_manager, models.TestDailyRollup) == 2
+
+
+def test_purge_deletes_the_old_rows_only(test_manager):
+    old_ids = ingest_day(test_manager, OLD_DAY)
+    recent_ids = ingest_day(test_manager, RECENT_DAY)
+    test_manager.rollup_day(OLD_DAY)
+
+    before = datetime.combine(RECENT_DAY, datetime.min.time())
+    assert test_manager.purge_tests(before, batch_size=5) == len(old_ids)
+
+    test_manager.db.expire_all()
+    remaining = set(test_manager.db.scalars(select(models.Test.test_id)))
+    assert remaining == set(recent_ids)
+    assert set(test_manager.db.scalars(select(models.TestProfile.test_id))) == {recent_ids[0]}
+    assert count(test_manager, models.FixtureStat) == 1
+    # Runs, their summaries and the definitions are kept
+    assert count(test_manager, models.TestRun) == 2
+    assert count(test_manager, models.RunSummary) == 2
+    assert count(test_manager, models.TestDefinition) == 2
+
+    # The rollups outlive the raw rows, rolling the purged day up again keeps them
+    assert test_manager.rollup_day(OLD_DAY) == 0
+    assert rollups(test_manager, OLD_DAY)["test_a"].passed == 17
+
+
+def test_retention_rolls_up_before_purging(test_manager, api):
+    old_ids = ingest_day(test_manager, OLD_DAY)
+    ingest_day(test_manager, RECENT_DAY)
+
+    assert Retention.purge(test_manager, keep_days=30, batch_size=7) == len(old_ids)
+
+    # Every completed day was rolled up, today is not
+    assert set(rollups(test_manager, OLD_DAY)) == {"test_a", "test_b"}
+    recent = rollups(test_manager, RECENT_DAY)["test_a"]
+    assert (recent.passed, recent.failed) == (1, 1)
+    assert test_manager.get_rollup_bounds() == (RECENT_DAY, RECENT_DAY)
+    # Nothing is left to roll up or purge
+    assert Retention.rollup(test_manager) == 0
+    assert Retention.purge(test_manager, keep_days=30) == 0
+
+    response = api.get("/trends", params={"days": 365, "test_name": "test_a"})
+    assert response.status_code == 200
+    days = response.json()["days"]
+    assert [entry["day"] for entry in days] == [OLD_DAY.isoformat(), RECENT_DAY.isoformat()]
+    assert days[0]["definition_id"] == str(definition_id_of("tests/test_demo.py::test_a"))
+    assert (days[0]["passed"], days[0]["p95_duration"]) == (17, 0.85)
+
+
+def test_rollup_resumes_after_the_last_day_rolled_up(test_manager):
+    ingest_day(test_manager, OLD_DAY)
+    ingest_day(test_manager, RECENT_DAY)
+
+    assert Retention.rollup(test_manager, until=OLD_DAY + timedelta(days=1)) == 22
+    assert Retention.rollup(test_manager) == 2
+    assert Retention.rollup(test_manager) == 0
+    # An explicit since rolls the days up again
+    assert Retention.rollup(test_manager, since=OLD_DAY) == 24
@@ -0,0 +1,72 @@
+"""
+Tests of the run summary maintained at ingest time: counts, total duration and the p50/p95 estimated from the
+duration histogram, served by /runs/{run_id}/summary.
+"""
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from Database import HISTOGRAM_GROWTH, duration_bucket, histogram_percentile, nearest_rank
+
+RUN_ID = str(uuid.uuid4())
+STARTED = datetime(2024, 5, 1, 12, 0, 0)
+
+# 100 tests of 10 ms to 1 s, in the order they finish
+STATUSES = ["PASSED"] * 90 + ["FAILED"] * 5 + ["SKIPPED"] * 3 + ["ERROR"] * 2
+DURATIONS = [round(0.01 * (index + 1), 2) for index in range(100)][::-1]
+
+
+def batches():
+    """
+    Splits the tests in batches of 25; every batch finishes the last test started by the previous one.
+    """
+    test_ids = [str(uuid.uuid4()) for _ in STATUSES]
+    events = []
+    for index, (test_id, status, duration) in enumerate(zip(test_ids, STATUSES, DURATIONS)):
+        events.append([{"type": "start", "test_id": test_id, "nodeid": f"tests/test_demo.py::test_{index}",
+                        "test_name": f"test_{index}", "test_parameters": {},
+                        "timestamp": (STARTED + timedelta(seconds=index)).isoformat()},
+                       {"type": "finish", "test_id": test_id, "test_status": status, "duration": duration,
+                        "error_exception": None if status == "PASSED" else "boom"}])
+    flat = [event for pair in events for event in pair]
+    # Moves the finish of the 25th, 50th and 75th test into the next batch
+    bounds = [0, 49, 99, 149, len(flat)]
+    return [flat[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def test_histogram_percentile_is_within_a_bucket_of_the_exact_value():
+    histogram = {}
+    for duration in DURATIONS:
+        bucket = str(duration_bucket(duration))
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    for quantile in (0.5, 0.95):
+        exact = nearest_rank(sorted(DURATIONS), quantile)
+        assert exact <= histogram_percentile(histogram, quantile) <= exact * HISTOGRAM_GROWTH
+    assert histogram_percentile({}, 0.5) is None
+
+
+def test_summary_of_redelivered_batches(api, test_manager):
+    test_manager.create_test_run(RUN_ID, STARTED)
+    parts = batches()
+    for part in parts:
+        test_manager.ingest_events(RUN_ID, part)
+    # Lost responses: the plugin sends some batches again, in any order
+    for part in (parts[1], parts[3], parts[0]):
+        test_manager.ingest_events(RUN_ID, part)
+
+    response = api.get(f"/runs/{RUN_ID}/summary")
+
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["counts"] == {"PASSED": 90, "FAILED": 5, "SKIPPED": 3, "ERROR": 2, "UNKNOWN": 0}
+    assert summary["total"] == 100
+    assert summary["total_duration"] == pytest.approx(sum(DURATIONS))
+    # The estimate is the upper bound of the bucket of the exact value, at most 10% above it
+    assert 0.5 <= summary["p50_duration"] <= 0.5 * HISTOGRAM_GROWTH
+    assert 0.95 <= summary["p95_duration"] <= 0.95 * HISTOGRAM_GROWTH
+    assert datetime.fromisoformat(summary["first_timestamp"]) == STARTED
+    assert datetime.fromisoformat(summary["last_timestamp"]) == STARTED + timedelta(seconds=99)
+
+
+def test_summary_of_an_unknown_run(api):
+    assert api.get(f"/runs/{uuid.uuid4()}/summary").status_code == 404
@@ -0,0 +1,138 @@
+"""
+Round trips of the binary wire formats: batches encoded by the plugin's WireEncoder must decode into the same rows
+as the JSON events they stand for, whatever the format, compression or layout version.
+"""
+import uuid
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+from Database import event_rows
+from Wire import UnsupportedWireFormat, decode_events
+from pytest_report_plugin.client import ReportClient
+from pytest_report_plugin.spool import _post_encoded
+from pytest_report_plugin.wire import WireEncoder, epoch_microseconds
+
+RUN_ID = str(uuid.uuid4())
+TEST_IDS = [str(uuid.uuid4()) for _ in range(3)]
+TIMESTAMP = "2024-05-01T12:00:00.123456"
+
+EVENTS = [
+    {"type": "start", "test_id": TEST_IDS[0], "definition_id": 11, "nodeid": "tests/test_a.py::test_a[1-x]",
+     "test_name": "test_a[1-x]", "test_parameters": {"a": 1, "b": "x"}, "timestamp": TIMESTAMP},
+    {"type": "finish", "test_id": TEST_IDS[0], "test_status": "PASSED", "error_exception": None, "duration": 0.5,
+     "setup_ns": 1000, "call_ns": 500000000, "teardown_ns": 250},
+    # A definition the service already knows is referenced by its ID alone
+    {"type": "start", "test_id": TEST_IDS[1], "definition_id": 12, "timestamp": TIMESTAMP},
+    {"type": "finish", "test_id": TEST_IDS[1], "test_status": "FAILED", "error_exception": "AssertionError: boom",
+     "duration": 0.25, "setup_ns": 2000, "call_ns": 250000000, "teardown_ns": 125},
+    # The finish of a test started in an earlier batch
+    {"type": "finish", "test_id": TEST_IDS[2], "test_status": "FAILED", "error_exception": "AssertionError: boom",
+     "duration": 1.0, "setup_ns": None, "call_ns": None, "teardown_ns": None},
+]
+
+
+@pytest.mark.parametrize("wire_format", ["msgpack", "cbor"])
+@pytest.mark.parametrize("compression", ["none", "gzip", "zstd"])
+def test_encoded_batch_decodes_like_json(wire_format, compression):
+    if wire_format == "cbor":
+        pytest.importorskip("cbor2")
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    encoder = WireEncoder(wire_format, compression)
+    assert not encoder.plain
+
+    body, headers = encoder.encode(EVENTS)
+    started, finished, definitions, count = decode_events(
+        body, headers["Content-Type"], headers.get("Content-Encoding"), RUN_ID)
+
+    assert (started, finished, definitions) == event_rows(RUN_ID, EVENTS)
+    assert count == len(EVENTS)
+
+
+def test_version_2_finishes_have_no_phase_durations():
+    strings, starts, finishes = WireEncoder.compact(EVENTS)[1:]
+    body = msgpack.packb([2, strings, starts, [finish[:4] for finish in finishes]], use_bin_type=True)
+
+    started, finished, definitions, _ = decode_events(body, "application/msgpack", None, RUN_ID)
+
+    events = [{**event, "setup_ns": None, "call_ns": None, "teardown_ns": None} if event["type"] == "finish"
+              else event for event in EVENTS]
+    assert (started, finished, definitions) == event_rows(RUN_ID, events)
+
+
+def test_version_1_starts_have_no_definitions():
+    events = [{"type": "start", "test_id": TEST_IDS[0], "test_name": "test_a", "test_parameters": {"a": 1},
+               "timestamp": TIMESTAMP},
+              {"type": "finish", "test_id": TEST_IDS[0], "test_status": "PASSED", "error_exception": None,
+               "duration": 0.5}]
+    batch = [1, ["test_a", "PASSED"],
+             [[uuid.UUID(TEST_IDS[0]).bytes, 0, {"a": 1}, epoch_microseconds(TIMESTAMP)]],
+             [[uuid.UUID(TEST_IDS[0]).bytes, 1, None, 0.5]]]
+
+    started, finished, definitions, count = decode_events(
+        msgpack.packb(batch, use_bin_type=True), "application/msgpack; charset=utf-8", "identity", RUN_ID)
+
+    assert (started, finished, definitions) == event_rows(RUN_ID, events)
+    assert count == 2
+    assert started[TEST_IDS[0]]["test_parameters"] == {"a": 1}
+
+
+def test_unknown_layout_version_is_refused():
+    body = msgpack.packb([4, [], [], []])
+
+    with pytest.raises(ValueError, match="version"):
+        decode_events(body, "application/msgpack", None, RUN_ID)
+
+
+@pytest.mark.parametrize("content_type, content_encoding", [
+    ("application/x-protobuf", None),
+    ("application/msgpack", "br"),
+])
+def test_unknown_encoding_is_unsupported(content_type, content_encoding):
+    body = msgpack.packb(WireEncoder.compact(EVENTS), use_bin_type=True)
+
+    with pytest.raises(UnsupportedWireFormat):
+        decode_events(body, content_type, content_encoding, RUN_ID)
+
+
+def test_unknown_encoding_is_answered_with_415():
+    import main
+
+    response = TestClient(main.app).post(f"/runs/{RUN_ID}/events:batch", content=b"\x00",
+                                         headers={"Content-Type": "application/msgpack", "Content-Encoding": "br"})
+
+    assert response.status_code == 415
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeSession:
+    """
+    Refuses every binary body with 415 and accepts JSON ones.
+    """
+
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.requests.append(kwargs)
+        return FakeResponse(204 if "json" in kwargs else 415)
+
+
+def test_client_falls_back_to_json_after_a_415():
+    client = ReportClient("http://127.0.0.1:1", "token")
+    client.session = FakeSession()
+    encoder = WireEncoder("msgpack", "gzip")
+    path = f"/runs/{RUN_ID}/events:batch"
+
+    _post_encoded(client, path, EVENTS[:2], encoder)
+    _post_encoded(client, path, EVENTS[2:], encoder)
+
+    assert encoder.plain
+    # The refused batch is sent again as JSON, the next one is sent as JSON straight away
+    assert [sorted(request) for request in client.session.requests] == [["data", "headers"], ["json"], ["json"]]
+    assert client.session.requests[1]["json"] == {"events": EVENTS[:2]}
+    assert client.session.requests[2]["json"] == {"events": EVENTS[2:]}
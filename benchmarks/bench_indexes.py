@@ -0,0 +1,181 @@
+"""
+File: bench_indexes.py
+Description: Measures the latency of the report queries on the tests table before and after the secondary indexes.
+
+Usage:
+    Fills a SQLite database with synthetic tests, times the report queries on the bare table, adds the indexes
+    with SetupDatabase.migrate_database, and times the same queries again.
+
+        python benchmarks/bench_indexes.py --rows 1000000 --runs 1000
+
+    The database file is kept when --db is given, so later runs can skip the (slow) fill with --reuse.
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "App")
+sys.path.insert(0, APP_DIR)
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from SetupDatabase import Base, Test, migrate_database  # noqa: E402
+
+STATUSES = ("PASSED", "PASSED", "PASSED", "PASSED", "FAILED", "SKIPPED", "ERROR")
+
+QUERIES = {
+    "tests of a run": "SELECT * FROM tests WHERE test_run_id = :run_id",
+    "failed tests of a run": "SELECT * FROM tests WHERE test_run_id = :run_id AND test_status = 'FAILED'",
+    "history of a test, last week": "SELECT * FROM tests WHERE test_name = :test_name AND timestamp >= :since ORDER BY timestamp DESC",
+    "full report, first page": "SELECT * FROM tests ORDER BY timestamp DESC, test_id DESC LIMIT 500",
+}
+
+INSERT_TEST = (
+    "INSERT INTO tests (test_id, test_name, test_status, duration, error_exception, test_parameters, timestamp, test_run_id) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def drop_secondary_indexes(conn):
+    """
+    Drops the indexes that migrate_database creates, leaving the tests table as it was before them.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the benchmark database.
+    """
+    for index in Test.__table__.indexes:
+        if index.name != "ix_tests_test_id":
+            conn.execute(f"DROP INDEX IF EXISTS {index.name}")
+
+
+def fill_database(database_path: str, rows: int, runs: int, test_names: int):
+    """
+    Creates the tables without the secondary indexes and fills them with synthetic tests.
+
+    Args:
+        database_path (str): Path of the SQLite database file.
+        rows (int): Number of tests to insert.
+        runs (int): Number of test runs the tests are spread over.
+        test_names (int): Number of distinct test names.
+
+    Returns:
+        Tuple[List[str], List[str]]: The run IDs and test names used.
+    """
+    engine = create_engine(f"sqlite:///{database_path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    run_ids = [str(uuid.uuid4()) for _ in range(runs)]
+    names = [f"test_module_{i % 97}.py::test_case_{i}" for i in range(test_names)]
+    start = datetime.now() - timedelta(days=365)
+    per_run = max(1, rows // runs)
+
+    conn = sqlite3.connect(database_path)
+    drop_secondary_indexes(conn)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executemany(
+        "INSERT INTO test_runs (test_run_id, start_time, end_time) VALUES (?, ?, ?)",
+        [(run_id, start + timedelta(hours=8 * i), start + timedelta(hours=8 * i, minutes=30))
+         for i, run_id in enumerate(run_ids)],
+    )
+
+    chunk = []
+    for i in range(rows):
+        run_index = min(i // per_run, runs - 1)
+        timestamp = start + timedelta(hours=8 * run_index, seconds=i % per_run)
+        chunk.append((
+            str(uuid.uuid4()), names[i % test_names], random.choice(STATUSES), random.expovariate(20),
+            None, "{}", timestamp.isoformat(sep=" "), run_ids[run_index],
+        ))
+        if len(chunk) == 50000:
+            conn.executemany(INSERT_TEST, chunk)
+            chunk = []
+    if chunk:
+        conn.executemany(INSERT_TEST, chunk)
+    conn.commit()
+    conn.close()
+
+    return run_ids, names
+
+
+def time_queries(database_path: str, parameters: dict, repeat: int) -> dict:
+    """
+    Times every report query.
+
+    Args:
+        database_path (str): Path of the SQLite database file.
+        parameters (dict): Bind parameters of the queries.
+        repeat (int): Number of executions per query.
+
+    Returns:
+        dict: Median latency in milliseconds per query.
+    """
+    engine = create_engine(f"sqlite:///{database_path}")
+    latencies = {}
+    with engine.connect() as conn:
+        for label, query in QUERIES.items():
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                conn.execute(text(query), parameters).fetchall()
+                samples.append((time.perf_counter() - started) * 1000)
+            latencies[label] = statistics.median(samples)
+    engine.dispose()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="number of tests to insert")
+    parser.add_argument("--runs", type=int, default=1000, help="number of test runs")
+    parser.add_argument("--test-names", type=int, default=2000, help="number of distinct test names")
+    parser.add_argument("--repeat", type=int, default=5, help="executions per query")
+    parser.add_argument("--db", help="database file to use (a temporary file by default)")
+    parser.add_argument("--reuse", action="store_true", help="reuse the data already in --db")
+    args = parser.parse_args()
+
+    database_path = args.db or os.path.join(tempfile.mkdtemp(), "bench_indexes.db")
+
+    if args.reuse:
+        conn = sqlite3.connect(database_path)
+        run_ids = [row[0] for row in conn.execute("SELECT test_run_id FROM test_runs")]
+        names = [row[0] for row in conn.execute("SELECT DISTINCT test_name FROM tests LIMIT 100")]
+        drop_secondary_indexes(conn)
+        conn.close()
+    else:
+        if os.path.exists(database_path):
+            os.remove(database_path)
+        print(f"Inserting {args.rows} tests into {database_path} ...")
+        started = time.perf_counter()
+        run_ids, names = fill_database(database_path, args.rows, args.runs, args.test_names)
+        print(f"Inserted in {time.perf_counter() - started:.1f}s")
+
+    parameters = {
+        "run_id": run_ids[len(run_ids) // 2],
+        "test_name": names[len(names) // 2],
+        "since": (datetime.now() - timedelta(days=7)).isoformat(sep=" "),
+    }
+
+    before = time_queries(database_path, parameters, args.repeat)
+
+    started = time.perf_counter()
+    migrate_database(f"sqlite:///{database_path}")
+    print(f"Indexes created in {time.perf_counter() - started:.1f}s")
+
+    after = time_queries(database_path, parameters, args.repeat)
+
+    print(f"\n{'query':<32}{'before (ms)':>14}{'after (ms)':>14}{'speedup':>10}")
+    for label in QUERIES:
+        speedup = before[label] / after[label] if after[label] else float("inf")
+        print(f"{label:<32}{before[label]:>14.2f}{after[label]:>14.2f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
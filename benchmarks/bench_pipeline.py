@@ -0,0 +1,191 @@
+"""
+File: bench_pipeline.py
+Description: Load test of the whole reporting pipeline, from the pytest plugin through the FastAPI app into SQLite.
+
+Usage:
+    Generates a synthetic suite of N tests, starts the FastAPI app on a temporary SQLite database, and runs the
+    suite once without and once with reporting, sequentially and under pytest-xdist (when installed).
+
+        python benchmarks/bench_pipeline.py --tests 5000 --workers 4
+
+    For every mode it reports:
+        tests/s        tests executed per second of wall time with reporting enabled
+        overhead       extra wall time per test caused by reporting, in microseconds
+        rows           tests persisted by the service (should equal the number of tests)
+        rows/s         persisted tests per second of wall time with reporting enabled
+
+    Extra plugin options (e.g. --reporting-batch-size=500) can be passed after "--".
+"""
+import os
+import sys
+import time
+import socket
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from datetime import datetime
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+APP_DIR = os.path.join(ROOT_DIR, "App")
+PLUGIN_DIR = os.path.join(ROOT_DIR, "pytest_report_plugin")
+
+SUITE_TEMPLATE = '''import pytest
+
+
+@pytest.mark.parametrize("case", range({tests}))
+def test_synthetic(case):
+    if case % 50 == 49:
+        pytest.skip("every 50th test is skipped")
+    assert case >= 0
+'''
+
+
+def free_port() -> int:
+    """
+    Finds a free TCP port on the loopback interface.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_service(work_dir: str, database_path: str, port: int) -> subprocess.Popen:
+    """
+    Starts the FastAPI app on a fresh SQLite database and waits until it answers.
+
+    The app runs from a scratch directory holding links to its templates and OpenAPI specs, so its log files are
+    written there instead of into the repository.
+
+    Args:
+        work_dir (str): Scratch directory of the service.
+        database_path (str): Path of the SQLite database file.
+        port (int): Port to listen on.
+
+    Returns:
+        subprocess.Popen: The uvicorn process.
+    """
+    os.makedirs(os.path.join(work_dir, "logs"), exist_ok=True)
+    for name in ("templates", "openapi"):
+        os.symlink(os.path.join(APP_DIR, name), os.path.join(work_dir, name))
+
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URL=f"sqlite:///{database_path}", PYTHONPATH=APP_DIR)
+    subprocess.check_call(
+        [sys.executable, "-c", "from SetupDatabase import migrate_database; import os; migrate_database(os.environ['SQLALCHEMY_DATABASE_URL'])"],
+        cwd=work_dir, env=env, stdout=subprocess.DEVNULL,
+    )
+
+    with open(os.path.join(work_dir, "service.log"), "wb") as service_log:
+        service = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=work_dir, env=env, stdout=service_log, stderr=subprocess.STDOUT,
+        )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1)
+            return service
+        except OSError:
+            time.sleep(0.2)
+    service.terminate()
+    raise RuntimeError("The report service did not start")
+
+
+def write_suite(suite_dir: str, tests: int) -> None:
+    """
+    Writes the synthetic suite together with the plugin's conftest.py.
+
+    Args:
+        suite_dir (str): Directory of the suite.
+        tests (int): Number of tests in the suite.
+    """
+    os.makedirs(suite_dir, exist_ok=True)
+    shutil.copy(os.path.join(PLUGIN_DIR, "conftest.py"), os.path.join(suite_dir, "conftest.py"))
+    with open(os.path.join(suite_dir, "test_synthetic.py"), "w") as file:
+        file.write(SUITE_TEMPLATE.format(tests=tests))
+
+
+def run_suite(suite_dir: str, pytest_args: list) -> float:
+    """
+    Runs the synthetic suite and returns its wall time in seconds.
+    """
+    env = dict(os.environ, PYTHONPATH=PLUGIN_DIR)
+    command = [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", *pytest_args]
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=suite_dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    elapsed = time.perf_counter() - started
+    if completed.returncode not in (0, 1):
+        print(completed.stdout.decode(errors="replace")[-2000:])
+        raise RuntimeError(f"pytest exited with code {completed.returncode}")
+    return elapsed
+
+
+def count_rows(database_path: str, since: datetime) -> int:
+    """
+    Counts the tests persisted for the runs started after the given time.
+    """
+    conn = sqlite3.connect(database_path)
+    try:
+        (rows,) = conn.execute(
+            "SELECT COUNT(*) FROM tests JOIN test_runs ON tests.test_run_id = test_runs.test_run_id "
+            "WHERE test_runs.start_time >= ?",
+            (since.isoformat(sep=" "),),
+        ).fetchone()
+    finally:
+        conn.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tests", type=int, default=5000, help="number of tests in the synthetic suite")
+    parser.add_argument("--workers", type=int, default=4, help="number of xdist workers, 0 to skip the xdist mode")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    parser.add_argument("plugin_args", nargs="*", help="extra reporting options, after --")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench_pipeline_")
+    database_path = os.path.join(scratch, "reports.db")
+    suite_dir = os.path.join(scratch, "suite")
+    port = free_port()
+
+    write_suite(suite_dir, args.tests)
+    service = start_service(os.path.join(scratch, "service"), database_path, port)
+
+    modes = [("sequential", [])]
+    if args.workers:
+        try:
+            import xdist  # noqa: F401
+            modes.append((f"xdist -n {args.workers}", ["-n", str(args.workers)]))
+        except ImportError:
+            print("pytest-xdist is not installed, skipping the xdist mode")
+
+    reporting = ["--reporting-enabled", f"--reporting-api-url=http://127.0.0.1:{port}",
+                 "--reporting-auth-token=benchmark", *args.plugin_args]
+    results = []
+    try:
+        for label, mode_args in modes:
+            baseline = run_suite(suite_dir, mode_args)
+            since = datetime.now()
+            reported = run_suite(suite_dir, mode_args + reporting)
+            rows = count_rows(database_path, since)
+            results.append((label, baseline, reported, rows))
+    finally:
+        service.terminate()
+        service.wait()
+        if args.keep:
+            print(f"Scratch directory kept at {scratch}")
+        else:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    print(f"\n{'mode':<14}{'tests':>8}{'baseline s':>12}{'reporting s':>13}{'tests/s':>10}{'overhead us':>13}{'rows':>8}{'rows/s':>10}")
+    for label, baseline, reported, rows in results:
+        overhead = (reported - baseline) / args.tests * 1e6
+        print(f"{label:<14}{args.tests:>8}{baseline:>12.2f}{reported:>13.2f}{args.tests / reported:>10.0f}"
+              f"{overhead:>13.0f}{rows:>8}{rows / reported:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+File: bench_wire.py
+Description: Compares the size and the CPU cost of the wire formats of the event batches.
+
+Usage:
+    Builds a batch of synthetic test events (half starts, half finishes) and, for plain JSON as sent today and
+    every installed format/compression pair, measures:
+        bytes         size of the request body
+        encode ms     plugin CPU time to encode the batch (WireEncoder.encode)
+        decode ms     service CPU time to turn the body into the rows of TestManager.ingest_rows
+
+        python benchmarks/bench_wire.py --events 10000
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+APP_DIR = os.path.join(ROOT_DIR, "App")
+PLUGIN_DIR = os.path.join(ROOT_DIR, "pytest_report_plugin")
+sys.path[:0] = [APP_DIR, PLUGIN_DIR]
+
+# Database.py logs into logs/ relative to the working directory
+os.chdir(tempfile.mkdtemp(prefix="bench_wire_"))
+os.makedirs("logs")
+
+from Database import event_rows  # noqa: E402
+from Wire import decode_events, decompress, is_json  # noqa: E402
+from pytest_report_plugin.wire import COMPRESSIONS, WIRE_FORMATS, WireEncoder, available  # noqa: E402
+
+STATUSES = ("PASSED", "PASSED", "PASSED", "FAILED", "SKIPPED")
+
+
+def make_events(count: int) -> list:
+    """
+    Builds count synthetic events: a start and a finish for count / 2 parametrized tests.
+    """
+    events = []
+    finishes = []
+    started = datetime.now()
+    for i in range(count // 2):
+        test_id = str(uuid.uuid4())
+        events.append({
+            "type": "start",
+            "test_id": test_id,
+            "test_name": f"test_case_{i % 40}[{i}]",
+            "test_parameters": {"case": i, "mode": "fast" if i % 2 else "slow"},
+            "timestamp": (started + timedelta(milliseconds=i)).isoformat(),
+        })
+        status = STATUSES[i % len(STATUSES)]
+        finishes.append({
+            "type": "finish",
+            "test_id": test_id,
+            "test_status": status,
+            "error_exception": "test_module.py:42: AssertionError: assert 1 == 2" if status == "FAILED" else None,
+            "duration": 0.0001 * (i % 97),
+        })
+    return events + finishes
+
+
+def cpu_ms(function, repeat: int) -> float:
+    """
+    Returns the best process CPU time of function over repeat calls, in milliseconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        function()
+        best = min(best, time.process_time() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=10000, help="number of events in the batch")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements per format, the best is kept")
+    args = parser.parse_args()
+
+    events = make_events(args.events)
+    run_id = str(uuid.uuid4())
+
+    # Today's requests: requests.post(json=...) with the default json.dumps separators
+    baseline = json.dumps({"events": events}).encode("utf-8")
+
+    def decode_json(body, encoding):
+        return event_rows(run_id, json.loads(decompress(body, encoding))["events"])
+
+    results = [(
+        "json (today)", len(baseline),
+        cpu_ms(lambda: json.dumps({"events": events}).encode("utf-8"), args.repeat),
+        cpu_ms(lambda: decode_json(baseline, None), args.repeat),
+    )]
+
+    for wire_format in WIRE_FORMATS:
+        for compression in COMPRESSIONS:
+            if not available(wire_format, compression):
+                continue
+            encoder = WireEncoder(wire_format, compression)
+            body, headers = encoder.encode(events)
+            content_type, encoding = headers["Content-Type"], headers.get("Content-Encoding")
+            if is_json(content_type):
+                decode = lambda: decode_json(body, encoding)  # noqa: E731
+            else:
+                decode = lambda: decode_events(body, content_type, encoding, run_id)  # noqa: E731
+            results.append((
+                f"{wire_format}+{compression}", len(body),
+                cpu_ms(lambda: encoder.encode(events), args.repeat),
+                cpu_ms(decode, args.repeat),
+            ))
+
+    print(f"{args.events} events\n")
+    print(f"{'format':<16}{'bytes':>12}{'vs today':>10}{'encode ms':>12}{'decode ms':>12}")
+    for label, size, encode, decode in results:
+        print(f"{label:<16}{size:>12}{size / len(baseline):>9.0%}{encode:>12.1f}{decode:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
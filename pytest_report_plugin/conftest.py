@@ -26,6 +26,99 @@ def pytest_addoption(parser):
         default="",
         help="Authorization token for accessing the test report service",
     )
+    parser.addoption(
+        "--reporting-batch-size",
+        action="store",
+        type=int,
+        default=100,
+        help="Number of test events sent to the test report service in one batch",
+    )
+    parser.addoption(
+        "--reporting-flush-interval",
+        action="store",
+        type=float,
+        default=1.0,
+        help="Maximum number of seconds a test event is held before its batch is sent",
+    )
+    parser.addoption(
+        "--reporting-pool-size",
+        action="store",
+        type=int,
+        default=10,
+        help="Maximum number of keep-alive connections to the test report service",
+    )
+    parser.addoption(
+        "--reporting-spool-dir",
+        action="store",
+        default="",
+        help="Directory of the spool files holding test events until they are uploaded (defaults to a temporary directory)",
+    )
+    parser.addoption(
+        "--reporting-timeout",
+        action="store",
+        type=float,
+        default=10.0,
+        help="Connect and read timeout of every call to the test report service, in seconds",
+    )
+    parser.addoption(
+        "--reporting-drain-timeout",
+        action="store",
+        type=float,
+        default=30.0,
+        help="Maximum number of seconds spent uploading the remaining test events at the end of the session",
+    )
+    parser.addoption(
+        "--reporting-fixtures",
+        action="store_true",
+        help="Profile the setup and teardown time of every fixture and send the ranking with the test run",
+    )
+    parser.addoption(
+        "--reporting-profile-top",
+        action="store",
+        type=int,
+        default=0,
+        help="Sample the stacks of every test call and send the profiles of the N slowest calls with the test run",
+    )
+    parser.addoption(
+        "--reporting-schedule",
+        action="store_true",
+        help="Run the tests with the longest recent durations first under pytest-xdist",
+    )
+    parser.addoption(
+        "--reporting-flaky",
+        action="store",
+        choices=("quarantine", "rerun"),
+        default=None,
+        help="Quarantine (non-strict xfail) or rerun the tests the report service knows as flaky",
+    )
+    parser.addoption(
+        "--reporting-flaky-reruns",
+        action="store",
+        type=int,
+        default=2,
+        help="Number of times a failing flaky test is called again with --reporting-flaky=rerun",
+    )
+    parser.addoption(
+        "--reporting-summary",
+        action="store",
+        type=int,
+        default=5,
+        help="Number of slowest tests and most frequent errors listed in the end-of-run summary of the reported results, 0 hides the summary",
+    )
+    parser.addoption(
+        "--reporting-wire-format",
+        action="store",
+        choices=("json", "msgpack", "cbor"),
+        default="json",
+        help="Encoding of the test event batches sent to the test report service",
+    )
+    parser.addoption(
+        "--reporting-compression",
+        action="store",
+        choices=("none", "gzip", "zstd"),
+        default="none",
+        help="Compression of the test event batches sent to the test report service",
+    )
 
 @pytest.fixture(scope="class")
 def report_plugin_config(request):
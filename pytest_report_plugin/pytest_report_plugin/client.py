@@ -0,0 +1,184 @@
+"""
+File: client.py
+Description: This module contains the HTTP client used by the plugin to talk to the report API.
+
+Usage:
+    A single ReportClient is shared by the ReportPlugin and its background EventSender. It wraps a
+    requests.Session with a pooled HTTPAdapter, so TCP (and TLS) connections are kept alive and reused
+    across calls, and the Authorization header is built once for the whole session.
+
+    The pool size can be tuned with:
+        --reporting-pool-size=<CONNECTIONS>
+
+    Every call is bounded by a timeout and guarded by a CircuitBreaker shared by the whole session. While the
+    breaker is open, calls raise CircuitOpenError immediately instead of waiting on an unresponsive service.
+    The timeout is set with:
+        --reporting-timeout=<SECONDS>
+"""
+import logging
+import requests
+from typing import Any, Dict
+from requests.adapters import HTTPAdapter
+from pytest_report_plugin.retry import CircuitBreaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+class APIError(RuntimeError):
+    """
+    Raised when the report API answers a request with a non-2xx status code.
+    """
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class UnsupportedMediaTypeError(APIError):
+    """
+    Raised when the report API cannot decode the encoding of a request body.
+    """
+
+
+class ReportClient:
+    """
+    A keep-alive, connection-pooled HTTP client for the test report service API.
+    """
+
+    def __init__(self, api_url: str, auth_token: str, pool_size: int = 10, timeout: float = 10.0):
+        """
+        Initialize the ReportClient and its pooled session.
+
+        Args:
+            api_url (str): Base URL of the test report service API.
+            auth_token (str): Authorization token for accessing the test report service.
+            pool_size (int, optional): Maximum number of connections kept alive per host. Defaults to 10.
+            timeout (float, optional): Connect and read timeout of every call, in seconds. Defaults to 10.0.
+        """
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {auth_token}"
+        # The plugin never reads response bodies, ask the service for bare acknowledgements
+        self.session.headers["Prefer"] = "return=minimal"
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.adapter = adapter
+
+    def post(self, path: str, data: Dict[str, Any]) -> requests.Response:
+        """
+        Send a POST request with a JSON body to the given API path.
+
+        Args:
+            path (str): Path of the endpoint, relative to the API URL.
+            data (Dict[str, Any]): The JSON body of the request.
+
+        Raises:
+            CircuitOpenError: If the service is known to be down and the call was not attempted.
+            requests.RequestException: If the request could not be sent.
+            APIError: If the API did not answer with a 2xx status code.
+
+        Returns:
+            requests.Response: The response of the API.
+        """
+        return self._send("POST", path, json=data)
+
+    def get(self, path: str, params: Dict[str, Any] = None) -> requests.Response:
+        """
+        Send a GET request to the given API path.
+
+        Args:
+            path (str): Path of the endpoint, relative to the API URL.
+            params (Dict[str, Any], optional): The query parameters of the request.
+
+        Raises:
+            CircuitOpenError: If the service is known to be down and the call was not attempted.
+            requests.RequestException: If the request could not be sent.
+            APIError: If the API did not answer with a 2xx status code.
+
+        Returns:
+            requests.Response: The response of the API.
+        """
+        return self._send("GET", path, params=params)
+
+    def post_body(self, path: str, body: bytes, headers: Dict[str, str]) -> requests.Response:
+        """
+        Send a POST request with an already encoded body to the given API path.
+
+        Args:
+            path (str): Path of the endpoint, relative to the API URL.
+            body (bytes): The encoded body of the request.
+            headers (Dict[str, str]): Content-Type and Content-Encoding of the body.
+
+        Raises:
+            CircuitOpenError: If the service is known to be down and the call was not attempted.
+            UnsupportedMediaTypeError: If the API cannot decode the body.
+            requests.RequestException: If the request could not be sent.
+            APIError: If the API did not answer with a 2xx status code.
+
+        Returns:
+            requests.Response: The response of the API.
+        """
+        return self._send("POST", path, data=body, headers=headers)
+
+    def _send(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Send a request through the circuit breaker, see post().
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{method} {path} skipped: the report service is unavailable")
+
+        # Every outcome is recorded, whatever the call raised: an unrecorded half-open trial would keep the breaker open
+        succeeded = False
+        try:
+            response = self.session.request(method, f"{self.api_url}{path}", timeout=self.timeout, **kwargs)
+            # A 4xx answer is a bad request, not a sign that the service is down
+            succeeded = response.status_code < 500
+        finally:
+            if succeeded:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
+        if response.status_code == 415:
+            raise UnsupportedMediaTypeError(f"{method} {path} failed: HTTP 415", 415)
+        if response.status_code < 200 or response.status_code >= 300:
+            raise APIError(f"{method} {path} failed: HTTP {response.status_code}", response.status_code)
+        return response
+
+    def connection_stats(self) -> Dict[str, int]:
+        """
+        Collect connection reuse counters from the pools of the session.
+
+        Returns:
+            Dict[str, int]: Number of requests sent, connections opened and requests that reused a connection.
+        """
+        requests_sent = 0
+        connections_opened = 0
+        pools = self.adapter.poolmanager.pools
+
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                requests_sent += pool.num_requests
+                connections_opened += pool.num_connections
+
+        return {
+            "requests": requests_sent,
+            "connections": connections_opened,
+            "reused": max(0, requests_sent - connections_opened),
+        }
+
+    def close(self) -> None:
+        """
+        Log the connection reuse counters and close every pooled connection.
+        """
+        stats = self.connection_stats()
+        logger.info(
+            f"HTTP requests: {stats['requests']}, connections opened: {stats['connections']}, "
+            f"requests on reused connections: {stats['reused']}"
+        )
+        self.session.close()
@@ -0,0 +1,143 @@
+"""
+File: definitions.py
+Description: This module contains the registry of the test definitions already known to the report API.
+
+Usage:
+    Every test has a stable definition ID, derived from its node ID with the same hash as the service (the first
+    63 bits of its SHA-1). The node ID, name and parameters of a test are sent once, with the first start of the
+    test; later starts, in this run and in the next ones, only carry the definition ID.
+
+    The definitions accepted by the service are remembered in the pytest cache (.pytest_cache), one entry per
+    API URL, so repeat runs skip them from their very first batch. A service that does not know a definition
+    answers 409 Conflict and the batch is sent again in full, so a stale cache (a cleared or different database)
+    costs one extra request and is corrected.
+
+    Runs with the cache provider disabled (-p no:cacheprovider) only skip the definitions within the run.
+"""
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+# Key of the known definitions in the pytest cache, followed by a hash of the API URL
+CACHE_KEY = "report_plugin/definitions"
+
+
+def definition_id(nodeid: str) -> int:
+    """
+    Return the definition ID of a test, the first 63 bits of the SHA-1 of its node ID.
+
+    Args:
+        nodeid (str): The pytest node ID of the test.
+
+    Returns:
+        int: A positive 64-bit integer, identical to SetupDatabase.definition_id_of on the service.
+    """
+    return int.from_bytes(hashlib.sha1(nodeid.encode("utf-8")).digest()[:8], "big") >> 1
+
+
+def api_cache_key(prefix: str, api_url: str) -> str:
+    """
+    Return a pytest cache key specific to an API URL, so runs against different services do not share entries.
+
+    Args:
+        prefix (str): The key of the entry, e.g. CACHE_KEY.
+        api_url (str): Base URL of the test report service API.
+
+    Returns:
+        str: The prefix followed by a short hash of the URL.
+    """
+    return f"{prefix}/{hashlib.sha1(api_url.rstrip('/').encode('utf-8')).hexdigest()[:12]}"
+
+
+class DefinitionRegistry:
+    """
+    Remembers the node IDs and definition IDs of the tests the report API already knows.
+    """
+
+    def __init__(self, known: Optional[Dict[str, int]] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            known (Dict[str, int], optional): Definition IDs known to the API, by node ID. Defaults to none.
+        """
+        self.known: Dict[str, int] = dict(known or {})
+        self._known_ids = set(self.known.values())
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(api_url: str) -> str:
+        """
+        Return the pytest cache key of the definitions known to the API at the given URL.
+        """
+        return api_cache_key(CACHE_KEY, api_url)
+
+    @classmethod
+    def load(cls, cache: Any, api_url: str) -> "DefinitionRegistry":
+        """
+        Create a registry from the definitions remembered by earlier runs.
+
+        Args:
+            cache (pytest.Cache): The pytest cache, or None when the cache provider is disabled.
+            api_url (str): Base URL of the test report service API.
+
+        Returns:
+            DefinitionRegistry: The registry, empty when nothing was remembered.
+        """
+        known = cache.get(cls.cache_key(api_url), None) if cache is not None else None
+        return cls(known if isinstance(known, dict) else None)
+
+    def save(self, cache: Any, api_url: str) -> None:
+        """
+        Remember the known definitions for the next runs.
+
+        Args:
+            cache (pytest.Cache): The pytest cache, or None when the cache provider is disabled.
+            api_url (str): Base URL of the test report service API.
+        """
+        if cache is not None:
+            with self._lock:
+                known = dict(self.known)
+            cache.set(self.cache_key(api_url), known)
+
+    def strip(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Drop the node ID, name and parameters of the start events whose definition is known to the API.
+
+        Args:
+            events (List[Dict[str, Any]]): The events of a batch, left unchanged.
+
+        Returns:
+            List[Dict[str, Any]]: events itself when nothing was dropped, a stripped copy otherwise.
+        """
+        stripped = events
+        with self._lock:
+            for index, event in enumerate(events):
+                if event["type"] == "start" and "nodeid" in event and event.get("definition_id") in self._known_ids:
+                    if stripped is events:
+                        stripped = list(events)
+                    stripped[index] = {
+                        key: value for key, value in event.items()
+                        if key not in ("nodeid", "test_name", "test_parameters")
+                    }
+        return stripped
+
+    def acknowledge(self, events: List[Dict[str, Any]]) -> None:
+        """
+        Record the definitions of a batch the API accepted.
+        """
+        with self._lock:
+            for event in events:
+                if event["type"] == "start" and "nodeid" in event:
+                    self.known[event["nodeid"]] = event["definition_id"]
+                    self._known_ids.add(event["definition_id"])
+
+    def forget(self, events: List[Dict[str, Any]]) -> None:
+        """
+        Forget the definitions of a batch, after the API reported that it does not know some of them.
+        """
+        with self._lock:
+            for event in events:
+                if event["type"] == "start" and "nodeid" in event:
+                    self.known.pop(event["nodeid"], None)
+                    self._known_ids.discard(event["definition_id"])
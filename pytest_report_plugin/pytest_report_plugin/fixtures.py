@@ -0,0 +1,139 @@
+"""
+File: fixtures.py
+Description: This module contains the fixture profiler of the plugin.
+
+Usage:
+    With --reporting-fixtures, the ReportPlugin times every fixture setup and teardown with a nanosecond clock
+    and counts the tests that used each fixture. A fixture is identified by its name and the node ID where it is
+    defined (its baseid, "" for fixtures of plugins), so fixtures overriding each other are kept apart.
+
+    For every fixture the profiler reports:
+        scope          session, package, module, class or function
+        setups         number of times the fixture was set up
+        setup_ns       total and longest (max_setup_ns) setup time, without the setup of the fixtures it requested
+        teardown_ns    total teardown time, measured from its first finalizer to pytest_fixture_post_finalizer
+        uses           number of tests that used the fixture
+
+    A fixture whose uses are far above its setups is already shared; an expensive fixture with as many setups as
+    uses is a candidate for a wider scope or for caching.
+
+    Under pytest-xdist every worker profiles its own fixtures and hands the stats to the controller through
+    workeroutput, where they are merged and sent with the run.
+"""
+import time
+from typing import Any, Dict, List, Tuple
+
+# Key of the fixture stats in the workeroutput of xdist workers
+FIXTURES_KEY = "reporting_fixtures"
+
+# Counters that are summed when stats are merged
+_SUMMED = ("setups", "setup_ns", "teardown_ns", "uses")
+
+
+class FixtureProfiler:
+    """
+    Accumulates setup, teardown and usage stats per fixture definition.
+    """
+
+    def __init__(self):
+        self.stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # Start of the running teardown of each fixture definition, by id() of its FixtureDef
+        self._teardowns: Dict[int, int] = {}
+        # Time spent in the setups nested in each running setup, innermost last
+        self._nested: List[int] = []
+
+    def _entry(self, name: str, baseid: str, scope: str) -> Dict[str, Any]:
+        """
+        Return the stats of a fixture definition, creating them on first use.
+        """
+        entry = self.stats.get((name, baseid))
+        if entry is None:
+            entry = self.stats[(name, baseid)] = {
+                "fixture_name": name,
+                "baseid": baseid,
+                "scope": scope,
+                "setups": 0,
+                "setup_ns": 0,
+                "max_setup_ns": 0,
+                "teardown_ns": 0,
+                "uses": 0,
+            }
+        return entry
+
+    def setup(self, fixturedef: Any):
+        """
+        Generator wrapped around a fixture setup by the pytest_fixture_setup hook wrapper of the plugin.
+
+        Args:
+            fixturedef (FixtureDef): The fixture being set up.
+        """
+        started = time.perf_counter_ns()
+        self._nested.append(0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter_ns() - started
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+        # A fixture requested by this one may be set up inside its setup, it is accounted for on its own
+        elapsed -= nested
+
+        entry = self._entry(fixturedef.argname, fixturedef.baseid, fixturedef.scope)
+        entry["setups"] += 1
+        entry["setup_ns"] += elapsed
+        entry["max_setup_ns"] = max(entry["max_setup_ns"], elapsed)
+
+        # Finalizers run last in, first out: this one runs before the teardown of the fixture itself
+        key = id(fixturedef)
+        fixturedef.addfinalizer(lambda: self._teardowns.__setitem__(key, time.perf_counter_ns()))
+
+    def finalized(self, fixturedef: Any) -> None:
+        """
+        Record the teardown of a fixture, from the pytest_fixture_post_finalizer hook.
+
+        Args:
+            fixturedef (FixtureDef): The fixture that was torn down.
+        """
+        started = self._teardowns.pop(id(fixturedef), None)
+        if started is not None:
+            entry = self._entry(fixturedef.argname, fixturedef.baseid, fixturedef.scope)
+            entry["teardown_ns"] += time.perf_counter_ns() - started
+
+    def used_by(self, item: Any) -> None:
+        """
+        Count a test as a user of every fixture it requests, whether the fixture was set up for it or reused.
+
+        Args:
+            item (Item): The test, after its setup.
+        """
+        fixtureinfo = getattr(item, "_fixtureinfo", None)
+        if fixtureinfo is None:
+            return
+        for name in item.fixturenames:
+            fixturedefs = fixtureinfo.name2fixturedefs.get(name)
+            if fixturedefs:
+                # The last definition is the closest one, the one the test gets
+                fixturedef = fixturedefs[-1]
+                self._entry(name, fixturedef.baseid, fixturedef.scope)["uses"] += 1
+
+    def merge(self, stats: List[Dict[str, Any]]) -> None:
+        """
+        Add the stats of another profiler, those of an xdist worker.
+
+        Args:
+            stats (List[Dict[str, Any]]): The stats, as returned by results().
+        """
+        for other in stats:
+            entry = self._entry(other["fixture_name"], other["baseid"], other["scope"])
+            for counter in _SUMMED:
+                entry[counter] += other[counter]
+            entry["max_setup_ns"] = max(entry["max_setup_ns"], other["max_setup_ns"])
+
+    def results(self) -> List[Dict[str, Any]]:
+        """
+        Return the stats of every fixture that was set up, the most expensive first.
+        """
+        used = [dict(entry) for entry in self.stats.values() if entry["setups"]]
+        used.sort(key=lambda entry: entry["setup_ns"] + entry["teardown_ns"], reverse=True)
+        return used
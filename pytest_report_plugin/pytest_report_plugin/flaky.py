@@ -0,0 +1,93 @@
+"""
+File: flaky.py
+Description: This module contains the handling of the tests the report service knows as flaky.
+
+Usage:
+    The service keeps the last outcomes of every test and ranks the tests that keep flipping between pass and
+    fail (GET /flaky). With --reporting-flaky, the plugin fetches the list at session start and either:
+
+        quarantine   marks the flaky tests as non-strict xfail: their failures no longer fail the session, but
+                     they are still reported as FAILED, so the service sees a test leave the list once it is fixed
+        rerun        calls a failing flaky test again, up to --reporting-flaky-reruns times, with the same
+                     fixtures; the test fails only when every attempt failed
+
+    The list is kept in the pytest cache, one entry per API URL, and used when the service cannot be reached.
+    Under pytest-xdist the controller fetches the list and hands it to the workers through workerinput.
+"""
+import inspect
+import logging
+import functools
+from typing import Any, Callable, Optional, Set
+from pytest_report_plugin.definitions import api_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Key of the flaky tests in the pytest cache, followed by a hash of the API URL
+CACHE_KEY = "report_plugin/flaky"
+
+# Reason of the xfail marker of quarantined tests, also how their reports are told apart
+QUARANTINE_REASON = "quarantined as flaky by the test report service"
+
+
+def load_flaky(client: Any, cache: Any, api_url: str) -> Optional[Set[int]]:
+    """
+    Return the definition IDs of the flaky tests, from the service or from the cache when it cannot be reached.
+
+    Args:
+        client (ReportClient): The client of the test report service API.
+        cache (pytest.Cache): The pytest cache, or None when the cache provider is disabled.
+        api_url (str): Base URL of the test report service API.
+
+    Returns:
+        Set[int]: The definition IDs, or None when the list is neither available from the service nor cached.
+    """
+    key = api_cache_key(CACHE_KEY, api_url)
+    try:
+        response = client.get("/flaky")
+        flaky = [test["definition_id"] for test in response.json()["tests"]]
+        if cache is not None:
+            cache.set(key, flaky)
+    except Exception as e:
+        flaky = cache.get(key, None) if cache is not None else None
+        logger.warning(f"Could not fetch the flaky tests, {'using cached ones' if flaky is not None else 'none handled'}: {e}")
+        if not isinstance(flaky, list):
+            return None
+
+    return {int(definition) for definition in flaky}
+
+
+def is_quarantined(report: Any) -> bool:
+    """
+    Return True for the report of a test quarantined by the plugin that failed (xfailed) or passed (xpassed).
+    """
+    return getattr(report, "wasxfail", None) == QUARANTINE_REASON
+
+
+def retrying(function: Callable, reruns: int, nodeid: str) -> Callable:
+    """
+    Wrap a test function so that a failing call is repeated.
+
+    Skips, xfails and other pytest outcomes are not failures and are not repeated. Coroutine functions are run by
+    plugins that inspect the function itself, they are returned unwrapped.
+
+    Args:
+        function (Callable): The test function.
+        reruns (int): Number of calls repeated after a failure.
+        nodeid (str): The node ID of the test, for the log.
+
+    Returns:
+        Callable: The wrapped test function.
+    """
+    if inspect.iscoroutinefunction(function):
+        return function
+
+    @functools.wraps(function)
+    def retried(*args, **kwargs):
+        for attempt in range(reruns):
+            try:
+                return function(*args, **kwargs)
+            except Exception as e:
+                logger.warning(f"Flaky test {nodeid} failed attempt {attempt + 1} of {reruns + 1}: {e!r}")
+        return function(*args, **kwargs)
+
+    return retried
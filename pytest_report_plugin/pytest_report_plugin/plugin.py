@@ -11,24 +11,89 @@ Usage:
         pytest --reporting-enabled --reporting-api-url=<API_URL> --reporting-auth-token=<AUTH_TOKEN>
 
     The API URL and authentication token must be provided for reporting to work properly.
+
+    Test events are shipped in batches by a background sender. The batching can be tuned with:
+        --reporting-batch-size=<EVENTS> --reporting-flush-interval=<SECONDS>
+
+    All API calls share one keep-alive connection pool, sized with:
+        --reporting-pool-size=<CONNECTIONS>
+
+    Events are written to a local spool file before they are uploaded, so a slow or unreachable API never
+    delays the tests and no result is lost. Failed uploads are retried off the test thread with exponential
+    backoff, and every API call goes through a shared circuit breaker. A spool left behind by a failed
+    upload can be replayed later:
+        --reporting-spool-dir=<DIRECTORY> --reporting-timeout=<SECONDS> --reporting-drain-timeout=<SECONDS>
+        python -m pytest_report_plugin.spool replay <SPOOL_FILE> --api-url=<API_URL> --auth-token=<AUTH_TOKEN>
+
+    Event batches can be sent in a compact, compressed binary encoding instead of JSON:
+        --reporting-wire-format=json|msgpack|cbor --reporting-compression=none|gzip|zstd
+
+    Tests are identified across runs by a definition ID hashed from their node ID. The name and parameters of
+    a test are only sent until the service has acknowledged its definition; the acknowledged definitions are
+    remembered in the pytest cache, so repeat runs send narrow result rows from the start.
+
+    The setup, call and teardown phases of every test are timed separately with a nanosecond clock
+    (time.perf_counter_ns), so the cost of heavy fixtures shows up next to the duration of the test itself.
+
+    Fixture setup and teardown costs, with the scope of every fixture and the number of tests that used it,
+    are profiled and sent with the run with:
+        --reporting-fixtures
+
+    The calls of the N slowest tests can be profiled by a low-overhead stack sampler, their profiles are sent
+    with the run and shown as flame graphs by the service:
+        --reporting-profile-top=<N>
+
+    Under pytest-xdist the longest tests, by their p95 duration over the recent runs known to the service, can
+    be run first so that no worker is left running a long test after the others are done:
+        --reporting-schedule
+
+    The tests the service knows as flaky can be quarantined (non-strict xfail, still reported with their real
+    outcome) or rerun when they fail:
+        --reporting-flaky=quarantine|rerun --reporting-flaky-reruns=<N>
+
+    The results of the session are kept in a columnar store (see store.py), a few dozen bytes per test, from
+    which the finish events are built and an end-of-run summary is shown, listing the N slowest tests and most
+    frequent errors (0 hides it):
+        --reporting-summary=<N>
+
+    Under pytest-xdist the controller creates a single run and shares its ID with the workers. The workers
+    attach the test starts to their reports, which xdist already sends to the controller, and only the
+    controller ships events to the API. Fixture stats and profiles are collected by each worker and merged on the controller.
 """
+import os
 import time
 import uuid
+import tempfile
 import pytest
 import logging
-import requests
 from datetime import datetime
-from typing import Union, Dict, Any
+from typing import Union, Dict, Any, Tuple
+from pytest_report_plugin.client import ReportClient
+from pytest_report_plugin.sender import EventSender
+from pytest_report_plugin.spool import Spool
+from pytest_report_plugin.sanitize import ParameterSanitizer
+from pytest_report_plugin.wire import WireEncoder
+from pytest_report_plugin.definitions import DefinitionRegistry, definition_id
+from pytest_report_plugin.fixtures import FIXTURES_KEY, FixtureProfiler
+from pytest_report_plugin.profiler import PROFILES_KEY, SlowestProfiles, StackSampler, collapsed
+from pytest_report_plugin.schedule import deal, load_chunk_size, load_durations, longest_first
+from pytest_report_plugin.flaky import QUARANTINE_REASON, is_quarantined, load_flaky, retrying
+from pytest_report_plugin.store import ResultStore
 
 from _pytest.nodes import Item
 from _pytest.reports import TestReport
-from _pytest.reports import CollectReport
 
 
 # Configure logging
 logging.basicConfig(filename='test_reporting.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Per-item storage of the test start recorded at setup
+test_start_key = pytest.StashKey[Dict[str, Any]]()
+
+# Per-item storage of the duration of each phase, in nanoseconds
+phase_ns_key = pytest.StashKey[Dict[str, int]]()
+
 class ReportPlugin:
     """
     A pytest plugin for reporting test results to an API.
@@ -45,82 +110,331 @@ class ReportPlugin:
         self.enabled = config.getoption("reporting_enabled", False)
         self.api_url = config.getoption("reporting_api_url", "")
         self.auth_token = config.getoption("reporting_auth_token", "")
+        self.batch_size = config.getoption("reporting_batch_size", 100)
+        self.flush_interval = config.getoption("reporting_flush_interval", 1.0)
+        self.pool_size = config.getoption("reporting_pool_size", 10)
+        self.timeout = config.getoption("reporting_timeout", 10.0)
+        self.drain_timeout = config.getoption("reporting_drain_timeout", 30.0)
+        self.wire_format = config.getoption("reporting_wire_format", "json")
+        self.compression = config.getoption("reporting_compression", "none")
+        self.spool_dir = config.getoption("reporting_spool_dir", None) or os.path.join(tempfile.gettempdir(), "pytest-report-spool")
+        self.client = None
+        self.sender = None
+        self.registry = None
+        self.run_id = None
+        # xdist workers get a workerinput attribute, the controller and plain runs do not
+        self.is_worker = hasattr(config, "workerinput")
+        self.sanitizer = ParameterSanitizer()
+        self.fixtures = FixtureProfiler() if config.getoption("reporting_fixtures", False) else None
+        profile_top = config.getoption("reporting_profile_top", 0)
+        self.sampler = StackSampler() if profile_top > 0 else None
+        self.profiles = SlowestProfiles(profile_top) if profile_top > 0 else None
+        self.schedule = config.getoption("reporting_schedule", False)
+        # p95 duration by definition ID, fetched by the xdist controller for its workers
+        self.durations = None
+        self.flaky_mode = config.getoption("reporting_flaky", None)
+        self.flaky_reruns = config.getoption("reporting_flaky_reruns", 2)
+        # Definition IDs of the flaky tests, fetched at session start by the controller
+        self.flaky = None
+        # Results of the session, one row per test, see store.py
+        self.results = ResultStore()
+        self.summary_top = config.getoption("reporting_summary", 5)
+        # Test ID and result row of the tests whose start was queued but whose finish was not, keyed by node ID
+        self.pending: Dict[str, Tuple[str, int]] = {}
         logger.info(f"Plugin initialized with API URL: {self.api_url}, Auth Token: {'*' * len(self.auth_token)}")
 
     @pytest.hookimpl(tryfirst=True)
-    def pytest_sessionstart(self):
+    def pytest_sessionstart(self, session: pytest.Session):
         """
         Hook function called at the beginning of the test session.
         Starts the test run if reporting is enabled.
+
+        Under pytest-xdist only the controller talks to the API. Workers reuse the run ID handed
+        over by the controller and ship nothing themselves.
         """
 
+        if self.enabled and self.is_worker:
+            self.run_id = session.config.workerinput.get("reporting_run_id")
+            # The controller could not create the run, so there is nothing to report to
+            self.enabled = self.run_id is not None
+            flaky = session.config.workerinput.get("reporting_flaky")
+            self.flaky = set(flaky) if flaky is not None else None
+            return None
+
         # check reporting enabled
         if self.enabled:
-            
+
+            self.client = ReportClient(self.api_url, self.auth_token, self.pool_size, self.timeout)
+            self.registry = DefinitionRegistry.load(getattr(session.config, "cache", None), self.api_url)
             self.run_id = self.start_test_run()
             logger.info("Test run started")
+            if self.flaky_mode:
+                self.flaky = load_flaky(self.client, getattr(session.config, "cache", None), self.api_url)
         
         return None
 
-    @pytest.hookimpl(tryfirst=True)
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_configure_node(self, node) -> None:
+        """
+        pytest-xdist hook called on the controller for every worker before it starts.
+        Hands the run ID, the flaky tests, and the test durations when scheduling, over to the worker.
+        """
+        if self.enabled and self.run_id:
+            node.workerinput["reporting_run_id"] = self.run_id
+        if self.enabled and self.flaky is not None:
+            node.workerinput["reporting_flaky"] = sorted(self.flaky)
+        if self.enabled and self.schedule and self.client is not None:
+            if self.durations is None:
+                # Fetched once, with the first worker: every worker must order its collection the same way
+                self.durations = load_durations(self.client, getattr(node.config, "cache", None), self.api_url)
+            node.workerinput["reporting_durations"] = self.durations
+            # Workers run with --dist=no, the scheduling mode is only known here
+            node.workerinput["reporting_dist"] = node.config.getoption("dist", None)
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, session: pytest.Session, config: pytest.Config, items) -> None:
+        """
+        Hook function called after collection.
+        Quarantines the flaky tests, see flaky.py, and puts the longest tests first on xdist workers when
+        scheduling, see schedule.py.
+        """
+        if self.enabled and self.flaky_mode == "quarantine" and self.flaky:
+            for item in items:
+                if definition_id(item.nodeid) in self.flaky:
+                    item.add_marker(pytest.mark.xfail(reason=QUARANTINE_REASON, strict=False))
+
+        if not (self.schedule and self.is_worker):
+            return
+        durations = config.workerinput.get("reporting_durations")
+        ordered = longest_first(items, durations) if durations else None
+        if ordered is None:
+            return
+        if config.workerinput.get("reporting_dist") == "load":
+            workers = config.workerinput.get("workercount", 1)
+            ordered = deal(ordered, workers, load_chunk_size(len(ordered), workers, config.getoption("maxschedchunk", None)))
+        items[:] = ordered
+
+    @pytest.hookimpl(hookwrapper=True, tryfirst=True)
     def pytest_runtest_setup(self, item: Item):
         """
-        Hook function called before each test setup.
-        Starts a new test if reporting is enabled.
+        Hook wrapper around each test setup.
+        Records the start of the test and times the setup phase if reporting is enabled.
         """
 
         # check reporting enabled
         
         if self.enabled:
 
-            test_name = item.name
             test_parameters = dict()
-            timestamp = datetime.now()
             # Check if the test item has parameters
             if hasattr(item, "callspec") and hasattr(item.callspec, "params"):
                  # Access the test parameters
-                test_parameters = item.callspec.params
+                # Reports of xdist workers and every wire format need plain values, sanitized once per test
+                test_parameters = self.sanitizer.sanitize(item.nodeid, item.callspec.params)
+
+            item.stash[test_start_key] = {
+                "test_id": str(uuid.uuid4()),
+                "definition_id": definition_id(item.nodeid),
+                "nodeid": item.nodeid,
+                "test_name": item.name,
+                "test_parameters": test_parameters,
+                "timestamp": datetime.now().isoformat(),
+            }
 
-            self.test_id = self.start_test(test_name, test_parameters, timestamp, self.run_id)
-            logger.info(f"Test '{test_name}' started with params: {test_parameters}")
+        yield from self._timed(item, "setup")
 
-        return None
-    
-    @pytest.hookimpl(tryfirst=True)
-    def pytest_runtest_teardown(self, item):
-        
-        if self.enabled:
-            logger.info(f"{self.test_id} {self.test_status}")
-            self.finish_test(self.test_id, self.test_status, self.error_exception, self.duration)
+        if self.enabled and self.fixtures is not None:
+            self.fixtures.used_by(item)
+
+    @pytest.hookimpl(hookwrapper=True, tryfirst=True)
+    def pytest_runtest_call(self, item: Item):
+        """
+        Hook wrapper around each test call. Times the call phase, and samples its stacks when profiling, if
+        reporting is enabled.
+        """
+        profiling = self.enabled and self.sampler is not None
+        rerun = (self.enabled and self.flaky_mode == "rerun" and self.flaky and test_start_key in item.stash
+                 and item.stash[test_start_key]["definition_id"] in self.flaky)
+        if rerun:
+            function = item.obj
+            item.obj = retrying(function, self.flaky_reruns, item.nodeid)
+        if profiling:
+            self.sampler.begin()
+        yield from self._timed(item, "call")
+        if profiling:
+            self.profile_call(item, *self.sampler.end())
+        if rerun:
+            item.obj = function
+
+    @pytest.hookimpl(hookwrapper=True, tryfirst=True)
+    def pytest_runtest_teardown(self, item: Item):
+        """
+        Hook wrapper around each test teardown. Times the teardown phase if reporting is enabled.
+        """
+        yield from self._timed(item, "teardown")
 
-    def pytest_report_teststatus(self, report: Union[CollectReport, TestReport]):
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
         """
-        Hook function called when reporting test status.
-        Reports the status of each test.
+        Hook wrapper around each fixture setup. Times the setup if fixture profiling is enabled.
+        """
+        if self.enabled and self.fixtures is not None:
+            yield from self.fixtures.setup(fixturedef)
+        else:
+            yield
 
-        xfailed error are currently reported as skipped
+    def pytest_fixture_post_finalizer(self, fixturedef, request):
+        """
+        Hook function called after the teardown of each fixture. Times the teardown if fixture profiling is enabled.
+        """
+        if self.enabled and self.fixtures is not None:
+            self.fixtures.finalized(fixturedef)
+
+    def pytest_sessionfinish(self, session: pytest.Session):
+        """
+        Hook function called at the end of the test session.
+        Hands the fixture stats of an xdist worker over to the controller.
+        """
+        if self.enabled and self.is_worker and self.fixtures is not None:
+            session.config.workeroutput[FIXTURES_KEY] = self.fixtures.results()
+        if self.enabled and self.is_worker and self.profiles is not None:
+            session.config.workeroutput[PROFILES_KEY] = self.profiles.results()
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error) -> None:
+        """
+        pytest-xdist hook called on the controller when a worker is done.
+        Merges the fixture stats and the profiles of the worker.
+        """
+        workeroutput = getattr(node, "workeroutput", {})
+        if self.enabled and self.fixtures is not None:
+            self.fixtures.merge(workeroutput.get(FIXTURES_KEY, []))
+        if self.enabled and self.profiles is not None:
+            self.profiles.merge(workeroutput.get(PROFILES_KEY, []))
+
+    def profile_call(self, item: Item, stacks, samples: int) -> None:
+        """
+        Offers the sampled stacks of a test call to the slowest profiles.
+
+        Args:
+            item (Item): The test that was called.
+            stacks (Counter): Microseconds attributed to each collapsed stack.
+            samples (int): Number of samples taken.
         """
+        call_ns = item.stash.get(phase_ns_key, {}).get("call")
+        if not stacks or call_ns is None or test_start_key not in item.stash or not self.profiles.would_keep(call_ns):
+            return
+        self.profiles.offer(call_ns, {
+            "test_id": item.stash[test_start_key]["test_id"],
+            "test_name": item.name,
+            "call_ns": call_ns,
+            "samples": samples,
+            "sample_interval_us": round(self.sampler.interval * 1e6),
+            "stacks": collapsed(stacks),
+        })
+
+    def _timed(self, item: Item, when: str):
+        """
+        Body of the phase hook wrappers. Stores the duration of the wrapped phase in nanoseconds.
+        """
+        started = time.perf_counter_ns()
+        yield
         if self.enabled:
-            # reporting the test status
-            self.duration = None
-            self.test_status = "UNKNOWN"
-            self.error_exception = None
+            item.stash.setdefault(phase_ns_key, {})[when] = time.perf_counter_ns() - started
 
-            if report.when == "call":
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item: Item, call):
+        """
+        Hook wrapper around the creation of each phase report.
+        Attaches the start of the test to its reports, so it travels with them to the xdist controller.
+        """
+        outcome = yield
+
+        if self.enabled and test_start_key in item.stash:
+            report = outcome.get_result()
+            start = item.stash[test_start_key]
+            report.reporting_phase_ns = item.stash.get(phase_ns_key, {}).get(report.when)
+            if report.when == "setup":
+                report.reporting_start = start
+            else:
+                report.reporting_test_id = start["test_id"]
+
+    def pytest_runtest_logreport(self, report: TestReport):
+        """
+        Hook function called for each phase report, on the controller for tests run by xdist workers.
+        Queues the test start after setup and the test finish after teardown.
 
-                self.test_status = report.outcome.upper()
-                self.duration = report.duration
+        xfailed error are currently reported as skipped
+        """
+        if not self.enabled or self.sender is None:
+            return None
 
-                if hasattr(report.longrepr, 'reprcrash'):
+        if report.when == "setup":
+            start = getattr(report, "reporting_start", None)
+            if start is None:
+                return None
+
+            test_status = "UNKNOWN"
+            # A quarantined test that failed its setup is reported like any other setup failure
+            if report.outcome == "skipped" and not is_quarantined(report):
+                test_status = report.outcome.upper()
+                logger.info(f"Test skipped: {report.longrepr}")
+
+            self.start_test(start, self.run_id)
+            index = self.results.add(start["test_name"], test_status, getattr(report, "reporting_phase_ns", None))
+            self.pending[report.nodeid] = (start["test_id"], index)
+
+        elif report.when == "call":
+            pending = self.pending.get(report.nodeid)
+            if pending is None:
+                return None
+
+            # A quarantined test that failed is xfailed for pytest only, the service keeps its real outcome
+            self.results.update(
+                pending[1],
+                test_status="FAILED" if report.skipped and is_quarantined(report) else report.outcome.upper(),
+                duration=report.duration,
+                call_ns=getattr(report, "reporting_phase_ns", None),
+            )
+            if hasattr(report.longrepr, 'reprcrash'):
+                self.results.update(pending[1], error_exception=str(report.longrepr.reprcrash))
 
-                    self.error_exception = str(report.longrepr.reprcrash) 
+        elif report.when == "teardown":
+            pending = self.pending.pop(report.nodeid, None)
+            if pending is None:
+                return None
 
-                logger.info(f"Test status: {self.test_status}, Duration: {self.duration}")
+            test_id, index = pending
+            self.results.update(index, teardown_ns=getattr(report, "reporting_phase_ns", None))
+            self.finish_test(test_id, **self.results.row(index))
 
-            if report.when == "setup" and report.outcome=="skipped":
+        return None
 
-                self.test_status = report.outcome.upper()
-                logger.info(f"Test skipped: {report.longrepr}")  
+    def pytest_terminal_summary(self, terminalreporter) -> None:
+        """
+        Hook function adding the summary of the reported results to the terminal report, on the controller.
+        """
+        if not self.enabled or self.is_worker or self.summary_top <= 0 or not len(self.results):
+            return
+
+        summary = self.results.summary(self.summary_top)
+        write = terminalreporter.write_line
+        terminalreporter.section("test report summary")
+        statuses = ", ".join(f"{count} {status.lower()}" for status, count in summary["statuses"].items())
+        write(f"Run {self.run_id}: {summary['tests']} tests, {statuses}")
+        if summary["p50_duration"] is not None:
+            write(f"Call time {summary['duration']:.2f}s (p50 {summary['p50_duration']:.3f}s, "
+                  f"p95 {summary['p95_duration']:.3f}s), setup {summary['setup_ns'] / 1e9:.2f}s, "
+                  f"teardown {summary['teardown_ns'] / 1e9:.2f}s")
+        if summary["slowest"]:
+            write("Slowest tests:")
+            for name, duration in summary["slowest"]:
+                write(f"  {duration:8.3f}s  {name}")
+        if summary["errors"]:
+            write("Most frequent errors:")
+            for message, count in summary["errors"]:
+                write(f"  {count:8d}x  {message.splitlines()[0] if message else message}")
+        logger.info(f"Kept {len(self.results)} results in {self.results.nbytes() / 2 ** 20:.1f} MiB")
 
     @pytest.hookimpl(tryfirst=True)
     def pytest_unconfigure(self, config):
@@ -128,76 +442,62 @@ class ReportPlugin:
         Hook function called after the test run is complete.
         Performs actions at the end of the test session.
         """
-        if self.enabled:
+        # Without a session (e.g. --help) the run was never started and there is no sender or registry
+        if self.enabled and not self.is_worker and self.sender is not None:
             # Perform actions if reporting is enabled
+            self.send_fixture_stats(self.run_id)
+            self.send_profiles(self.run_id)
             self.finish_test_run(self.run_id)
-            logger.info("Test run finished")    
-
-    # @pytest.hookimpl(trylast=True)
-    # def pytest_sessionfinish(self):
-    #     """
-    #     Hook function called at the end of the test session.
-    #     Finishes the test run if reporting is enabled.
-    #     """
-
-    #     if self.enabled:
-
-    #         self.finish_test_run(self.run_id)
-    #         logger.info("Test run finished")
+            # Upload everything still queued, the spool is kept when the API cannot be reached
+            self.sender.close()
+            self.sender = None
+            logger.info("Test run finished")
+        if self.registry is not None:
+            self.registry.save(getattr(config, "cache", None), self.api_url)
+            self.registry = None
+
+        # Release the pooled connections, also when reporting was disabled after a failed start
+        if self.client is not None:
+            self.client.close()
+            self.client = None
 
     def start_test_run(self) -> str:
         """
         Start a new test run and return its ID.
 
+        The run is created by the background sender, so a slow or unreachable API never delays the session.
+
         Returns:
             str: The ID of the newly started test run.
         """
         if not self.enabled:
 
             return None
-        
-        max_retries = 3  # Maximum number of retry attempts
-        retry_delay = 5  # Delay between retry attempts (in seconds)
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                
-                # Generate a unique run ID
-                run_id = str(uuid.uuid4())
-                # Get the current time as the start time
-                start_time = datetime.now()
-                
-                # Prepare the data for the request
-                data = {
-                    "run_id": run_id,
-                    "start_time": start_time.isoformat()
-                }
-                # Send a POST request to start the test run
-                start_test_run_endpoint = f"{self.api_url}/runs"
-                start_test_run_response = requests.post(
-                    start_test_run_endpoint,
-                    headers={"Authorization": f"Bearer {self.auth_token}"},
-                    json=data
-                )
-                
-                # Check response status code
-                if start_test_run_response.status_code < 200 or start_test_run_response.status_code >= 300:
-                    raise RuntimeError(f"Failed to start test run: HTTP {start_test_run_response.status_code}")
-                
-                logger.info(start_test_run_response)
-                # Return the ID of the started test run
-                logger.info(run_id)
-                return run_id
-            except (requests.RequestException, RuntimeError) as e:
-                logger.error(f"Failed to start test run: {e}")
-                retry_count += 1
-                time.sleep(retry_delay)
-        
-        # If all retry attempts fail, set self.enabled to False
-        self.enabled = False
-        logger.error("Failed to start test run after multiple retries. Disabling reporting.")
-        return None
+
+        # Generate a unique run ID
+        run_id = str(uuid.uuid4())
+
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            spool = Spool(os.path.join(self.spool_dir, f"{run_id}.spool"))
+        except OSError as e:
+            # Without a spool there is nowhere to keep the events, set self.enabled to False
+            self.enabled = False
+            logger.error(f"Failed to create the reporting spool in {self.spool_dir}: {e}. Disabling reporting.")
+            return None
+
+        self.sender = EventSender(
+            self.client, spool, self.batch_size, self.flush_interval, self.drain_timeout,
+            WireEncoder(self.wire_format, self.compression), self.registry,
+        )
+        # Queue the run creation ahead of every test event
+        self.sender.enqueue({
+            "type": "run_start",
+            "run_id": run_id,
+            "start_time": datetime.now().isoformat(),
+        })
+        logger.info(run_id)
+        return run_id
 
     def finish_test_run(self, run_id: str) -> None:
         """
@@ -208,89 +508,71 @@ class ReportPlugin:
         """
         # Check if reporting is enabled and run ID is provided
         if self.enabled and run_id:
-            # Get the current time as the finish time
-            finish_time = datetime.now()
-
-            # Prepare the data for the request
-            data = {
+            # Queue the run finish behind every test event
+            self.sender.enqueue({
+                "type": "run_finish",
                 "run_id": run_id,
-                "finish_time": finish_time.isoformat()
-            }
-
-            # Send a POST request to finish the test run
-            finish_test_run_endpoint = f"{self.api_url}/runs/{run_id}/finish"
-            finish_run_response = requests.post(
-                finish_test_run_endpoint,
-                headers={"Authorization": f"Bearer {self.auth_token}"},
-                json=data
-            )
+                "finish_time": datetime.now().isoformat(),
+            })
         # Return None if reporting is disabled or run ID is not provided
         return None
 
-    def replace_nan(self, obj: Dict) -> Any:
+    def send_fixture_stats(self, run_id: str) -> None:
         """
-        Replace NaN values in the object with None.
+        Queue the fixture stats of the session, when fixture profiling is enabled.
 
         Args:
-            obj (Any): The object to process.
+            run_id (str): The ID of the test run.
+        """
+        if self.enabled and run_id and self.fixtures is not None:
+            fixtures = self.fixtures.results()
+            if fixtures:
+                self.sender.enqueue({"type": "fixtures", "run_id": run_id, "fixtures": fixtures})
+                logger.info(f"Profiled {len(fixtures)} fixtures")
+        return None
 
-        Returns:
-            Any: The object with NaN values replaced by None.
+    def send_profiles(self, run_id: str) -> None:
         """
-        if isinstance(obj, dict):
-            return {k: self.replace_nan(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [self.replace_nan(item) for item in obj]
-        elif isinstance(obj, float) and obj != obj:
-            return None
-        else:
-            return obj
-        
-    def start_test(self, test_name:str, test_parameters:Dict[str, Any], timestamp: datetime, run_id: str) -> Union[str, None]:
+        Queue the profiles of the slowest test calls, when profiling is enabled.
+
+        Args:
+            run_id (str): The ID of the test run.
+        """
+        if self.enabled and run_id and self.profiles is not None:
+            profiles = self.profiles.results()
+            if profiles:
+                self.sender.enqueue({"type": "profiles", "run_id": run_id, "profiles": profiles})
+                logger.info(f"Profiled the {len(profiles)} slowest tests")
+        return None
+
+    def start_test(self, start: Dict[str, Any], run_id: str) -> Union[str, None]:
         """
-        Starts a new test with the given parameters and returns the test ID.
+        Queues the start of a test and returns the test ID.
 
         Args:
-            test_name (str): The name of the test.
-            test_parameters (Dict[str, Any]): The parameters of the test.
-            timestamp (datetime): The timestamp when the test started.
+            start (Dict[str, Any]): The test ID, definition ID, node ID, name, parameters and start timestamp
+                recorded at setup.
             run_id (str): The ID of the test run to which the test belongs.
 
         Returns:
-            Union[str, None]: The ID of the newly started test, or None if reporting is disabled.
+            Union[str, None]: The ID of the started test, or None if reporting is disabled.
         """
 
         if self.enabled:
-            # Generate a unique test ID
-            test_id = str(uuid.uuid4())
-            # Replace NaN values in the test parameters with None
-            print(test_parameters)
-            test_parameters = self.replace_nan(test_parameters)
-            
             # Prepare the data to be sent in the request
-            data = {
-                "test_id": test_id,
-                "test_name": test_name,
-                "test_parameters": test_parameters,
-                "timestamp": timestamp.isoformat(),
-                "test_run_id": run_id,
-            }
+            data = {**start, "test_run_id": run_id}
 
-            # Send a POST request to start the test
-            start_test_endpoint = f"{self.api_url}/tests"
-            start_test_response = requests.post(
-                start_test_endpoint,
-                headers={"Authorization": f"Bearer {self.auth_token}"},
-                json=data
-            )
-            logger.info(f"Started test: {test_name}")
+            # Queue the event, the background sender posts it
+            self.sender.enqueue({"type": "start", **data})
+            logger.info(f"Started test: {start['test_name']}")
             # Return the test ID
-            return test_id
+            return start["test_id"]
         
         # Return None if reporting is disabled
         return None
   
-    def finish_test(self, test_id: str, test_status: str, error_exception: str=None, duration: int=None) -> None:
+    def finish_test(self, test_id: str, test_status: str, error_exception: str=None, duration: float=None,
+                    setup_ns: int=None, call_ns: int=None, teardown_ns: int=None) -> None:
         """
         Finishes the test with the given test ID and reports its status.
 
@@ -298,7 +580,10 @@ class ReportPlugin:
             test_id (str): The ID of the test to finish.
             test_status (str): The status of the test (e.g., 'passed', 'failed', 'skipped').
             error_exception (str, optional): Any error or exception message associated with the test. Defaults to None.
-            duration (int, optional): The duration of the test in milliseconds. Defaults to None.
+            duration (float, optional): The duration of the call phase of the test in seconds. Defaults to None.
+            setup_ns (int, optional): The duration of the setup phase in nanoseconds. Defaults to None.
+            call_ns (int, optional): The duration of the call phase in nanoseconds. Defaults to None.
+            teardown_ns (int, optional): The duration of the teardown phase in nanoseconds. Defaults to None.
         """
         # check reporting enable and test_id isn't None
         if self.enabled and test_id:
@@ -308,16 +593,14 @@ class ReportPlugin:
                 "test_id": test_id,
                 "test_status": test_status,
                 "error_exception": error_exception,
-                "duration": duration
+                "duration": duration,
+                "setup_ns": setup_ns,
+                "call_ns": call_ns,
+                "teardown_ns": teardown_ns,
             }
 
-            # Send a POST request to finish the test
-            finish_test_run_endpoint = f"{self.api_url}/tests/{test_id}/finish"
-            finish_test_response = requests.post(
-                finish_test_run_endpoint,
-                headers={"Authorization": f"Bearer {self.auth_token}"},
-                json=data
-            )
+            # Queue the event, the background sender posts it
+            self.sender.enqueue({"type": "finish", **data})
 
             logger.info(f"Finished test: {test_id}, Status: {test_status}, Exception: {error_exception}, Duration: {duration}")
         
@@ -0,0 +1,222 @@
+"""
+File: profiler.py
+Description: This module contains the sampling profiler that captures the stacks of the slowest tests.
+
+Usage:
+    With --reporting-profile-top=N, the ReportPlugin samples the stack of the test thread while each test is
+    called and keeps the profiles of the N slowest calls only. The profiles are sent with the run and shown as
+    flame graphs by the test report service.
+
+    A single daemon thread reads the stack of the test thread (sys._current_frames) every SAMPLE_INTERVAL
+    seconds, so the test itself runs uninstrumented: unlike cProfile, there is no per-call hook and the
+    overhead does not grow with the number of function calls. Calls shorter than the interval may get no
+    sample at all, they are never among the slowest anyway.
+
+    The sampler needs the GIL to take a sample, so samples are sparser while the test runs CPU-bound Python
+    code than while it sleeps or waits on I/O. Each sample is therefore weighted by the wall time elapsed since
+    the previous one, which keeps the profile proportional to time.
+
+    Profiles are kept in the collapsed-stack format of flamegraph.pl, speedscope and most flame graph tools:
+    one line per distinct stack, frames from the outermost to the innermost separated by ";", followed by a
+    space and the time attributed to the stack in microseconds. Stacks start at the test function, the frames
+    of pytest are cut off.
+
+    Under pytest-xdist every worker keeps its own N slowest profiles and hands them to the controller through
+    workeroutput, where the N slowest of the whole run are kept.
+"""
+import os
+import sys
+import time
+import heapq
+import itertools
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+# Key of the profiles in the workeroutput of xdist workers
+PROFILES_KEY = "reporting_profiles"
+
+# Seconds between two samples. Finer than the interpreter switch interval, samples would wait for the GIL anyway.
+SAMPLE_INTERVAL = 0.005
+
+# Deepest stack kept, counted from the test function
+MAX_DEPTH = 64
+
+# Frame of pytest that calls the test function, where the stacks are cut
+_TEST_CALLER = "pytest_pyfunc_call"
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a time from a background thread, between begin() and end().
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, max_depth: int = MAX_DEPTH):
+        """
+        Initialize the sampler. Its thread is started by the first begin().
+
+        Args:
+            interval (float, optional): Seconds between two samples. Defaults to SAMPLE_INTERVAL.
+            max_depth (int, optional): Deepest stack kept. Defaults to MAX_DEPTH.
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._target: Optional[int] = None
+        self._generation = 0
+        self._begun = 0
+        self._samples = 0
+        self._stacks: Counter = Counter()
+        self._labels: Dict[Any, str] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self) -> None:
+        """
+        Start sampling the calling thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="report-plugin-profiler", daemon=True)
+            self._thread.start()
+        with self._lock:
+            self._generation += 1
+            self._stacks = Counter()
+            self._samples = 0
+            self._begun = time.perf_counter_ns()
+            self._target = threading.get_ident()
+        self._active.set()
+
+    def end(self) -> Tuple[Counter, int]:
+        """
+        Stop sampling.
+
+        Returns:
+            Tuple[Counter, int]: The microseconds attributed to each collapsed stack, and the number of samples.
+        """
+        self._active.clear()
+        with self._lock:
+            self._generation += 1
+            self._target = None
+            stacks, self._stacks = self._stacks, Counter()
+        return stacks, self._samples
+
+    def _label(self, code: Any) -> str:
+        """
+        Return the frame label of a code object, "function (file:line)".
+        """
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _collapse(self, frame: Any) -> str:
+        """
+        Collapse a stack into its frame labels, outermost first, cut at the pytest frame calling the test.
+        """
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            if frame.f_code.co_name == _TEST_CALLER:
+                break
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+    def _run(self) -> None:
+        """
+        Sampling loop of the background thread.
+        """
+        deadline = time.perf_counter()
+        previous = 0
+        while True:
+            if not self._active.is_set():
+                self._active.wait()
+                deadline = time.perf_counter()
+            # Sleep to a deadline rather than for a fixed time: waiting for the GIL behind CPU-bound test code
+            # must not stretch the interval, or busy code would get fewer samples than code that sleeps
+            deadline = max(deadline + self.interval, time.perf_counter())
+            time.sleep(max(0.0, deadline - time.perf_counter()))
+
+            with self._lock:
+                target, generation = self._target, self._generation
+            if target is None:
+                continue
+            frame = sys._current_frames().get(target)
+            if frame is None:
+                continue
+            stack = self._collapse(frame)
+            del frame
+
+            now = time.perf_counter_ns()
+            with self._lock:
+                # A sample taken while the previous test ended does not belong to the next one
+                if generation == self._generation:
+                    self._stacks[stack] += (now - max(previous, self._begun)) // 1000
+                    self._samples += 1
+            previous = now
+
+
+class SlowestProfiles:
+    """
+    Keeps the profiles of the N slowest test calls in a bounded min-heap.
+    """
+
+    def __init__(self, top: int):
+        """
+        Initialize the heap.
+
+        Args:
+            top (int): Number of profiles kept.
+        """
+        self.top = top
+        self._heap: List[Tuple[int, int, Dict[str, Any]]] = []
+        self._order = itertools.count()
+
+    def offer(self, call_ns: int, profile: Dict[str, Any]) -> None:
+        """
+        Keep a profile if its call is among the N slowest seen so far.
+
+        Args:
+            call_ns (int): Duration of the test call in nanoseconds.
+            profile (Dict[str, Any]): The profile, kept as is.
+        """
+        entry = (call_ns, next(self._order), profile)
+        if len(self._heap) < self.top:
+            heapq.heappush(self._heap, entry)
+        elif call_ns > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def would_keep(self, call_ns: int) -> bool:
+        """
+        Return True when a call of this duration would be kept, so its profile is worth building.
+        """
+        return len(self._heap) < self.top or call_ns > self._heap[0][0]
+
+    def merge(self, profiles: List[Dict[str, Any]]) -> None:
+        """
+        Offer the profiles of another heap, those of an xdist worker.
+
+        Args:
+            profiles (List[Dict[str, Any]]): The profiles, as returned by results().
+        """
+        for profile in profiles:
+            self.offer(profile["call_ns"], profile)
+
+    def results(self) -> List[Dict[str, Any]]:
+        """
+        Return the kept profiles, the slowest first.
+        """
+        return [profile for _, _, profile in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+def collapsed(stacks: Counter) -> str:
+    """
+    Format sampled stacks in the collapsed-stack format, the most expensive first.
+
+    Args:
+        stacks (Counter): Microseconds attributed to each collapsed stack.
+
+    Returns:
+        str: One "frame;frame;frame microseconds" line per stack.
+    """
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common() if stack)
@@ -0,0 +1,119 @@
+"""
+File: retry.py
+Description: This module contains the retry policy and the circuit breaker used to reach the report API.
+
+Usage:
+    The ReportClient owns one CircuitBreaker shared by every API call (run start, test start, test finish and
+    run finish all go through it). After a few consecutive failures the breaker opens and calls fail at once
+    with CircuitOpenError instead of waiting for their own timeouts. Once the reset timeout has passed a
+    single trial call is let through; its outcome closes or reopens the breaker.
+
+    The EventSender waits between failed uploads according to an ExponentialBackoff, on its own thread, so
+    retries never block the tests.
+"""
+import time
+import random
+import threading
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling the report API while the circuit breaker is open.
+    """
+
+
+class ExponentialBackoff:
+    """
+    Exponentially growing retry delays with jitter.
+    """
+
+    def __init__(self, base: float = 1.0, cap: float = 30.0):
+        """
+        Initialize the backoff.
+
+        Args:
+            base (float, optional): Delay in seconds before the first retry. Defaults to 1.0.
+            cap (float, optional): Maximum delay in seconds. Defaults to 30.0.
+        """
+        self.base = base
+        self.cap = cap
+        self.attempts = 0
+
+    def next_delay(self) -> float:
+        """
+        Return the delay before the next retry and count the attempt.
+
+        Half of the delay is fixed and half is random, so retries of concurrent sessions spread out while
+        the delay still grows with every failure.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        delay = min(self.cap, self.base * 2 ** self.attempts)
+        self.attempts += 1
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def reset(self) -> None:
+        """
+        Start over from the base delay, after a successful call.
+        """
+        self.attempts = 0
+
+
+class CircuitBreaker:
+    """
+    A thread-safe circuit breaker with closed, open and half-open states.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """
+        Initialize the breaker in the closed state.
+
+        Args:
+            failure_threshold (int, optional): Consecutive failures that open the breaker. Defaults to 3.
+            reset_timeout (float, optional): Seconds the breaker stays open before a trial call. Defaults to 30.0.
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Return True when a call may go to the API. Moves an expired open breaker to half-open and lets
+        exactly one trial call through.
+
+        Returns:
+            bool: Whether the call may be made.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """
+        Close the breaker after a successful call.
+        """
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        """
+        Count a failed call. Opens the breaker when the threshold is reached or the trial call failed.
+        """
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
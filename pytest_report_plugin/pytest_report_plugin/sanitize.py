@@ -0,0 +1,277 @@
+"""
+File: sanitize.py
+Description: This module turns test parameters into values that every wire format can serialize.
+
+Usage:
+    The ReportPlugin passes the parameters of each parametrized test through a ParameterSanitizer before they
+    are queued. In a single iterative pass, sanitize() replaces:
+
+        NaN and +/-Inf floats            None
+        tuples, sets, frozensets         lists
+        NumPy scalars                    the matching Python scalar
+        NumPy arrays                     nested lists, NaN/Inf replaced in one vectorized step
+        integers outside 64 bits         their repr
+        any other object                 its repr
+        strings longer than max_string   their first max_string characters followed by "..."
+
+    Containers are always copied: the sanitized parameters are serialized later, on the thread of the sender, and
+    a test that changes a dict or list it was parametrized with must not change, or break, what is reported. A
+    parameter larger than max_size (estimated while walking it) is replaced by its truncated repr, so a single
+    huge fixture value cannot blow up the payload.
+
+    NumPy is never imported by this module, its types are recognized through the module already loaded by the
+    tests.
+"""
+import sys
+import math
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List
+
+# Longest string kept as is
+MAX_STRING = 1024
+
+# Estimated serialized size above which a parameter is replaced by its repr
+MAX_SIZE = 64 * 1024
+
+# Number of sanitized parameter sets kept by a ParameterSanitizer
+CACHE_SIZE = 4096
+
+# Estimated size of a number, a boolean or None
+SCALAR_SIZE = 8
+
+# Range of the integers every wire format can encode
+MIN_INT = -(2 ** 63)
+MAX_INT = 2 ** 64 - 1
+
+_CONTAINER_TYPES = (dict, list, tuple, set, frozenset)
+
+
+class _TooLarge(Exception):
+    """
+    Raised inside sanitize() when the size budget of a value is exhausted.
+    """
+
+
+class _Frame:
+    """
+    A container being walked by sanitize(), and its sanitized copy.
+    """
+
+    __slots__ = ("original", "keys", "values", "index", "out", "is_dict")
+
+    def __init__(self, original: Any, state: "_State"):
+        self.original = original
+        self.index = 0
+        self.out: List[Any] = []
+        self.is_dict = isinstance(original, dict)
+
+        if self.is_dict:
+            self.keys = [key if type(key) in (str, int, float, bool) or key is None else state.text(repr(key))
+                         for key in original.keys()]
+            self.values = list(original.values())
+        else:
+            self.keys = None
+            # Tuples and sets become lists
+            self.values = list(original)
+
+    def set(self, value: Any) -> None:
+        """
+        Record the sanitized value of the current child and move on to the next one.
+        """
+        self.out.append(value)
+        self.index += 1
+
+    def build(self) -> Any:
+        """
+        Return the sanitized copy of the container.
+        """
+        if self.is_dict:
+            return dict(zip(self.keys, self.out))
+        return self.out
+
+
+class _State:
+    """
+    Limits and size accounting of one sanitize() call.
+    """
+
+    __slots__ = ("max_string", "max_size", "size")
+
+    def __init__(self, max_string: int, max_size: int):
+        self.max_string = max_string
+        self.max_size = max_size
+        self.size = 0
+
+    def grow(self, size: int) -> None:
+        self.size += size
+        if self.size > self.max_size:
+            raise _TooLarge()
+
+    def text(self, value: str) -> str:
+        value = _truncate(value, self.max_string)
+        self.grow(len(value))
+        return value
+
+
+def _truncate(value: str, max_string: int) -> str:
+    """
+    Cut a string down to max_string characters, marking the cut with "...".
+    """
+    return value if len(value) <= max_string else value[:max_string] + "..."
+
+
+def _safe_repr(value: Any) -> str:
+    """
+    repr() that never raises.
+    """
+    try:
+        return repr(value)
+    except Exception:
+        return f"<{type(value).__name__} object>"
+
+
+def _numpy_value(value: Any, state: _State) -> Any:
+    """
+    Convert a NumPy scalar or array to Python values. Arrays of objects are returned as lists to be walked.
+    """
+    numpy = sys.modules["numpy"]
+
+    if isinstance(value, numpy.ndarray):
+        state.grow(value.size * SCALAR_SIZE)
+        if value.dtype.kind in "fc":
+            invalid = ~numpy.isfinite(value)
+            if invalid.any():
+                value = value.astype(object)
+                value[invalid] = None
+        # Arrays of strings, dates or objects still need a walk, which the caller does on the list
+        return value.tolist()
+
+    if isinstance(value, numpy.generic):
+        return value.item()
+
+    return value
+
+
+def _leaf(value: Any, state: _State) -> Any:
+    """
+    Sanitize a value that is not a container. Containers, including the lists made from NumPy object arrays, are
+    returned unchanged for the caller to walk.
+    """
+    value_type = type(value)
+
+    if value_type is str:
+        return state.text(value)
+    if value_type is float:
+        state.grow(SCALAR_SIZE)
+        return value if math.isfinite(value) else None
+    if value_type is bool or value is None:
+        state.grow(SCALAR_SIZE)
+        return value
+    if value_type is int:
+        state.grow(SCALAR_SIZE)
+        return value if MIN_INT <= value <= MAX_INT else state.text(repr(value))
+    if isinstance(value, _CONTAINER_TYPES):
+        return value
+
+    if value_type.__module__ == "numpy" and "numpy" in sys.modules:
+        converted = _numpy_value(value, state)
+        if converted is not value:
+            return _leaf(converted, state)
+
+    return state.text(_safe_repr(value))
+
+
+def sanitize(value: Any, max_string: int = MAX_STRING, max_size: int = MAX_SIZE) -> Any:
+    """
+    Return a JSON/msgpack/CBOR-safe version of value, see the module docstring.
+
+    Args:
+        value (Any): The value to sanitize.
+        max_string (int, optional): Longest string kept as is. Defaults to MAX_STRING.
+        max_size (int, optional): Estimated size above which the value is replaced by its repr. Defaults to MAX_SIZE.
+
+    Returns:
+        Any: The sanitized value, containers copied.
+    """
+    state = _State(max_string, max_size)
+    try:
+        root = _leaf(value, state)
+        if not isinstance(root, _CONTAINER_TYPES):
+            return root
+
+        stack = [_Frame(root, state)]
+        # Containers on the stack, to cut reference cycles
+        active = {id(root)}
+        result = None
+
+        while stack:
+            frame = stack[-1]
+            if frame.index < len(frame.values):
+                child = _leaf(frame.values[frame.index], state)
+                if isinstance(child, _CONTAINER_TYPES):
+                    if id(child) in active:
+                        child = "<recursive>"
+                    else:
+                        stack.append(_Frame(child, state))
+                        active.add(id(child))
+                        continue
+                frame.set(child)
+                continue
+
+            stack.pop()
+            active.discard(id(frame.original))
+            built = frame.build()
+            if stack:
+                stack[-1].set(built)
+            else:
+                result = built
+
+        return result
+
+    except _TooLarge:
+        return _truncate(_safe_repr(value), max_string)
+
+
+class ParameterSanitizer:
+    """
+    Sanitizes the parameters of tests and remembers the result per test, for tests that run more than once.
+    """
+
+    def __init__(self, max_string: int = MAX_STRING, max_size: int = MAX_SIZE, cache_size: int = CACHE_SIZE):
+        """
+        Initialize the sanitizer.
+
+        Args:
+            max_string (int, optional): Longest string kept as is. Defaults to MAX_STRING.
+            max_size (int, optional): Estimated size above which a parameter is replaced by its repr. Defaults to MAX_SIZE.
+            cache_size (int, optional): Number of parameter sets remembered. Defaults to CACHE_SIZE.
+        """
+        self.max_string = max_string
+        self.max_size = max_size
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+
+    def sanitize(self, key: Hashable, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Return the sanitized parameters of a test.
+
+        Each parameter is sanitized on its own, so one oversized value does not replace the others.
+
+        Args:
+            key (Hashable): Identifies the test, the node ID, whose parameters never change between runs.
+            parameters (Dict[str, Any]): The parameters of the test (callspec.params).
+
+        Returns:
+            Dict[str, Any]: A sanitized copy of the parameters, taken on the first call for the key.
+        """
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        sanitized = {name: sanitize(value, self.max_string, self.max_size) for name, value in parameters.items()}
+
+        self._cache[key] = sanitized
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return sanitized
@@ -0,0 +1,131 @@
+"""
+File: schedule.py
+Description: This module contains the duration-based scheduling of the plugin.
+
+Usage:
+    With --reporting-schedule, the plugin fetches the p50 and p95 wall time of every test over its recent runs
+    from the service (GET /durations) and runs the longest tests first under pytest-xdist.
+
+    xdist has no API for duration hints: its load scheduler hands the tests out in collection order, a chunk of
+    consecutive tests to every worker first and the rest one by one to whichever worker is done. Collecting the
+    longest tests first therefore is the hint, it turns the distribution into a longest-processing-time-first
+    schedule, so a long test no longer starts last and keeps a single worker busy after the others are done.
+    With --dist load the first chunks are dealt round-robin, so the longest tests start on different workers
+    rather than all in the chunk of the first one. Every worker must
+    collect the same order, so the controller fetches the durations once and hands them to the workers through
+    workerinput. Runs without xdist keep their collection order, where it keeps module and class fixtures
+    shared and there is no idle worker to save.
+
+    The durations are kept in the pytest cache for MAX_AGE seconds, one entry per API URL, so a burst of runs
+    makes a single request. An empty history is fetched again by the next run. When the service cannot be
+    reached an outdated entry is used, and without any the tests run in collection order.
+
+    Tests without history, new or renamed ones, are estimated at the median of the known tests.
+"""
+import time
+import logging
+import statistics
+from typing import Any, Dict, List, Optional
+from pytest_report_plugin.definitions import api_cache_key, definition_id
+
+logger = logging.getLogger(__name__)
+
+# Key of the fetched durations in the pytest cache, followed by a hash of the API URL
+CACHE_KEY = "report_plugin/durations"
+
+# Seconds the fetched durations are used before they are fetched again
+MAX_AGE = 3600
+
+# Days of history the durations are computed over
+HISTORY_DAYS = 14
+
+
+def load_durations(client: Any, cache: Any, api_url: str, max_age: float = MAX_AGE) -> Dict[int, float]:
+    """
+    Return the p95 wall time of every test with a history, from the cache when fresh, from the service otherwise.
+
+    Args:
+        client (ReportClient): The client of the test report service API.
+        cache (pytest.Cache): The pytest cache, or None when the cache provider is disabled.
+        api_url (str): Base URL of the test report service API.
+        max_age (float, optional): Seconds a cached entry is used without asking the service. Defaults to MAX_AGE.
+
+    Returns:
+        Dict[int, float]: The p95 in seconds by definition ID, empty when no history is available.
+    """
+    key = api_cache_key(CACHE_KEY, api_url)
+    cached = cache.get(key, None) if cache is not None else None
+    if not isinstance(cached, dict) or not isinstance(cached.get("durations"), dict):
+        cached = None
+
+    # An empty history is not worth keeping, the service may know the tests of this very run by the next one
+    if cached is None or not cached["durations"] or time.time() - cached.get("fetched", 0) > max_age:
+        try:
+            response = client.get("/durations", params={"days": HISTORY_DAYS})
+            cached = {"fetched": time.time(), "durations": response.json()["durations"]}
+            if cache is not None:
+                cache.set(key, cached)
+        except Exception as e:
+            # Scheduling is an optimization, an outdated history or none at all still runs every test
+            logger.warning(f"Could not fetch the test durations, {'using cached ones' if cached else 'not scheduling'}: {e}")
+            if cached is None:
+                return {}
+
+    return {int(definition): stats[1] for definition, stats in cached["durations"].items()}
+
+
+def longest_first(items: List[Any], durations: Dict[int, float]) -> Optional[List[Any]]:
+    """
+    Order tests by their p95 wall time, the longest first. Tests with equal estimates keep their collection order.
+
+    Args:
+        items (List[Item]): The collected tests.
+        durations (Dict[int, float]): The p95 in seconds by definition ID.
+
+    Returns:
+        List[Item]: The reordered tests, or None when there is no history to order them by.
+    """
+    estimates = [durations.get(definition_id(item.nodeid)) for item in items]
+    known = [estimate for estimate in estimates if estimate is not None]
+    if not known:
+        return None
+
+    default = statistics.median(known)
+    order = sorted(range(len(items)), key=lambda index: -(estimates[index] if estimates[index] is not None else default))
+    return [items[index] for index in order]
+
+
+def load_chunk_size(count: int, workers: int, max_chunk: Optional[int] = None) -> int:
+    """
+    Return the number of consecutive tests the xdist load scheduler sends to every worker at first.
+
+    Args:
+        count (int): Number of collected tests.
+        workers (int): Number of xdist workers.
+        max_chunk (int, optional): The --maxschedchunk option of xdist. Defaults to none.
+
+    Returns:
+        int: The size of the first chunk of every worker, 1 when the tests are sent round-robin.
+    """
+    if count < 2 * workers:
+        return 1
+    return max(min(count // workers // 4, max_chunk or count), 2)
+
+
+def deal(items: List[Any], workers: int, chunk: int) -> List[Any]:
+    """
+    Deal ordered tests round-robin into the first chunk of every worker, the rest keep their order.
+
+    Args:
+        items (List[Item]): The tests, the longest first.
+        workers (int): Number of xdist workers.
+        chunk (int): Size of the first chunk of every worker, see load_chunk_size().
+
+    Returns:
+        List[Item]: The tests in the order where worker n first gets the tests n, n + workers, n + 2 * workers...
+    """
+    head = workers * chunk
+    if chunk < 2 or len(items) < head:
+        return list(items)
+    # Slot j of the chunk of worker n gets the test ranked j * workers + n
+    return [items[slot % chunk * workers + slot // chunk] for slot in range(head)] + items[head:]
@@ -0,0 +1,184 @@
+"""
+File: sender.py
+Description: This module contains a background sender that ships test events to the report API in batches.
+
+Usage:
+    The ReportPlugin queues run and test events on an EventSender instead of posting them from inside the
+    pytest hooks. A daemon thread drains the queue into the local spool file of the run and uploads the
+    spool whenever the batch size is reached or the flush interval expires, so neither the disk nor the
+    network is touched from the test thread. Consecutive test events go out as a single POST to the bulk
+    ingestion endpoint of the run.
+
+    When the report API is slow or unreachable the events stay in the spool and the upload is retried
+    after a jittered, exponentially growing delay. The sender must be closed at the end of the session.
+    Closing makes a last upload attempt, bounded by the drain timeout; a spool that still holds records is
+    kept on disk for a later replay. The drain timeout is set with:
+        --reporting-drain-timeout=<SECONDS>
+"""
+import time
+import queue
+import logging
+import threading
+import requests
+from typing import Any, Dict
+from pytest_report_plugin.client import ReportClient
+from pytest_report_plugin.spool import Spool, upload
+from pytest_report_plugin.retry import ExponentialBackoff
+from pytest_report_plugin.wire import WireEncoder
+from pytest_report_plugin.definitions import DefinitionRegistry
+
+logger = logging.getLogger(__name__)
+
+# Sentinel placed on the queue to tell the worker thread to drain and stop
+_STOP = object()
+
+
+class EventSender:
+    """
+    Queues events, spools them and uploads the spool to the report API from a background thread.
+    """
+
+    def __init__(
+        self,
+        client: ReportClient,
+        spool: Spool,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        drain_timeout: float = 30.0,
+        encoder: WireEncoder = None,
+        registry: DefinitionRegistry = None,
+    ):
+        """
+        Initialize the EventSender and start its worker thread.
+
+        Args:
+            client (ReportClient): The pooled client used to reach the report API.
+            spool (Spool): The spool file of the test run.
+            batch_size (int, optional): Number of events that triggers an upload. Defaults to 100.
+            flush_interval (float, optional): Maximum time in seconds an event waits before an upload. Defaults to 1.0.
+            drain_timeout (float, optional): Maximum time in seconds close() waits for the last upload. Defaults to 30.0.
+            encoder (WireEncoder, optional): Encoder of the event batches. Plain JSON when None.
+            registry (DefinitionRegistry, optional): The test definitions known to the API. Sent in full when None.
+        """
+        self.client = client
+        self.spool = spool
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.drain_timeout = drain_timeout
+        self.encoder = encoder
+        self.registry = registry
+        self.backoff = ExponentialBackoff(base=max(0.1, flush_interval))
+        self.events_sent = 0
+        self.uploads = 0
+        # Events that could not be written to the spool, and so were never reported
+        self.events_dropped = 0
+
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="report-plugin-sender", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, event: Dict[str, Any]) -> None:
+        """
+        Queue an event for shipping. Never blocks on the disk or the network.
+
+        Args:
+            event (Dict[str, Any]): The event to ship. Must contain a "type" key
+                ("run_start", "start", "finish", "fixtures", "profiles" or "run_finish").
+        """
+        self._queue.put(event)
+
+    def close(self) -> bool:
+        """
+        Spool every queued event, make a last upload attempt and stop the worker thread.
+
+        Returns:
+            bool: True when every event was uploaded and the spool deleted, False when events were dropped or the
+            spool was kept for a replay.
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(self.drain_timeout)
+        logger.info(f"Event sender closed after sending {self.events_sent} records in {self.uploads} uploads")
+        if self.events_dropped:
+            logger.error(f"{self.events_dropped} events could not be spooled and were not reported")
+
+        # A thread still uploading after the drain timeout owns the spool, leave it to the exiting process
+        if self._thread.is_alive() or self.spool.pending():
+            if not self._thread.is_alive():
+                self.spool.close()
+            logger.error(
+                f"Reporting spool kept at {self.spool.path}, upload it later with: "
+                f"python -m pytest_report_plugin.spool replay {self.spool.path} --api-url=<API_URL> --auth-token=<AUTH_TOKEN>"
+            )
+            return False
+
+        self.spool.remove()
+        return not self.events_dropped
+
+    def _run(self) -> None:
+        """
+        Worker loop. Spools events until the batch is full or the flush interval expires, then uploads.
+        """
+        pending = 0
+        deadline = None
+        stopping = False
+        # Set after a failed upload, full batches then wait for the retry delay as well
+        backing_off = False
+
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                try:
+                    self.spool.append(item)
+                except Exception:
+                    # An unserializable event or a full disk must not stop the thread, the next events still go out
+                    logger.exception("Failed to spool an event, dropping it")
+                    self.events_dropped += 1
+                    continue
+                if not pending:
+                    # The flush interval is measured from the oldest event that was not uploaded
+                    deadline = time.monotonic() + self.flush_interval
+                pending += 1
+                if time.monotonic() < deadline and (pending < self.batch_size or backing_off):
+                    continue
+
+            if not pending:
+                continue
+            if self._upload():
+                pending = 0
+                deadline = None
+                backing_off = False
+                self.backoff.reset()
+            else:
+                # Leave the events in the spool and try again after a growing delay
+                deadline = time.monotonic() + self.backoff.next_delay()
+                backing_off = True
+
+    def _upload(self) -> bool:
+        """
+        Upload the spooled events that were not accepted yet.
+
+        Returns:
+            bool: True when the spool was fully uploaded.
+        """
+        try:
+            sent = upload(self.spool, self.client, self.batch_size, self.encoder, self.registry)
+        except (requests.RequestException, RuntimeError) as e:
+            logger.error(f"Failed to upload spooled events, keeping them in {self.spool.path}: {e}")
+            return False
+        except Exception:
+            # Anything else is a bug, logged with its traceback; the thread lives on and retries like after an outage
+            logger.exception(f"Unexpected error while uploading spooled events, keeping them in {self.spool.path}")
+            return False
+
+        self.events_sent += sent
+        self.uploads += 1
+        logger.info(f"Uploaded {sent} spooled events")
+        return True
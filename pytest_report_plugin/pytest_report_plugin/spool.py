@@ -0,0 +1,380 @@
+"""
+File: spool.py
+Description: This module contains the local spool file that buffers test events on their way to the report API.
+
+Usage:
+    Every record of a test run (run start, test start, test finish, fixture stats, profiles, run finish) is appended to an append-only
+    spool file before it is uploaded. A record is a 4-byte big-endian length followed by the compact JSON of
+    the record. The offset up to which the records have been accepted by the API is kept in a sidecar file
+    (<spool>.offset), so an interrupted upload resumes where it stopped.
+
+    Records the API refuses for good (a 4xx answer other than 408, 409, 415 and 429) would block every record
+    after them. They are moved to <spool>.rejected, one JSON record per line, and the upload goes on. A batch of
+    events refused this way is split until the refused events are isolated, so its valid events still arrive.
+
+    The EventSender drains the spool from a background thread while the tests run. A spool that could not be
+    fully uploaded is kept on disk and can be replayed later:
+
+        python -m pytest_report_plugin.spool replay <SPOOL_FILE> --api-url=<API_URL> --auth-token=<AUTH_TOKEN>
+
+    The spool directory is set with:
+        --reporting-spool-dir=<DIRECTORY>
+"""
+import os
+import sys
+import json
+import struct
+import logging
+import argparse
+import requests
+from typing import Any, Dict, List, Tuple
+from pytest_report_plugin.client import APIError, ReportClient, UnsupportedMediaTypeError
+from pytest_report_plugin.definitions import DefinitionRegistry
+from pytest_report_plugin.wire import COMPRESSIONS, WIRE_FORMATS, WireEncoder
+
+logger = logging.getLogger(__name__)
+
+# Length prefix of every record
+RECORD_HEADER = struct.Struct(">I")
+
+# Record types sent as events of the bulk ingestion endpoint
+EVENT_TYPES = ("start", "finish")
+
+# Endpoints of the run records, formatted with the record
+RUN_ENDPOINTS = {
+    "run_start": "/runs",
+    "fixtures": "/runs/{run_id}/fixtures",
+    "profiles": "/runs/{run_id}/profiles",
+    "run_finish": "/runs/{run_id}/finish",
+}
+
+# Client errors a request may still succeed after: timeout, lost definitions, media type, rate limit
+RETRYABLE_CLIENT_ERRORS = (408, 409, 415, 429)
+
+
+def is_rejected(error: APIError) -> bool:
+    """
+    Return True when the API refused a request for good, sending it again would fail the same way.
+    """
+    return 400 <= error.status_code < 500 and error.status_code not in RETRYABLE_CLIENT_ERRORS
+
+
+class Spool:
+    """
+    An append-only file of length-prefixed JSON records with a committed upload offset.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open the spool file, creating it when it does not exist.
+
+        Args:
+            path (str): Path of the spool file.
+        """
+        self.path = path
+        self.offset_path = f"{path}.offset"
+        self.rejected_path = f"{path}.rejected"
+        self._writer = open(path, "ab")
+        self._reader = open(path, "rb")
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """
+        Append a record to the spool.
+
+        Args:
+            record (Dict[str, Any]): The record to append. Must contain a "type" key.
+        """
+        data = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        self._writer.write(RECORD_HEADER.pack(len(data)) + data)
+        # Make the record visible to the reader, the uploader runs in the same process
+        self._writer.flush()
+
+    def read(self, offset: int, limit: int) -> List[Tuple[Dict[str, Any], int]]:
+        """
+        Read up to limit records starting at the given offset.
+
+        A record cut short by a crash of the writer ends the spool.
+
+        Args:
+            offset (int): Offset of the first record to read.
+            limit (int): Maximum number of records to read.
+
+        Returns:
+            List[Tuple[Dict[str, Any], int]]: The records with the offset right after each of them.
+        """
+        records = []
+        self._reader.seek(offset)
+
+        while len(records) < limit:
+            header = self._reader.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break
+            (length,) = RECORD_HEADER.unpack(header)
+            data = self._reader.read(length)
+            if len(data) < length:
+                break
+            offset += RECORD_HEADER.size + length
+            records.append((json.loads(data), offset))
+
+        return records
+
+    @property
+    def run_id(self) -> str:
+        """
+        The ID of the test run of the spool, taken from its first record.
+        """
+        records = self.read(0, 1)
+        if not records:
+            raise ValueError(f"Spool {self.path} is empty")
+        return records[0][0]["run_id"]
+
+    def committed_offset(self) -> int:
+        """
+        Return the offset up to which the records have been uploaded.
+        """
+        try:
+            with open(self.offset_path) as file:
+                return int(file.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def commit(self, offset: int) -> None:
+        """
+        Record that every record before the given offset has been uploaded.
+
+        Args:
+            offset (int): The new committed offset.
+        """
+        temporary_path = f"{self.offset_path}.tmp"
+        with open(temporary_path, "w") as file:
+            file.write(str(offset))
+        os.replace(temporary_path, self.offset_path)
+
+    def reject(self, records: List[Dict[str, Any]], error: APIError) -> None:
+        """
+        Set records the API refused for good aside, in the rejected file of the spool.
+
+        Args:
+            records (List[Dict[str, Any]]): The refused records.
+            error (APIError): The answer of the API.
+        """
+        with open(self.rejected_path, "a", encoding="utf-8") as file:
+            for record in records:
+                file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        logger.error(f"The report service rejected {len(records)} records ({error}), moved them to {self.rejected_path}")
+
+    def pending(self) -> bool:
+        """
+        Return True when the spool holds records that have not been uploaded yet.
+        """
+        return self.committed_offset() < os.path.getsize(self.path)
+
+    def close(self) -> None:
+        """
+        Close the file handles of the spool.
+        """
+        self._writer.close()
+        self._reader.close()
+
+    def remove(self) -> None:
+        """
+        Close the spool and delete it together with its offset file. Rejected records are kept.
+        """
+        self.close()
+        for path in (self.path, self.offset_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def post_events(client: ReportClient, path: str, events: List[Dict[str, Any]], encoder: WireEncoder = None,
+                registry: DefinitionRegistry = None) -> None:
+    """
+    Send a batch of events, referencing the test definitions known to the API by ID only.
+
+    A batch the API refuses because it lost some definitions (HTTP 409) is sent again in full.
+
+    Args:
+        client (ReportClient): The client used to reach the report API.
+        path (str): Path of the bulk ingestion endpoint of the run.
+        events (List[Dict[str, Any]]): The events to send.
+        encoder (WireEncoder, optional): The negotiated encoder. Plain JSON when None.
+        registry (DefinitionRegistry, optional): The definitions known to the API. Sent in full when None.
+    """
+    if registry is None:
+        _post_encoded(client, path, events, encoder)
+        return
+
+    stripped = registry.strip(events)
+    try:
+        _post_encoded(client, path, stripped, encoder)
+    except APIError as e:
+        if e.status_code != 409 or stripped is events:
+            raise
+        logger.warning("The report service lost known test definitions, sending them again")
+        registry.forget(events)
+        _post_encoded(client, path, events, encoder)
+    registry.acknowledge(events)
+
+
+def _post_encoded(client: ReportClient, path: str, events: List[Dict[str, Any]], encoder: WireEncoder = None) -> None:
+    """
+    Send a batch of events in the wire format of the encoder, falling back to JSON when the API refuses it.
+    """
+    if encoder is not None and not encoder.plain:
+        body, headers = encoder.encode(events)
+        try:
+            client.post_body(path, body, headers)
+            return
+        except UnsupportedMediaTypeError:
+            encoder.downgrade()
+    client.post(path, {"events": events})
+
+
+def upload(spool: Spool, client: ReportClient, batch_size: int = 100, encoder: WireEncoder = None,
+           registry: DefinitionRegistry = None) -> int:
+    """
+    Upload every record after the committed offset of the spool, in order.
+
+    Consecutive test events are sent in batches to the bulk ingestion endpoint, run records are sent to their
+    own endpoints. The offset is committed after every accepted request. Records the API refuses for good are
+    moved to the rejected file of the spool.
+
+    Args:
+        spool (Spool): The spool to drain.
+        client (ReportClient): The client used to reach the report API.
+        batch_size (int, optional): Maximum number of events per request. Defaults to 100.
+        encoder (WireEncoder, optional): Encoder of the event batches. Plain JSON when None.
+        registry (DefinitionRegistry, optional): The test definitions known to the API. Sent in full when None.
+
+    Raises:
+        requests.RequestException: If a request could not be sent.
+        RuntimeError: If the API did not accept a request and may accept it later.
+
+    Returns:
+        int: Number of records uploaded.
+    """
+    run_id = spool.run_id
+    events_path = f"/runs/{run_id}/events:batch"
+    offset = spool.committed_offset()
+    uploaded = 0
+
+    while True:
+        records = spool.read(offset, batch_size)
+        if not records:
+            return uploaded
+
+        events = []
+        for record, end in records:
+            if record["type"] in EVENT_TYPES:
+                events.append(record)
+            else:
+                if events:
+                    uploaded += _send_events(spool, client, events_path, events, encoder, registry)
+                    spool.commit(offset)
+                    events = []
+                data = {key: value for key, value in record.items() if key != "type"}
+                try:
+                    client.post(RUN_ENDPOINTS[record["type"]].format(**record), data)
+                    uploaded += 1
+                except APIError as e:
+                    if not is_rejected(e):
+                        raise
+                    spool.reject([record], e)
+                spool.commit(end)
+            offset = end
+
+        if events:
+            uploaded += _send_events(spool, client, events_path, events, encoder, registry)
+            spool.commit(offset)
+
+
+def _send_events(spool: Spool, client: ReportClient, path: str, events: List[Dict[str, Any]],
+                 encoder: WireEncoder = None, registry: DefinitionRegistry = None) -> int:
+    """
+    Send a batch of events, see post_events(). A batch the API refuses for good is split in halves until the
+    refused events are isolated and set aside.
+
+    Returns:
+        int: Number of events the API accepted.
+    """
+    try:
+        post_events(client, path, events, encoder, registry)
+        return len(events)
+    except APIError as e:
+        if not is_rejected(e):
+            raise
+        if len(events) == 1:
+            spool.reject(events, e)
+            return 0
+
+    middle = len(events) // 2
+    return (_send_events(spool, client, path, events[:middle], encoder, registry)
+            + _send_events(spool, client, path, events[middle:], encoder, registry))
+
+
+def replay(paths: List[str], api_url: str, auth_token: str, batch_size: int, encoder: WireEncoder = None) -> int:
+    """
+    Upload the remaining records of spool files left behind by earlier runs.
+
+    Fully uploaded spools are deleted, the others are kept for another attempt.
+
+    Args:
+        paths (List[str]): Paths of the spool files.
+        api_url (str): Base URL of the test report service API.
+        auth_token (str): Authorization token for accessing the test report service.
+        batch_size (int): Maximum number of events per request.
+        encoder (WireEncoder, optional): Encoder of the event batches. Plain JSON when None.
+
+    Returns:
+        int: Number of spools that could not be fully uploaded.
+    """
+    failed = 0
+    client = ReportClient(api_url, auth_token)
+
+    for path in paths:
+        if not os.path.isfile(path):
+            print(f"{path}: no such spool file")
+            failed += 1
+            continue
+
+        spool = Spool(path)
+        try:
+            uploaded = upload(spool, client, batch_size, encoder)
+        except (requests.RequestException, RuntimeError, ValueError) as e:
+            spool.close()
+            print(f"{path}: upload failed, spool kept ({e})")
+            failed += 1
+            continue
+
+        spool.remove()
+        print(f"{path}: uploaded {uploaded} records")
+        if os.path.exists(spool.rejected_path):
+            print(f"{path}: records rejected by the report service are kept in {spool.rejected_path}")
+
+    client.close()
+    return failed
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Command line entry point, see the module docstring.
+    """
+    parser = argparse.ArgumentParser(prog="python -m pytest_report_plugin.spool", description="Manage reporting spool files")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    replay_parser = commands.add_parser("replay", help="upload spool files left behind by earlier runs")
+    replay_parser.add_argument("paths", nargs="+", help="spool files to upload")
+    replay_parser.add_argument("--api-url", required=True, help="URL of the test report service API")
+    replay_parser.add_argument("--auth-token", default="", help="Authorization token for accessing the test report service")
+    replay_parser.add_argument("--batch-size", type=int, default=100, help="maximum number of events per request")
+    replay_parser.add_argument("--wire-format", choices=WIRE_FORMATS, default="json", help="encoding of the event batches")
+    replay_parser.add_argument("--compression", choices=COMPRESSIONS, default="none", help="compression of the event batches")
+
+    args = parser.parse_args(argv)
+    encoder = WireEncoder(args.wire_format, args.compression)
+    failed = replay(args.paths, args.api_url, args.auth_token, args.batch_size, encoder)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+File: store.py
+Description: This module contains the result store of the plugin, where the results of the session are kept.
+
+Usage:
+    The ReportPlugin records every test of the session in a ResultStore, one row per test, and builds the finish
+    event of a test from its row. The store is columnar: every column is a typed array (array.array) and strings
+    are interned in string tables, so a row takes about 40 bytes whatever the length of its name or error:
+
+        name           index of the test name, parameter ID included; reruns of a test share their name
+        status         code of the status, the predefined STATUSES first
+        duration       duration of the call phase in seconds, -1.0 when unknown
+        setup_ns       duration of the setup phase in nanoseconds, -1 when unknown
+        call_ns        duration of the call phase in nanoseconds, -1 when unknown
+        teardown_ns    duration of the teardown phase in nanoseconds, -1 when unknown
+        error          index of the error message, -1 without error; identical failures share their message
+
+    A session of 500k tests keeps all its results in about 20 MB, where a dict per test would take hundreds.
+    The end-of-run summary (counts per status, phase totals, duration percentiles, slowest tests, most frequent
+    errors) is computed over whole columns by C-level builtins (bytes.count, sum, sorted, heapq, Counter) rather
+    than a Python loop per test.
+
+    Under pytest-xdist the reports of every worker reach the controller, which keeps the store of the session.
+"""
+import sys
+import heapq
+import bisect
+import math
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# Status codes, stable across sessions; other statuses get the next codes as they are seen
+STATUSES = ("UNKNOWN", "PASSED", "FAILED", "SKIPPED", "ERROR")
+
+# Columns of a row, by type code, and the value stored for None
+_COLUMNS = {
+    "name": ("I", 0),
+    "status": ("b", 0),
+    "duration": ("d", -1.0),
+    "setup_ns": ("q", -1),
+    "call_ns": ("q", -1),
+    "teardown_ns": ("q", -1),
+    "error": ("i", -1),
+}
+
+
+class StringTable:
+    """
+    Interns strings, mapping each distinct string to a small integer index.
+    """
+
+    def __init__(self, strings=()):
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+        for string in strings:
+            self.intern(string)
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def intern(self, string: str) -> int:
+        """
+        Return the index of a string, adding it to the table on first use.
+        """
+        index = self._index.get(string)
+        if index is None:
+            index = self._index[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def nbytes(self) -> int:
+        """
+        Return the approximate memory used by the table, strings included.
+        """
+        return (sys.getsizeof(self.strings) + sys.getsizeof(self._index)
+                + sum(sys.getsizeof(string) for string in self.strings))
+
+
+def nearest_rank(values: List[float], quantile: float) -> Optional[float]:
+    """
+    Return a percentile of sorted values by the nearest-rank method, quantile between 0 and 1, None without values.
+    """
+    if not values:
+        return None
+    return values[max(0, math.ceil(quantile * len(values)) - 1)]
+
+
+class ResultStore:
+    """
+    Columnar store of the test results of a session, see the module documentation.
+    """
+
+    def __init__(self):
+        self.names = StringTable()
+        self.statuses = StringTable(STATUSES)
+        self.errors = StringTable()
+        self.columns: Dict[str, array] = {column: array(typecode) for column, (typecode, _) in _COLUMNS.items()}
+
+    def __len__(self) -> int:
+        return len(self.columns["status"])
+
+    def add(self, test_name: str, test_status: str = "UNKNOWN", setup_ns: Optional[int] = None) -> int:
+        """
+        Add the row of a test that has been set up.
+
+        Args:
+            test_name (str): The name of the test.
+            test_status (str, optional): The status known after setup. Defaults to "UNKNOWN".
+            setup_ns (int, optional): The duration of the setup phase in nanoseconds.
+
+        Returns:
+            int: The index of the row.
+        """
+        for column, (_, missing) in _COLUMNS.items():
+            self.columns[column].append(missing)
+        index = len(self) - 1
+        self.update(index, test_name=test_name, test_status=test_status, setup_ns=setup_ns)
+        return index
+
+    def update(self, index: int, **values: Any) -> None:
+        """
+        Set values of a row, by their finish event field: test_name, test_status, error_exception, duration,
+        setup_ns, call_ns or teardown_ns. None values are stored as unknown.
+        """
+        for field, value in values.items():
+            if field == "test_name":
+                self.columns["name"][index] = self.names.intern(value)
+            elif field == "test_status":
+                self.columns["status"][index] = self.statuses.intern(value)
+            elif field == "error_exception":
+                self.columns["error"][index] = self.errors.intern(value) if value is not None else -1
+            else:
+                self.columns[field][index] = value if value is not None else _COLUMNS[field][1]
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """
+        Return the finish event fields of a row, unknown values as None.
+        """
+        columns = self.columns
+        error = columns["error"][index]
+        row = {
+            "test_status": self.statuses.strings[columns["status"][index]],
+            "error_exception": self.errors.strings[error] if error >= 0 else None,
+        }
+        for field in ("duration", "setup_ns", "call_ns", "teardown_ns"):
+            value = columns[field][index]
+            row[field] = value if value >= 0 else None
+        return row
+
+    def nbytes(self) -> int:
+        """
+        Return the approximate memory used by the store.
+        """
+        return (sum(column.buffer_info()[1] * column.itemsize for column in self.columns.values())
+                + self.names.nbytes() + self.statuses.nbytes() + self.errors.nbytes())
+
+    def _total(self, column: str) -> int:
+        """
+        Return the sum of the known values of a nanosecond column: every unknown value is -1.
+        """
+        values = self.columns[column]
+        return sum(values) + values.count(-1)
+
+    def summary(self, top: int = 5) -> Dict[str, Any]:
+        """
+        Compute the summary of the session.
+
+        Args:
+            top (int, optional): Number of slowest tests and most frequent errors listed. Defaults to 5.
+
+        Returns:
+            Dict[str, Any]: The number of tests, the count of every status seen, the total of every phase in
+            nanoseconds, the total, p50 and p95 call duration in seconds, the slowest tests as (name, duration)
+            and the most frequent errors as (message, count).
+        """
+        columns = self.columns
+        statuses = columns["status"].tobytes()
+        counts = {}
+        for code, status in enumerate(self.statuses.strings):
+            count = statuses.count(code.to_bytes(1, "big", signed=True))
+            if count:
+                counts[status] = count
+
+        durations = sorted(columns["duration"])
+        # The unknown durations, -1.0, sort first
+        durations = durations[bisect.bisect_left(durations, 0.0):]
+        duration = columns["duration"]
+        slowest = heapq.nlargest(top, range(len(duration)), key=duration.__getitem__)
+        errors = Counter(columns["error"])
+        errors.pop(-1, None)
+
+        return {
+            "tests": len(self),
+            "statuses": counts,
+            "setup_ns": self._total("setup_ns"),
+            "call_ns": self._total("call_ns"),
+            "teardown_ns": self._total("teardown_ns"),
+            "duration": math.fsum(durations),
+            "p50_duration": nearest_rank(durations, 0.5),
+            "p95_duration": nearest_rank(durations, 0.95),
+            "slowest": [(self.names.strings[columns["name"][index]], duration[index])
+                        for index in slowest if duration[index] >= 0],
+            "errors": [(self.errors.strings[error], count) for error, count in errors.most_common(top)],
+        }
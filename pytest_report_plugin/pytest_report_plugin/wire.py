@@ -0,0 +1,197 @@
+"""
+File: wire.py
+Description: This module contains the encoders of the test event batches sent to the report API.
+
+Usage:
+    By default a batch is sent as plain JSON ({"events": [...]}). A compact binary encoding can be chosen with:
+        --reporting-wire-format=json|msgpack|cbor --reporting-compression=none|gzip|zstd
+
+    The binary formats (msgpack, cbor) use a positional layout instead of repeated keys:
+
+        [WIRE_VERSION, strings, starts, finishes]
+        strings:  every node ID, test name, status and error message of the batch, each stored once
+        starts:   [test_id (16 UUID bytes), definition_id, node ID index, name index, test_parameters,
+                   timestamp (epoch microseconds)]
+        finishes: [test_id (16 UUID bytes), status index, error index, duration, setup_ns, call_ns, teardown_ns]
+
+    Timestamps are the local wall-clock times of the tests, counted in microseconds from 1970-01-01 without a
+    timezone, exactly like the ISO strings of the JSON format. Indexes of missing values are None, as are the node ID,
+    name and parameters of a test whose definition the service already knows.
+
+    msgpack, cbor2 and zstandard are optional. A format whose library is missing falls back to JSON at startup,
+    and a service that answers 415 Unsupported Media Type makes the encoder fall back to JSON for the rest of
+    the session.
+"""
+import gzip
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - optional dependency
+    cbor2 = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+WIRE_VERSION = 3
+
+# Naive datetimes are counted from the naive epoch, so no timezone conversion happens on either side
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+    "cbor": "application/cbor",
+}
+
+WIRE_FORMATS = tuple(CONTENT_TYPES)
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+
+def epoch_microseconds(timestamp: Optional[str]) -> Optional[int]:
+    """
+    Convert an ISO timestamp to microseconds since the naive epoch.
+
+    Args:
+        timestamp (Optional[str]): The ISO timestamp, or None.
+
+    Returns:
+        Optional[int]: The number of microseconds, or None.
+    """
+    if timestamp is None:
+        return None
+    return (datetime.fromisoformat(timestamp) - EPOCH) // ONE_MICROSECOND
+
+
+def available(wire_format: str, compression: str) -> bool:
+    """
+    Return True when the libraries needed by the format and the compression are installed.
+    """
+    if wire_format == "msgpack" and msgpack is None:
+        return False
+    if wire_format == "cbor" and cbor2 is None:
+        return False
+    if compression == "zstd" and zstandard is None:
+        return False
+    return True
+
+
+class WireEncoder:
+    """
+    Encodes batches of test events in the negotiated wire format.
+    """
+
+    def __init__(self, wire_format: str = "json", compression: str = "none"):
+        """
+        Initialize the encoder, falling back to plain JSON when a library is missing.
+
+        Args:
+            wire_format (str, optional): One of "json", "msgpack" or "cbor". Defaults to "json".
+            compression (str, optional): One of "none", "gzip" or "zstd". Defaults to "none".
+        """
+        if not available(wire_format, compression):
+            logger.warning(f"Wire format {wire_format} with {compression} compression is not installed, sending plain JSON")
+            wire_format, compression = "json", "none"
+        self.wire_format = wire_format
+        self.compression = compression
+
+    @property
+    def plain(self) -> bool:
+        """
+        True when batches are sent as uncompressed JSON.
+        """
+        return self.wire_format == "json" and self.compression == "none"
+
+    def downgrade(self) -> None:
+        """
+        Switch to plain JSON, after the service refused the negotiated encoding.
+        """
+        logger.warning(f"The report service does not accept {self.wire_format} with {self.compression} compression, sending plain JSON")
+        self.wire_format, self.compression = "json", "none"
+
+    def encode(self, events: List[Dict[str, Any]]) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Encode a batch of events.
+
+        Args:
+            events (List[Dict[str, Any]]): The start and finish events, as queued by the plugin.
+
+        Returns:
+            Tuple[bytes, Dict[str, str]]: The request body and its Content-Type/Content-Encoding headers.
+        """
+        if self.wire_format == "json":
+            body = json.dumps({"events": events}, separators=(",", ":")).encode("utf-8")
+        elif self.wire_format == "msgpack":
+            body = msgpack.packb(self.compact(events), use_bin_type=True)
+        else:
+            body = cbor2.dumps(self.compact(events))
+
+        headers = {"Content-Type": CONTENT_TYPES[self.wire_format]}
+        if self.compression == "gzip":
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        elif self.compression == "zstd":
+            body = zstandard.ZstdCompressor(level=3).compress(body)
+            headers["Content-Encoding"] = "zstd"
+        return body, headers
+
+    @staticmethod
+    def compact(events: List[Dict[str, Any]]) -> list:
+        """
+        Build the positional layout of a batch, see the module docstring.
+
+        Args:
+            events (List[Dict[str, Any]]): The start and finish events, as queued by the plugin.
+
+        Returns:
+            list: The compact batch, ready to be serialized.
+        """
+        strings: List[str] = []
+        indexes: Dict[str, int] = {}
+
+        def intern(value: Optional[str]) -> Optional[int]:
+            if value is None:
+                return None
+            index = indexes.get(value)
+            if index is None:
+                index = indexes[value] = len(strings)
+                strings.append(value)
+            return index
+
+        starts = []
+        finishes = []
+        for event in events:
+            if event["type"] == "start":
+                starts.append([
+                    bytes.fromhex(event["test_id"].replace("-", "")),
+                    event.get("definition_id"),
+                    intern(event.get("nodeid")),
+                    intern(event.get("test_name")),
+                    event.get("test_parameters"),
+                    epoch_microseconds(event.get("timestamp")),
+                ])
+            else:
+                finishes.append([
+                    bytes.fromhex(event["test_id"].replace("-", "")),
+                    intern(event.get("test_status")),
+                    intern(event.get("error_exception")),
+                    event.get("duration"),
+                    event.get("setup_ns"),
+                    event.get("call_ns"),
+                    event.get("teardown_ns"),
+                ])
+
+        return [WIRE_VERSION, strings, starts, finishes]
@@ -22,9 +22,17 @@ setup(
         'requests',
         'hypothesis',
     ],
+    extras_require={
+        'msgpack': ['msgpack'],
+        'cbor': ['cbor2'],
+        'zstd': ['zstandard'],
+    },
     entry_points={
         'pytest11': [
             'report_plugin = pytest_report_plugin.plugin',
         ],
+        'console_scripts': [
+            'pytest-report-replay = pytest_report_plugin.spool:main',
+        ],
     },
 )
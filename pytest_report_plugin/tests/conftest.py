@@ -0,0 +1,99 @@
+"""
+Shared setup of the plugin tests that run a pytest session against a fake report service.
+
+The sessions run in a subprocess (pytester.runpytest_subprocess), with the options and the registration of the
+plugin copied from the conftest.py of the project, and report to a FakeAPI listening on a local port of the test
+process. Modules using these fixtures enable pytester with pytest_plugins = ["pytester"].
+"""
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import pytest
+
+PLUGIN_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeAPI:
+    """
+    A report service that records the requests of the plugin and accepts them all.
+    """
+
+    def __init__(self):
+        self.requests = []
+        # JSON answers of GET requests by path, the other paths answer 404
+        self.responses = {}
+        self._lock = threading.Lock()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                api.record("GET", path, None)
+                body = api.responses.get(path)
+                self.answer(404 if body is None else 200, body)
+
+            def do_POST(self):
+                path = urlsplit(self.path).path
+                data = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                api.record("POST", path, json.loads(data) if data else None)
+                self.answer(200, {})
+
+            def answer(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def record(self, method, path, body):
+        with self._lock:
+            self.requests.append((method, path, body))
+
+    def posted(self, suffix):
+        """
+        Return the bodies posted to the paths ending with suffix, in order.
+        """
+        return [body for method, path, body in self.requests if method == "POST" and path.endswith(suffix)]
+
+    def events(self, event_type):
+        """
+        Return the test events of the given type ("start" or "finish") of every posted batch.
+        """
+        return [event for body in self.posted("/events:batch") for event in body["events"] if event["type"] == event_type]
+
+
+@pytest.fixture
+def fake_api():
+    api = FakeAPI()
+    thread = threading.Thread(target=api.server.serve_forever, daemon=True)
+    thread.start()
+    yield api
+    api.server.shutdown()
+    api.server.server_close()
+
+
+@pytest.fixture
+def run_reported(pytester, fake_api, monkeypatch):
+    """
+    Return a function running a pytest session of the pytester directory that reports to the fake API.
+    """
+    with open(os.path.join(PLUGIN_ROOT, "conftest.py")) as file:
+        pytester.makeconftest(file.read())
+    monkeypatch.setenv("PYTHONPATH", PLUGIN_ROOT)
+
+    def run(*args):
+        return pytester.runpytest_subprocess(
+            "--reporting-enabled", f"--reporting-api-url={fake_api.url}", "--reporting-flush-interval=0.05",
+            f"--reporting-spool-dir={pytester.path / 'spool'}", "-p", "no:cacheprovider", *args,
+        )
+
+    return run
@@ -0,0 +1,102 @@
+"""
+Tests of the registry of the test definitions known to the report API: stripping known definitions from batches,
+persistence in the pytest cache per API URL, and the full resend after the API lost them.
+"""
+import json
+from pytest_report_plugin.definitions import DefinitionRegistry, definition_id
+from pytest_report_plugin.spool import post_events
+from tests.test_spool import FakeClient, finish
+
+API_URL = "http://reports.example:8000"
+PATH = "/runs/run-1/events:batch"
+
+
+class FakeCache:
+    """
+    A pytest cache in memory. Values go through JSON, like the files of the real cache.
+    """
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key, default):
+        return json.loads(self.values[key]) if key in self.values else default
+
+    def set(self, key, value):
+        self.values[key] = json.dumps(value)
+
+
+def start(test_id, nodeid):
+    return {"type": "start", "test_id": test_id, "definition_id": definition_id(nodeid), "nodeid": nodeid,
+            "test_name": nodeid.split("::")[-1], "test_parameters": {"x": 1}, "timestamp": "2024-05-01T12:00:00"}
+
+
+def test_definition_id_is_stable_and_positive():
+    nodeid = "tests/test_a.py::test_a[1]"
+
+    assert definition_id(nodeid) == definition_id(nodeid)
+    assert 0 < definition_id(nodeid) < 2 ** 63
+    assert definition_id(nodeid) != definition_id("tests/test_a.py::test_a[2]")
+
+
+def test_acknowledged_definitions_are_stripped():
+    registry = DefinitionRegistry()
+    first = [start("t1", "test_a.py::test_a"), finish("t1")]
+
+    # Nothing is known yet, the batch is sent as is
+    assert registry.strip(first) is first
+    registry.acknowledge(first)
+
+    second = [start("t2", "test_a.py::test_a"), start("t3", "test_a.py::test_b")]
+    stripped = registry.strip(second)
+    assert stripped[0] == {"type": "start", "test_id": "t2", "definition_id": definition_id("test_a.py::test_a"),
+                           "timestamp": "2024-05-01T12:00:00"}
+    assert stripped[1] is second[1]
+    # The batch itself is left unchanged, it may have to be sent again in full
+    assert "nodeid" in second[0]
+
+
+def test_known_definitions_survive_a_reload_from_the_cache():
+    cache = FakeCache()
+    registry = DefinitionRegistry()
+    registry.acknowledge([start("t1", "test_a.py::test_a")])
+    registry.save(cache, API_URL)
+
+    reloaded = DefinitionRegistry.load(cache, API_URL + "/")
+    assert reloaded.known == registry.known
+    assert "nodeid" not in reloaded.strip([start("t2", "test_a.py::test_a")])[0]
+    # Another service has its own entry
+    assert DefinitionRegistry.load(cache, "http://other.example:8000").known == {}
+    # Without the cache provider only the definitions of the run are known
+    assert DefinitionRegistry.load(None, API_URL).known == {}
+
+
+def test_corrupt_cache_entry_is_ignored():
+    cache = FakeCache()
+    cache.set(DefinitionRegistry.cache_key(API_URL), ["not", "a", "dict"])
+
+    assert DefinitionRegistry.load(cache, API_URL).known == {}
+
+
+def test_forgotten_definitions_are_sent_in_full():
+    registry = DefinitionRegistry()
+    events = [start("t1", "test_a.py::test_a"), start("t2", "test_a.py::test_b")]
+    registry.acknowledge(events)
+
+    registry.forget(events[:1])
+    assert registry.strip(events)[0] is events[0]
+    assert "nodeid" not in registry.strip(events)[1]
+
+
+def test_lost_definitions_are_sent_again_and_acknowledged():
+    registry = DefinitionRegistry()
+    events = [start("t1", "test_a.py::test_a")]
+    registry.acknowledge(events)
+    client = FakeClient({PATH: 409})
+
+    post_events(client, PATH, events, registry=registry)
+
+    # The stripped batch was refused, the full one accepted and its definitions known again
+    assert [data["events"][0].get("nodeid") for _, data in client.calls] == [None, "test_a.py::test_a"]
+    assert registry.known == {"test_a.py::test_a": definition_id("test_a.py::test_a")}
+    assert "nodeid" not in registry.strip(events)[0]
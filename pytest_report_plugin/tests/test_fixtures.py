@@ -0,0 +1,88 @@
+"""
+Tests of the fixture profiler: setup times without the nested setups, teardown times, scopes and use counts, in a
+session and merged from xdist workers.
+"""
+import pytest
+from pytest_report_plugin.fixtures import FixtureProfiler
+
+pytest_plugins = ["pytester"]
+
+MS = 1_000_000
+
+TESTS = """
+import time
+import pytest
+
+@pytest.fixture
+def inner():
+    time.sleep(0.2)
+
+@pytest.fixture
+def outer(inner):
+    time.sleep(0.05)
+    yield
+    time.sleep(0.1)
+
+@pytest.fixture(scope="module")
+def shared():
+    return object()
+
+def test_one(outer, shared):
+    pass
+
+def test_two(shared):
+    pass
+
+def test_three(shared):
+    pass
+"""
+
+
+def fixture_stats(fake_api):
+    (body,) = fake_api.posted("/fixtures")
+    return {entry["fixture_name"]: entry for entry in body["fixtures"]}
+
+
+def test_nested_setup_is_not_counted_twice(run_reported, fake_api, pytester):
+    pytester.makepyfile(test_demo=TESTS)
+
+    run_reported("--reporting-fixtures").assert_outcomes(passed=3)
+
+    stats = fixture_stats(fake_api)
+    assert 200 * MS <= stats["inner"]["setup_ns"]
+    # The 200 ms of inner are set up inside outer but accounted to inner only
+    assert 50 * MS <= stats["outer"]["setup_ns"] < 150 * MS
+    assert stats["outer"]["max_setup_ns"] == stats["outer"]["setup_ns"]
+    assert stats["outer"]["teardown_ns"] >= 100 * MS
+    assert (stats["shared"]["scope"], stats["shared"]["setups"], stats["shared"]["uses"]) == ("module", 1, 3)
+    assert (stats["outer"]["scope"], stats["outer"]["setups"], stats["outer"]["uses"]) == ("function", 1, 1)
+    # The most expensive fixture comes first
+    assert next(iter(stats)) == "inner"
+
+
+def test_stats_of_xdist_workers_are_merged(run_reported, fake_api, pytester):
+    pytest.importorskip("xdist")
+    pytester.makepyfile(test_demo=TESTS)
+
+    run_reported("--reporting-fixtures", "-n", "2").assert_outcomes(passed=3)
+
+    stats = fixture_stats(fake_api)
+    # Each worker sets the module fixture up for itself, the uses of both add up
+    assert 1 <= stats["shared"]["setups"] <= 2
+    assert stats["shared"]["uses"] == 3
+    assert stats["inner"]["setups"] == 1 and stats["inner"]["setup_ns"] >= 200 * MS
+
+
+def test_merge_sums_the_counters_and_keeps_the_longest_setup():
+    profiler = FixtureProfiler()
+    entry = {"fixture_name": "db", "baseid": "", "scope": "session", "setups": 1, "setup_ns": 30,
+             "max_setup_ns": 30, "teardown_ns": 5, "uses": 4}
+    profiler.merge([entry])
+    profiler.merge([{**entry, "setup_ns": 50, "max_setup_ns": 50, "uses": 6},
+                    {**entry, "baseid": "tests/api", "uses": 1}])
+
+    results = {(result["fixture_name"], result["baseid"]): result for result in profiler.results()}
+    assert results[("db", "")] == {**entry, "setups": 2, "setup_ns": 80, "max_setup_ns": 50, "teardown_ns": 10,
+                                   "uses": 10}
+    # A fixture overridden in a directory is kept apart
+    assert results[("db", "tests/api")]["uses"] == 1
@@ -0,0 +1,145 @@
+"""
+Tests of the handling of the tests the report service knows as flaky: the list fetched from /flaky and cached, the
+quarantine as non-strict xfail and the rerun of failing calls.
+"""
+import pytest
+from pytest_report_plugin.client import APIError
+from pytest_report_plugin.definitions import api_cache_key, definition_id
+from pytest_report_plugin.flaky import CACHE_KEY, load_flaky, retrying
+from tests.test_definitions import API_URL, FakeCache
+
+pytest_plugins = ["pytester"]
+
+TESTS = """
+import pytest
+
+calls = {"test_flaky": 0, "test_broken": 0}
+
+def test_flaky():
+    calls["test_flaky"] += 1
+    assert calls["test_flaky"] >= 3, f"attempt {calls['test_flaky']}"
+
+def test_broken():
+    calls["test_broken"] += 1
+    assert False, f"attempt {calls['test_broken']}"
+
+def test_stable():
+    pass
+"""
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class FakeClient:
+    """
+    Answers GET /flaky with the given tests, or fails with a 503 without them.
+    """
+
+    def __init__(self, tests=None):
+        self.tests = tests
+
+    def get(self, path, params=None):
+        if self.tests is None:
+            raise APIError(f"GET {path} failed: HTTP 503", 503)
+        return FakeResponse({"window": 32, "tests": self.tests})
+
+
+def test_flaky_tests_are_fetched_and_cached():
+    cache = FakeCache()
+
+    assert load_flaky(FakeClient([{"definition_id": "12"}, {"definition_id": "34"}]), cache, API_URL) == {12, 34}
+    # The service cannot be reached, the last list is used
+    assert load_flaky(FakeClient(), cache, API_URL) == {12, 34}
+    assert load_flaky(FakeClient(), cache, "http://other.example:8000") is None
+    assert load_flaky(FakeClient(), None, API_URL) is None
+    assert load_flaky(FakeClient([]), cache, API_URL) == set()
+
+
+def test_corrupt_cached_list_is_ignored():
+    cache = FakeCache()
+    cache.set(api_cache_key(CACHE_KEY, API_URL), {"not": "a list"})
+
+    assert load_flaky(FakeClient(), cache, API_URL) is None
+
+
+def test_retrying_repeats_failing_calls_only():
+    calls = []
+
+    def flaky(fail_times):
+        calls.append(fail_times)
+        if len(calls) <= fail_times:
+            raise AssertionError(f"attempt {len(calls)}")
+        return len(calls)
+
+    assert retrying(flaky, 2, "test_a")(2) == 3
+    calls.clear()
+    with pytest.raises(AssertionError, match="attempt 3"):
+        retrying(flaky, 2, "test_a")(3)
+
+    def skipped():
+        calls.append(None)
+        pytest.skip("not today")
+
+    calls.clear()
+    with pytest.raises(pytest.skip.Exception):
+        retrying(skipped, 2, "test_b")()
+    assert calls == [None]
+
+
+def test_coroutine_functions_are_not_wrapped():
+    async def test_async():
+        pass
+
+    assert retrying(test_async, 2, "test_async") is test_async
+
+
+def flaky_list(fake_api, *nodeids):
+    fake_api.responses["/flaky"] = {"window": 32, "tests": [{"definition_id": str(definition_id(nodeid))}
+                                                             for nodeid in nodeids]}
+
+
+def reported_statuses(fake_api):
+    started = {start["test_id"]: start["test_name"] for start in fake_api.events("start")}
+    return {started[finish["test_id"]]: finish["test_status"] for finish in fake_api.events("finish")}
+
+
+def test_quarantined_tests_do_not_fail_the_session(run_reported, fake_api, pytester):
+    pytester.makepyfile(test_demo=TESTS)
+    flaky_list(fake_api, "test_demo.py::test_flaky", "test_demo.py::test_stable")
+
+    result = run_reported("--reporting-flaky=quarantine")
+
+    # test_flaky fails its single call, test_stable passes: both are quarantined
+    result.assert_outcomes(failed=1, xfailed=1, xpassed=1)
+    assert result.ret == pytest.ExitCode.TESTS_FAILED
+    # The service keeps the real outcomes
+    assert reported_statuses(fake_api) == {"test_flaky": "FAILED", "test_broken": "FAILED", "test_stable": "PASSED"}
+
+
+def test_flaky_tests_are_rerun(run_reported, fake_api, pytester):
+    pytester.makepyfile(test_demo=TESTS)
+    flaky_list(fake_api, "test_demo.py::test_flaky")
+
+    result = run_reported("--reporting-flaky=rerun", "--reporting-flaky-reruns=2")
+
+    result.assert_outcomes(passed=2, failed=1)
+    # Only the flaky test is called again, test_broken fails its first attempt
+    result.stdout.fnmatch_lines(["*AssertionError: attempt 1*"])
+    assert reported_statuses(fake_api) == {"test_flaky": "PASSED", "test_broken": "FAILED", "test_stable": "PASSED"}
+
+
+def test_rerun_flaky_test_fails_when_every_attempt_failed(run_reported, fake_api, pytester):
+    pytester.makepyfile(test_demo=TESTS)
+    flaky_list(fake_api, "test_demo.py::test_flaky")
+
+    result = run_reported("--reporting-flaky=rerun", "--reporting-flaky-reruns=1")
+
+    result.assert_outcomes(passed=1, failed=2)
+    result.stdout.fnmatch_lines(["*AssertionError: attempt 2*"])
+    assert reported_statuses(fake_api)["test_flaky"] == "FAILED"
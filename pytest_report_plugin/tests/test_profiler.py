@@ -0,0 +1,107 @@
+"""
+Tests of the sampling profiler: the stacks sampled from a busy test thread, the collapsed-stack format, the heap of
+the N slowest profiles and the profiles sent with a reported session.
+"""
+import time
+from collections import Counter
+from pytest_report_plugin.profiler import SlowestProfiles, StackSampler, collapsed
+
+pytest_plugins = ["pytester"]
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += 1
+    return total
+
+
+def test_sampled_busy_loop_names_the_function():
+    sampler = StackSampler(interval=0.001)
+    sampler.begin()
+    busy_loop(0.2)
+    stacks, samples = sampler.end()
+
+    assert samples > 10
+    lines = collapsed(stacks).splitlines()
+    heaviest, microseconds = lines[0].rsplit(" ", 1)
+    # Outermost frame first, the busy loop is where the time went
+    assert heaviest.split(";")[-1].startswith("busy_loop (test_profiler.py:")
+    assert "test_sampled_busy_loop_names_the_function (test_profiler.py:" in heaviest
+    # Samples are weighted by the wall time, which adds up to the time sampled
+    assert 100_000 <= sum(stacks.values()) <= 400_000
+    assert int(microseconds) == max(stacks.values())
+
+
+def test_nothing_is_sampled_outside_begin_and_end():
+    sampler = StackSampler(interval=0.001)
+    sampler.begin()
+    sampler.end()
+    busy_loop(0.05)
+
+    sampler.begin()
+    stacks, samples = sampler.end()
+    assert stacks == Counter() and samples == 0
+
+
+def test_collapsed_lists_the_most_expensive_stack_first():
+    stacks = Counter({"test_a (t.py:1);helper (t.py:5)": 300, "test_a (t.py:1)": 1200, "": 50})
+
+    assert collapsed(stacks) == "test_a (t.py:1) 1200\ntest_a (t.py:1);helper (t.py:5) 300"
+    assert collapsed(Counter()) == ""
+
+
+def test_heap_keeps_exactly_the_slowest_profiles():
+    profiles = SlowestProfiles(3)
+    durations = [50, 10, 70, 30, 90, 20, 60, 80, 40]
+    for call_ns in durations:
+        profiles.offer(call_ns, {"test_id": f"t{call_ns}", "call_ns": call_ns})
+
+    assert [profile["call_ns"] for profile in profiles.results()] == [90, 80, 70]
+    assert not profiles.would_keep(70) and profiles.would_keep(71)
+
+
+def test_heap_merges_the_profiles_of_workers():
+    controller = SlowestProfiles(2)
+    controller.offer(40, {"call_ns": 40, "test_id": "c1"})
+    worker = SlowestProfiles(2)
+    for call_ns in (10, 50, 30):
+        worker.offer(call_ns, {"call_ns": call_ns, "test_id": f"w{call_ns}"})
+
+    controller.merge(worker.results())
+    assert [profile["test_id"] for profile in controller.results()] == ["w50", "c1"]
+
+
+def test_profiles_of_the_slowest_tests_are_sent(run_reported, fake_api, pytester):
+    pytester.makepyfile(test_demo="""
+        import time
+
+        def spin(seconds):
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                pass
+
+        def test_slow():
+            spin(0.3)
+
+        def test_slower():
+            spin(0.5)
+
+        def test_fast():
+            pass
+    """)
+
+    run_reported("--reporting-profile-top=2").assert_outcomes(passed=3)
+
+    (body,) = fake_api.posted("/profiles")
+    profiles = body["profiles"]
+    assert [profile["test_name"] for profile in profiles] == ["test_slower", "test_slow"]
+    started = {start["test_id"]: start["test_name"] for start in fake_api.events("start")}
+    assert [started[profile["test_id"]] for profile in profiles] == ["test_slower", "test_slow"]
+    for profile in profiles:
+        heaviest = profile["stacks"].splitlines()[0]
+        # Stacks start at the test function, the frames of pytest are cut off
+        assert heaviest.startswith(f"{profile['test_name']} (test_demo.py:")
+        assert "spin (test_demo.py:" in heaviest
+        assert profile["samples"] > 0
@@ -0,0 +1,139 @@
+"""
+Tests of the retry policy and the circuit breaker, alone and around the calls of the ReportClient.
+"""
+import pytest
+import requests
+from pytest_report_plugin.client import APIError, ReportClient
+from pytest_report_plugin.retry import CircuitBreaker, CircuitOpenError, ExponentialBackoff
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeSession:
+    """
+    Answers the requests of a ReportClient with the given outcomes, in order: a status code or an exception.
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return FakeResponse(outcome)
+
+
+def make_client(*outcomes, reset_timeout=60.0):
+    client = ReportClient("http://127.0.0.1:1", "token")
+    client.session = FakeSession(*outcomes)
+    client.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout)
+    return client
+
+
+def test_breaker_opens_at_the_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60.0)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_the_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_expired_breaker_lets_a_single_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Concurrent calls wait for the outcome of the trial
+    assert not breaker.allow()
+
+
+def test_trial_outcome_closes_or_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.0)
+    for _ in range(3):
+        breaker.record_failure()
+
+    assert breaker.allow()
+    # A single failed trial is enough, whatever the threshold
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_open_breaker_skips_the_call():
+    client = make_client(requests.ConnectionError(), 503)
+
+    with pytest.raises(requests.ConnectionError):
+        client.post("/runs", {})
+    with pytest.raises(APIError):
+        client.post("/runs", {})
+    with pytest.raises(CircuitOpenError):
+        client.post("/runs", {})
+    assert client.session.calls == 2
+
+
+def test_client_errors_do_not_open_the_breaker():
+    client = make_client(404, 400, 415, 201)
+
+    for _ in range(3):
+        with pytest.raises(APIError):
+            client.post("/runs", {})
+    assert client.post("/runs", {}).status_code == 201
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.parametrize("error", [ValueError("bad body"), KeyboardInterrupt()])
+def test_trial_raising_any_exception_reopens_the_breaker(error):
+    client = make_client(503, 503, error, 200, reset_timeout=0.0)
+    for _ in range(2):
+        with pytest.raises(APIError):
+            client.post("/runs", {})
+
+    with pytest.raises(type(error)):
+        client.post("/runs", {})
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    # The breaker is not stuck half-open, the next trial goes through and closes it
+    assert client.post("/runs", {}).status_code == 200
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_backoff_delays_stay_within_their_bounds():
+    backoff = ExponentialBackoff(base=0.5, cap=4.0)
+
+    for attempt in range(10):
+        delay = min(4.0, 0.5 * 2 ** attempt)
+        assert delay / 2 <= backoff.next_delay() <= delay
+    assert backoff.attempts == 10
+
+
+def test_backoff_reset_starts_over_from_the_base_delay():
+    backoff = ExponentialBackoff(base=1.0, cap=30.0)
+    for _ in range(5):
+        backoff.next_delay()
+
+    backoff.reset()
+    assert 0.5 <= backoff.next_delay() <= 1.0
+    assert 1.0 <= backoff.next_delay() <= 2.0
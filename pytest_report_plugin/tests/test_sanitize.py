@@ -0,0 +1,138 @@
+"""
+Tests of the sanitizing of test parameters: values every wire format can serialize, copies the tests cannot change,
+bounded sizes and the per-test cache of the ParameterSanitizer.
+"""
+import sys
+import math
+import pytest
+from pytest_report_plugin.sanitize import MAX_SIZE, ParameterSanitizer, sanitize
+
+
+@pytest.mark.parametrize("value", [math.nan, math.inf, -math.inf])
+def test_non_finite_floats_become_none(value):
+    assert sanitize(value) is None
+    assert sanitize({"x": [1.5, value]}) == {"x": [1.5, None]}
+
+
+def test_tuples_and_sets_become_lists():
+    assert sanitize((1, "a", (2, 3))) == [1, "a", [2, 3]]
+    assert sorted(sanitize({3, 1, 2})) == [1, 2, 3]
+    assert sanitize({"a": frozenset({"x"})}) == {"a": ["x"]}
+
+
+def test_other_values_become_their_repr():
+    class Point:
+        def __repr__(self):
+            return "Point(1, 2)"
+
+    assert sanitize({"p": Point(), (1, 2): 2 ** 70}) == {"p": "Point(1, 2)", "(1, 2)": repr(2 ** 70)}
+    assert sanitize("x" * 10, max_string=4) == "xxxx..."
+
+
+def test_clean_value_is_copied():
+    value = {"a": [1, 2.5, "x", None, True], "b": {"c": []}}
+
+    clean = sanitize(value)
+    assert clean == value
+    assert clean is not value and clean["a"] is not value["a"] and clean["b"]["c"] is not value["b"]["c"]
+    assert sanitize(1.5) == 1.5 and sanitize("x") == "x"
+
+
+def test_original_is_never_modified():
+    inner = {"c": [1, 2]}
+    value = {"a": (1, 2), "b": inner}
+
+    assert sanitize(value) == {"a": [1, 2], "b": {"c": [1, 2]}}
+    assert value == {"a": (1, 2), "b": {"c": [1, 2]}} and value["b"] is inner
+
+
+def test_cycles_are_cut():
+    value = [1]
+    value.append(value)
+    mapping = {"self": None}
+    mapping["self"] = mapping
+
+    assert sanitize(value) == [1, "<recursive>"]
+    assert sanitize(mapping) == {"self": "<recursive>"}
+    # A container shared by two siblings is no cycle
+    shared = [1]
+    assert sanitize([shared, shared]) == [[1], [1]]
+
+
+def test_nesting_deeper_than_the_recursion_limit():
+    depth = sys.getrecursionlimit() * 2
+    value = leaf = []
+    for _ in range(depth):
+        leaf.append([])
+        leaf = leaf[0]
+    leaf.append(math.nan)
+
+    clean = sanitize(value)
+    assert clean is not value
+    for _ in range(depth):
+        assert type(clean) is list and len(clean) == 1
+        clean = clean[0]
+    assert clean == [None]
+
+    leaf[0] = 1.0
+    clean = sanitize(value)
+    for _ in range(depth):
+        clean = clean[0]
+    assert clean == [1.0]
+
+
+def test_oversized_value_becomes_its_truncated_repr():
+    # Just under the 64 KiB budget, one more string is over it
+    fits = ["x" * 1000] * (MAX_SIZE // 1000)
+    assert sanitize(fits) == fits
+
+    large = fits + ["x" * 1000]
+    clean = sanitize(large)
+    assert clean == repr(large)[:1024] + "..."
+    assert sanitize(large, max_size=2 * MAX_SIZE) == large
+
+
+def test_numpy_values_become_python_values():
+    numpy = pytest.importorskip("numpy")
+
+    assert sanitize({"a": numpy.float64(1.5), "b": numpy.int32(2)}) == {"a": 1.5, "b": 2}
+    assert sanitize(numpy.array([[1.0, numpy.nan], [numpy.inf, 2.0]])) == [[1.0, None], [None, 2.0]]
+
+
+def test_parameters_are_sanitized_one_by_one():
+    sanitizer = ParameterSanitizer(max_size=100)
+    parameters = {"small": 1, "large": "x" * 200}
+
+    assert sanitizer.sanitize("a", parameters) == {"small": 1, "large": repr("x" * 200)[:1024]}
+    clean = {"a": 1}
+    assert sanitizer.sanitize("b", clean) == clean and sanitizer.sanitize("b", clean) is not clean
+
+
+def test_parameters_changed_by_the_test_are_not_reported():
+    sanitizer = ParameterSanitizer()
+    records = {"rows": [1, 2], "meta": {"owner": "a"}}
+    parameters = {"records": records}
+
+    reported = sanitizer.sanitize("test_a[records]", parameters)
+    # The test changes its parameter while the sender has not serialized the start event yet
+    records["rows"].append(3)
+    records["meta"]["owner"] = "b"
+    records["added"] = True
+
+    assert reported == {"records": {"rows": [1, 2], "meta": {"owner": "a"}}}
+    assert sanitizer.sanitize("test_a[records]", parameters) is reported
+
+
+def test_parameters_are_cached_by_node_id():
+    sanitizer = ParameterSanitizer(cache_size=2)
+    first = sanitizer.sanitize("test_a[0]", {"x": (1,)})
+
+    # The parameters of a node ID never change, the cached result is returned
+    assert sanitizer.sanitize("test_a[0]", {"x": (2,)}) is first
+    sanitizer.sanitize("test_a[1]", {"x": 1})
+    # test_a[0] was used last, test_a[1] is evicted first
+    sanitizer.sanitize("test_a[0]", {})
+    sanitizer.sanitize("test_a[2]", {"x": 2})
+
+    assert sanitizer.sanitize("test_a[0]", {"x": (3,)}) is first
+    assert sanitizer.sanitize("test_a[1]", {"x": (4,)}) == {"x": [4]}
@@ -0,0 +1,89 @@
+"""
+Tests of the longest-first schedule. deal() and load_chunk_size() mirror the first distribution of the xdist load
+scheduler, the order they produce is pinned here and checked against the scheduler itself, so a change of its
+formula in a new xdist release shows up as a failure instead of a silently worse schedule.
+"""
+from types import SimpleNamespace
+import pytest
+from pytest_report_plugin.schedule import deal, load_chunk_size
+
+
+@pytest.mark.parametrize("count, workers, max_chunk, chunk", [
+    (5, 3, None, 1),
+    (6, 3, None, 2),
+    (24, 3, None, 2),
+    (100, 8, None, 3),
+    (400, 4, None, 25),
+    (400, 4, 10, 10),
+    (400, 4, 1, 2),
+])
+def test_load_chunk_size(count, workers, max_chunk, chunk):
+    assert load_chunk_size(count, workers, max_chunk) == chunk
+
+
+def test_deal_spreads_the_longest_tests_over_the_workers():
+    items = list(range(24))
+
+    assert deal(items, 3, 2) == [0, 3, 1, 4, 2, 5] + list(range(6, 24))
+    assert deal(items, 2, 3) == [0, 2, 4, 1, 3, 5] + list(range(6, 24))
+
+
+def test_deal_keeps_the_order_without_chunks():
+    items = list(range(5))
+
+    assert deal(items, 3, 1) == items
+    assert deal(items, 3, 2) == items
+
+
+class FakeNode:
+    """
+    An xdist WorkerController that records the tests it is sent.
+    """
+
+    def __init__(self, index):
+        self.gateway = SimpleNamespace(id=f"gw{index}")
+        self.sent = []
+
+    def send_runtest_some(self, indices):
+        self.sent.extend(indices)
+
+    def shutdown(self):
+        pass
+
+
+class FakeConfig:
+    def __init__(self, workers, max_chunk):
+        self.options = {"tx": [f"{workers}*popen"], "maxschedchunk": max_chunk}
+
+    def getvalue(self, name):
+        return self.options[name]
+
+    def getoption(self, name):
+        return self.options[name]
+
+
+@pytest.mark.parametrize("count, workers, max_chunk", [
+    (5, 3, None),
+    (24, 3, None),
+    (100, 8, None),
+    (400, 4, None),
+    (400, 4, 10),
+])
+def test_xdist_starts_every_worker_on_the_dealt_tests(count, workers, max_chunk):
+    load = pytest.importorskip("xdist.scheduler.load")
+    chunk = load_chunk_size(count, workers, max_chunk)
+    # Each test is named after its rank, 0 being the longest
+    collection = [f"test_{rank}" for rank in deal(list(range(count)), workers, chunk)]
+
+    scheduler = load.LoadScheduling(FakeConfig(workers, max_chunk))
+    nodes = [FakeNode(index) for index in range(workers)]
+    for node in nodes:
+        scheduler.add_node(node)
+    for node in nodes:
+        scheduler.add_node_collection(node, collection)
+    scheduler.schedule()
+
+    for index, node in enumerate(nodes):
+        ranks = [int(collection[test].split("_")[1]) for test in node.sent]
+        # Worker n starts with the tests ranked n, n + workers, n + 2 * workers...
+        assert ranks[:chunk] == list(range(index, chunk * workers, workers))
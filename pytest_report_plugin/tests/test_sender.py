@@ -0,0 +1,64 @@
+"""
+Tests of the background EventSender: events go through the spool to the API, and an event that cannot be spooled
+is dropped without stopping the thread.
+"""
+import os
+from pytest_report_plugin.sender import EventSender
+from pytest_report_plugin.spool import Spool
+from tests.test_spool import RUN_ID, FakeClient, finish, start
+
+
+def make_sender(tmp_path, client):
+    spool = Spool(str(tmp_path / f"{RUN_ID}.spool"))
+    sender = EventSender(client, spool, batch_size=2, flush_interval=0.01, drain_timeout=5.0)
+    sender.enqueue({"type": "run_start", "run_id": RUN_ID, "start_time": "2024-05-01T12:00:00"})
+    return sender, spool
+
+
+def sent_events(client):
+    return [event for path, data in client.calls if path.endswith("events:batch") for event in data["events"]]
+
+
+def test_events_are_uploaded_and_the_spool_removed(tmp_path):
+    client = FakeClient()
+    sender, spool = make_sender(tmp_path, client)
+    sender.enqueue(start("t1"))
+    sender.enqueue(finish("t1"))
+
+    assert sender.close()
+    assert sent_events(client) == [start("t1"), finish("t1")]
+    assert not os.path.exists(spool.path)
+
+
+def test_unserializable_event_does_not_stop_the_sender(tmp_path):
+    client = FakeClient()
+    sender, spool = make_sender(tmp_path, client)
+    sender.enqueue(start("t1"))
+    sender.enqueue({**finish("t1"), "error_exception": object()})
+    sender.enqueue(start("t2"))
+    sender.enqueue(finish("t2"))
+
+    # The dropped event is reported by close(), the others are uploaded
+    assert not sender.close()
+    assert sender.events_dropped == 1
+    assert sent_events(client) == [start("t1"), start("t2"), finish("t2")]
+    assert not os.path.exists(spool.path)
+
+
+def test_full_disk_does_not_stop_the_sender(tmp_path, monkeypatch):
+    client = FakeClient()
+    sender, spool = make_sender(tmp_path, client)
+    append = spool.append
+
+    def failing_append(record):
+        if record.get("test_id") == "t1":
+            raise OSError(28, "No space left on device")
+        append(record)
+
+    monkeypatch.setattr(spool, "append", failing_append)
+    sender.enqueue(start("t1"))
+    sender.enqueue(start("t2"))
+
+    assert not sender.close()
+    assert sender.events_dropped == 1
+    assert sent_events(client) == [start("t2")]
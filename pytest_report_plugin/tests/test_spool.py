@@ -0,0 +1,200 @@
+"""
+Tests of the spool file: length-prefixed records, the committed offset kept in the sidecar file, the upload of the
+records and the replay command line.
+"""
+import os
+import json
+import pytest
+from pytest_report_plugin import spool as spool_module
+from pytest_report_plugin.client import APIError
+from pytest_report_plugin.definitions import DefinitionRegistry
+from pytest_report_plugin.spool import RECORD_HEADER, Spool, main, upload
+
+RUN_ID = "11111111-2222-3333-4444-555555555555"
+
+
+class FakeClient:
+    """
+    Records the calls of a ReportClient, failing the calls of the given paths once with the given status, and
+    answering 400 to every batch holding an event the reject function returns True for.
+    """
+
+    def __init__(self, failures=None, reject=None):
+        self.calls = []
+        self.failures = dict(failures or {})
+        self.reject = reject
+
+    def post(self, path, data):
+        self.calls.append((path, data))
+        status = self.failures.pop(path, None)
+        if status is None and self.reject is not None and any(self.reject(event) for event in data.get("events", ())):
+            status = 400
+        if status is not None:
+            raise APIError(f"POST {path} failed: HTTP {status}", status)
+
+    def close(self):
+        pass
+
+
+def start(test_id, nodeid="tests/test_a.py::test_a", definition_id=7):
+    return {"type": "start", "test_id": test_id, "definition_id": definition_id, "nodeid": nodeid,
+            "test_name": nodeid.split("::")[-1], "test_parameters": {}, "timestamp": "2024-05-01T12:00:00"}
+
+
+def finish(test_id):
+    return {"type": "finish", "test_id": test_id, "test_status": "PASSED", "error_exception": None, "duration": 0.1}
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = Spool(str(tmp_path / f"{RUN_ID}.spool"))
+    spool.append({"type": "run_start", "run_id": RUN_ID, "start_time": "2024-05-01T12:00:00"})
+    yield spool
+    spool.close()
+
+
+def test_records_read_back_with_their_end_offsets(spool):
+    spool.append(start("t1"))
+    records = spool.read(0, 10)
+
+    assert [record["type"] for record, _ in records] == ["run_start", "start"]
+    assert records[-1][1] == os.path.getsize(spool.path)
+    assert spool.read(records[0][1], 10) == records[1:]
+    assert spool.run_id == RUN_ID
+
+
+def test_upload_resumes_from_the_committed_offset(spool):
+    spool.append(start("t1"))
+    spool.append(finish("t1"))
+    # The run start was accepted by an earlier upload
+    spool.commit(spool.read(0, 1)[0][1])
+    client = FakeClient()
+
+    assert upload(spool, client) == 2
+    assert client.calls == [(f"/runs/{RUN_ID}/events:batch", {"events": [start("t1"), finish("t1")]})]
+    assert spool.committed_offset() == os.path.getsize(spool.path)
+    assert not spool.pending()
+    # Nothing is sent again once everything is committed
+    assert upload(spool, client) == 0
+
+
+def test_committed_offset_survives_reopening(spool):
+    spool.append(start("t1"))
+    end = spool.read(0, 1)[0][1]
+    spool.commit(end)
+    spool.close()
+
+    reopened = Spool(spool.path)
+    assert reopened.committed_offset() == end
+    assert reopened.pending()
+    reopened.close()
+
+
+def test_partly_written_last_record_ends_the_spool(spool):
+    spool.append(start("t1"))
+    complete = os.path.getsize(spool.path)
+    # A writer that crashed in the middle of a record
+    with open(spool.path, "ab") as file:
+        file.write(RECORD_HEADER.pack(100) + b'{"type": "fin')
+    client = FakeClient()
+
+    assert [record["type"] for record, _ in spool.read(0, 10)] == ["run_start", "start"]
+    assert upload(spool, client) == 2
+    assert spool.committed_offset() == complete
+
+
+def test_failed_upload_keeps_the_offset_of_the_accepted_records(spool):
+    spool.append(start("t1"))
+    client = FakeClient({f"/runs/{RUN_ID}/events:batch": 500})
+
+    with pytest.raises(APIError):
+        upload(spool, client)
+    # The run start was accepted, the events are sent again by the next upload
+    assert spool.committed_offset() == spool.read(0, 1)[0][1]
+    assert upload(spool, client) == 1
+
+
+def rejected_records(spool):
+    with open(spool.rejected_path) as file:
+        return [json.loads(line) for line in file]
+
+
+def test_rejected_batch_is_set_aside_and_the_next_records_arrive(spool):
+    spool.append(start("t1"))
+    spool.append(start("t2"))
+    spool.append({"type": "run_finish", "run_id": RUN_ID, "finish_time": "2024-05-01T12:01:00"})
+    client = FakeClient({f"/runs/{RUN_ID}/events:batch": 400})
+
+    # Batches of one event: the refused one cannot be split
+    assert upload(spool, client, batch_size=1) == 3
+    assert rejected_records(spool) == [start("t1")]
+    assert [path for path, _ in client.calls][-2:] == [f"/runs/{RUN_ID}/events:batch", f"/runs/{RUN_ID}/finish"]
+    assert client.calls[-2][1] == {"events": [start("t2")]}
+    assert not spool.pending()
+
+
+def test_refused_events_are_isolated_from_their_batch(spool):
+    bad = {**finish("t1"), "error_exception": "x" * 1000}
+    for event in (start("t1"), bad, start("t2"), finish("t2")):
+        spool.append(event)
+    client = FakeClient(reject=lambda event: event.get("error_exception") == bad["error_exception"])
+
+    assert upload(spool, client) == 4
+    assert rejected_records(spool) == [bad]
+    accepted = [data["events"] for path, data in client.calls
+                if path.endswith("events:batch") and bad not in data["events"]]
+    assert sorted(event["test_id"] + event["type"] for events in accepted for event in events) == \
+        ["t1start", "t2finish", "t2start"]
+    assert spool.committed_offset() == os.path.getsize(spool.path)
+
+
+def test_retryable_client_errors_keep_the_records(spool):
+    spool.append(start("t1"))
+    client = FakeClient({f"/runs/{RUN_ID}/events:batch": 429})
+
+    with pytest.raises(APIError):
+        upload(spool, client)
+    assert not os.path.exists(spool.rejected_path)
+    assert upload(spool, client) == 1
+
+
+def test_lost_definitions_are_sent_again_in_full(spool):
+    event = start("t1")
+    spool.append(event)
+    registry = DefinitionRegistry({event["nodeid"]: event["definition_id"]})
+    client = FakeClient({f"/runs/{RUN_ID}/events:batch": 409})
+
+    assert upload(spool, client, registry=registry) == 2
+
+    sent = [data["events"] for path, data in client.calls if path.endswith("events:batch")]
+    # The known definition is referenced by ID first, then sent in full after the 409
+    assert "nodeid" not in sent[0][0]
+    assert sent[1] == [event]
+    assert registry.known == {event["nodeid"]: event["definition_id"]}
+
+
+def test_replay_uploads_and_removes_the_spool(spool, monkeypatch):
+    spool.append(start("t1"))
+    spool.append(finish("t1"))
+    spool.close()
+    clients = []
+
+    def report_client(api_url, auth_token):
+        clients.append(FakeClient())
+        return clients[-1]
+
+    monkeypatch.setattr(spool_module, "ReportClient", report_client)
+
+    assert main(["replay", spool.path, "--api-url", "http://127.0.0.1:1", "--batch-size", "1"]) == 0
+    assert not os.path.exists(spool.path)
+    assert not os.path.exists(spool.offset_path)
+    assert [path for path, _ in clients[0].calls] == ["/runs"] + [f"/runs/{RUN_ID}/events:batch"] * 2
+
+
+def test_replay_keeps_the_spool_it_could_not_upload(spool, tmp_path, monkeypatch):
+    spool.close()
+    monkeypatch.setattr(spool_module, "ReportClient", lambda api_url, auth_token: FakeClient({"/runs": 503}))
+
+    assert main(["replay", spool.path, str(tmp_path / "missing.spool"), "--api-url", "http://127.0.0.1:1"]) == 1
+    assert os.path.exists(spool.path)
+    assert not os.path.exists(spool.offset_path)
@@ -0,0 +1,120 @@
+"""
+Tests of the columnar result store and of the end-of-run summary printed from it.
+"""
+import pytest
+from pytest_report_plugin.plugin import ReportPlugin
+from pytest_report_plugin.store import ResultStore, nearest_rank
+
+
+def fill(store, results):
+    for name, status, duration, error in results:
+        index = store.add(name, setup_ns=1000)
+        store.update(index, test_status=status, duration=duration, error_exception=error,
+                     call_ns=None if duration is None else int(duration * 1e9), teardown_ns=500)
+
+
+@pytest.fixture
+def store():
+    store = ResultStore()
+    fill(store, [
+        ("test_a[1]", "PASSED", 0.1, None),
+        ("test_a[2]", "PASSED", 0.4, None),
+        ("test_b", "FAILED", 2.0, "AssertionError: boom"),
+        ("test_c", "FAILED", 0.3, "AssertionError: boom"),
+        ("test_d", "ERROR", None, "RuntimeError: no database"),
+        ("test_e", "SKIPPED", 0.0, None),
+        ("test_f", "XPASSED", 1.0, None),
+    ])
+    return store
+
+
+def test_rows_hold_the_finish_event_fields(store):
+    assert store.row(2) == {"test_status": "FAILED", "error_exception": "AssertionError: boom", "duration": 2.0,
+                            "setup_ns": 1000, "call_ns": 2000000000, "teardown_ns": 500}
+    assert store.row(4)["duration"] is None and store.row(4)["call_ns"] is None
+    # Identical failures share their message, parametrized tests keep their own names
+    assert len(store.errors) == 2
+    assert store.names.strings[:2] == ["test_a[1]", "test_a[2]"]
+
+
+def test_summary_counts(store):
+    summary = store.summary()
+
+    assert summary["tests"] == 7
+    assert summary["statuses"] == {"PASSED": 2, "FAILED": 2, "SKIPPED": 1, "ERROR": 1, "XPASSED": 1}
+    assert summary["setup_ns"] == 7000
+    assert summary["teardown_ns"] == 3500
+    # The unknown call time of test_d is left out
+    assert summary["call_ns"] == 3800000000
+    assert summary["duration"] == pytest.approx(3.8)
+
+
+def test_summary_percentiles(store):
+    summary = store.summary()
+
+    # Known durations: 0.0, 0.1, 0.3, 0.4, 1.0, 2.0
+    assert summary["p50_duration"] == 0.3
+    assert summary["p95_duration"] == 2.0
+    assert nearest_rank([], 0.5) is None
+    assert nearest_rank([1.0, 2.0, 3.0, 4.0], 0.75) == 3.0
+
+
+def test_summary_slowest_tests_and_frequent_errors(store):
+    summary = store.summary(top=3)
+
+    assert summary["slowest"] == [("test_b", 2.0), ("test_f", 1.0), ("test_a[2]", 0.4)]
+    assert summary["errors"] == [("AssertionError: boom", 2), ("RuntimeError: no database", 1)]
+    assert store.summary(top=1)["errors"] == [("AssertionError: boom", 2)]
+
+
+def test_summary_of_an_empty_store():
+    summary = ResultStore().summary()
+
+    assert summary["tests"] == 0 and summary["statuses"] == {}
+    assert summary["p50_duration"] is None and summary["slowest"] == [] and summary["errors"] == []
+
+
+class FakeConfig:
+    def __init__(self, **options):
+        self.options = options
+
+    def getoption(self, name, default=None):
+        return self.options.get(name, default)
+
+
+class FakeTerminalReporter:
+    def __init__(self):
+        self.lines = []
+
+    def section(self, title):
+        self.lines.append(f"== {title} ==")
+
+    def write_line(self, line):
+        self.lines.append(line)
+
+
+def make_plugin(store, **options):
+    plugin = ReportPlugin(FakeConfig(reporting_enabled=True, **options))
+    plugin.run_id = "run-1"
+    plugin.results = store
+    return plugin
+
+
+def test_terminal_summary(store):
+    terminal = FakeTerminalReporter()
+
+    make_plugin(store, reporting_summary=2).pytest_terminal_summary(terminal)
+
+    assert terminal.lines[:2] == ["== test report summary ==",
+                                  "Run run-1: 7 tests, 2 passed, 2 failed, 1 skipped, 1 error, 1 xpassed"]
+    assert "Slowest tests:" in terminal.lines
+    assert sum("test_" in line for line in terminal.lines) == 2
+    assert terminal.lines[-1] == "         1x  RuntimeError: no database"
+
+
+def test_terminal_summary_disabled_with_zero(store):
+    terminal = FakeTerminalReporter()
+
+    make_plugin(store, reporting_summary=0).pytest_terminal_summary(terminal)
+
+    assert terminal.lines == []
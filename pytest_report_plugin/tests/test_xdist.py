@@ -0,0 +1,55 @@
+"""
+Tests of a reported session under pytest-xdist: the controller creates the single run of the session, the workers
+reuse its ID, and every test is reported exactly once.
+"""
+import pytest
+
+pytest_plugins = ["pytester"]
+
+pytest.importorskip("xdist")
+
+TESTS = """
+import pytest
+
+@pytest.mark.parametrize("value", range(6))
+def test_value(value):
+    assert value != 4
+
+def test_skipped():
+    pytest.skip("not today")
+
+class TestGroup:
+    def test_one(self):
+        pass
+
+    def test_two(self):
+        pass
+"""
+
+
+def test_every_test_is_reported_once_under_xdist(run_reported, fake_api, pytester):
+    pytester.makepyfile(test_demo=TESTS)
+
+    result = run_reported("-n", "2")
+
+    result.assert_outcomes(passed=7, failed=1, skipped=1)
+    runs = fake_api.posted("/runs")
+    assert len(runs) == 1
+    run_id = runs[0]["run_id"]
+    assert [path for method, path, _ in fake_api.requests if method == "POST"
+            and not path.endswith("/events:batch")] == ["/runs", f"/runs/{run_id}/finish"]
+    assert {path for _, path, body in fake_api.requests if path.endswith("/events:batch")} == \
+        {f"/runs/{run_id}/events:batch"}
+
+    starts = fake_api.events("start")
+    finishes = fake_api.events("finish")
+    nodeids = sorted(start["nodeid"] for start in starts)
+    assert nodeids == sorted([f"test_demo.py::test_value[{value}]" for value in range(6)]
+                             + ["test_demo.py::test_skipped", "test_demo.py::TestGroup::test_one",
+                                "test_demo.py::TestGroup::test_two"])
+    assert sorted(finish["test_id"] for finish in finishes) == sorted(start["test_id"] for start in starts)
+    statuses = {start["nodeid"]: finish["test_status"] for start in starts for finish in finishes
+                if finish["test_id"] == start["test_id"]}
+    assert statuses["test_demo.py::test_value[4]"] == "FAILED"
+    assert statuses["test_demo.py::test_skipped"] == "SKIPPED"
+    assert list(statuses.values()).count("PASSED") == 7